@@ -13,18 +13,49 @@
 
 import sys
 import os
+import re
+import time
+import struct
+import errno
+import heapq
+import bisect
+import math
+import mmap
+import zlib
+import codecs
+import zipfile
+import tarfile
+import random
+import statistics
+from array import array
+from itertools import accumulate, combinations, count
+from functools import lru_cache
+from collections import Counter
+import asyncio
+import threading
 import json
 import shutil
+import gzip
+import socket
+import argparse
+import tempfile
+import fnmatch
 import hashlib
+import select
+import ctypes
+import ctypes.util
 from datetime import datetime
 from pathlib import Path
+from stat import S_ISREG
 from typing import List, Dict, Tuple, Optional
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, field
+from concurrent.futures import ThreadPoolExecutor
 import csv
+import sqlite3
 
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QPushButton, QLabel, QLineEdit, QDoubleSpinBox, QTreeWidget,
+    QPushButton, QLabel, QLineEdit, QDoubleSpinBox, QSpinBox, QTreeWidget,
     QTreeWidgetItem, QFileDialog, QProgressBar, QCheckBox,
     QGroupBox, QMessageBox, QMenu, QAction, QStatusBar, QFrame,
     QSplitter, QTabWidget, QTextEdit, QHeaderView, QStyle,
@@ -41,6 +72,12 @@ from PyQt5.QtGui import (
     QLinearGradient, QPainter, QDesktopServices
 )
 
+# ioctl متاح على أنظمة يونكس فقط
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
 # محاولة استيراد مكتبة الصوت
 try:
     from PyQt5.QtMultimedia import QSound, QSoundEffect
@@ -63,6 +100,160 @@ COPYRIGHT = "© 2025 [File Size Duplicate Finder] - All Rights Reserved"
 CONFIG_FILE = "file_finder_config.json"
 HISTORY_FILE = "file_finder_history.json"
 
+# مجلد العزل داخل المجلد المصدر
+OUTPUT_FOLDER_NAME = "duplicates_sorted"
+
+# عدد عمليات الإدخال/الإخراج المتزامنة الافتراضي
+DEFAULT_IO_CONCURRENCY = 8
+# التوازي لكل قرص دوّار (القراءة بترتيب الموقع الفعلي)
+HDD_IO_CONCURRENCY = 1
+TUNE_MAX_CONCURRENCY = 64   # أقصى توازي يصل إليه الضبط التلقائي
+TUNE_INTERVAL = 1.0         # ثانية قياس قبل كل قرار ضبط
+TUNE_TOLERANCE = 0.05       # فرق الإنتاجية الذي يُعد تحسناً أو تراجعاً
+# تحديد معدل الإدخال/الإخراج وأولوية خيوط العمل
+THROTTLE_BURST = 1.0        # ثوانٍ من المعدل المسموح يمكن استهلاكها دفعة واحدة
+THROTTLE_SLICE = 0.25       # أقصى مدة نوم واحدة (لتطبيق تغيير الحدود أو الإيقاف فوراً)
+THROTTLE_STEP = 4 * 1024 * 1024  # أكبر عملية تُحسب بايتاتها قبل بدئها؛ الأكبر تُحسب أثناء القراءة
+LOAD_CHECK_INTERVAL = 2.0   # ثانية بين قراءتين لمتوسط حمل النظام
+LOW_PRIORITY_NICE = 10      # قيمة nice لخيوط العمل في وضع الأولوية المنخفضة
+IOPRIO_WHO_PROCESS = 1
+IOPRIO_CLASS_SHIFT = 13
+IOPRIO_LOW = (2 << IOPRIO_CLASS_SHIFT) | 7  # best-effort بأدنى مستوى (idle قد يتوقف تماماً تحت الضغط)
+# رقم استدعاء النظام ioprio_set حسب المعمارية (لينكس)
+IOPRIO_SET_SYSCALL = {'x86_64': 251, 'aarch64': 30, 'i686': 289, 'i386': 289, 'armv7l': 314}
+# ioctl لقراءة مواقع امتدادات الملف على القرص (لينكس)
+FS_IOC_FIEMAP = 0xC020660B
+
+# بصمات المحتوى
+HASH_CHUNK_SIZE = 1024 * 1024
+PARTIAL_HASH_SIZE = 64 * 1024
+VERIFY_WAVE_FILES = 64     # أقل عدد ملفات في كل دفعة تحقق (تُكمل المجموعة الأخيرة)
+
+# النسخ المتحقق بين الأجهزة (النقل إلى جهاز آخر)
+COPY_CHUNK_SIZE = 8 * 1024 * 1024  # حجم كل استدعاء نسخ ومقارنة (مضاعف لحبيبات mmap)
+# طرق النسخ بالترتيب: داخل النواة أولاً ثم القراءة والكتابة العادية
+COPY_METHODS = tuple(m for m in ('copy_file_range', 'sendfile') if hasattr(os, m)) + ('read',)
+# أخطاء تعني أن طريقة النسخ غير مدعومة بين هذين النظامين فتُجرب التالية
+COPY_FALLBACK_ERRORS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF}
+
+# نقاط استئناف الفحص
+CHECKPOINT_DIR = ".file_finder_checkpoints"
+CHECKPOINT_VERSION = 1
+CHECKPOINT_INTERVAL = 30  # ثانية
+
+# الفرز الخارجي بذاكرة محدودة
+SORT_ENTRY_BYTES = 240     # تقدير ذاكرة مفتاح الفرز الواحد في بايثون (صف + أعداد + نص)
+SORT_RUN_FORMAT = struct.Struct('<QQqQH')  # الحجم، رقم السجل، موقعه في ملف السجلات، بصمة هويته، طول الامتداد
+
+# التقدير السريع بالعينات
+QUICK_ESTIMATE_SECONDS = 5.0    # ميزانية الوقت للتقدير
+QUICK_FILES_PER_DIR = 32        # أقصى عدد ملفات يُقرأ حجمها من كل مجلد في العينة
+QUICK_REPLICATES = 8            # عدد العينات المستقلة لحساب فترات الثقة
+
+# مراقبة المجلدات (inotify)
+WATCH_DEBOUNCE = 0.5      # ثانية هدوء قبل إرسال دفعة التغييرات
+WATCH_MAX_DELAY = 3.0     # أقصى تأخير لدفعة تحت سيل أحداث متواصل
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+INOTIFY_EVENT = struct.Struct('iIII')  # wd, mask, cookie, len
+
+# أجزاء الفحص الموزع
+SHARD_FORMAT = "fsdf-shard"
+SHARD_VERSION = 1
+SHARD_EXTENSION = ".fsdshard"
+LOCAL_HOST = socket.gethostname()
+
+# جدول المجلدات: عدد المسارات المبنية المحفوظة مؤقتاً
+DIRECTORY_PATH_CACHE = 4096
+
+# فهرس المحتوى عبر الأقراص
+CATALOG_FILE = os.path.join(os.path.expanduser("~"), ".file_finder_catalog.sqlite")
+BLOOM_BITS_PER_ITEM = 10   # ~1% إيجابيات كاذبة مع 7 دوال
+BLOOM_HASHES = 7
+CATALOG_QUERY_BATCH = 500  # عدد الأحجام في كل استعلام للفهرس
+SIZE_KEY = struct.Struct('<Q')
+
+# الملفات المعروفة (مجموعات مرجعية)
+REFERENCE_HASH_BATCH = 64  # عدد المرشحين الذين تُحسب بصماتهم معاً
+REFERENCE_ALGORITHMS = {32: 'md5', 40: 'sha1', 64: 'sha256', 128: 'sha512'}  # حسب طول البصمة
+INTERNAL_HASH = 'blake2b-128'  # بصمة السجلات (file_digest) في اللقطات والأجزاء
+
+# البحث داخل الأرشيفات
+ARCHIVE_SEPARATOR = "::"  # مسار العضو الافتراضي: مسار الأرشيف::المسار داخله
+ZIP_EXTENSIONS = ('.zip', '.jar', '.war', '.apk', '.whl')
+TAR_EXTENSIONS = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+ARCHIVE_BATCH = 16        # عدد الأرشيفات التي تُقرأ فهارسها معاً
+ARCHIVE_REPORT_PAIRS = 10  # أزواج الأرشيفات المعروضة في السجل
+
+# كشف نوع المحتوى من التواقيع (magic bytes)
+TYPE_HEADER_SIZE = 8192  # ما يُقرأ من أول الملف لكشف نوعه
+MAGIC_SIGNATURES = (  # (الإزاحة، التوقيع، النوع) - الأطول أولاً عند اشتراك البداية
+    (0, b'\x89PNG\r\n\x1a\n', 'png'), (0, b'\xff\xd8\xff', 'jpeg'),
+    (0, b'GIF87a', 'gif'), (0, b'GIF89a', 'gif'), (0, b'II*\x00', 'tiff'), (0, b'MM\x00*', 'tiff'),
+    (0, b'8BPS', 'psd'), (0, b'BM', 'bmp'), (4, b'ftyp', 'isobmff'), (0, b'RIFF', 'riff'),
+    (0, b'\x1a\x45\xdf\xa3', 'matroska'), (0, b'ID3', 'mp3'), (0, b'\xff\xfb', 'mp3'),
+    (0, b'fLaC', 'flac'), (0, b'OggS', 'ogg'), (0, b'%PDF-', 'pdf'),
+    (0, b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'ole'), (0, b'PK\x03\x04', 'zip'), (0, b'PK\x05\x06', 'zip'),
+    (0, b'Rar!\x1a\x07', 'rar'), (0, b'7z\xbc\xaf\x27\x1c', '7z'), (0, b'\x1f\x8b', 'gzip'),
+    (0, b'BZh', 'bzip2'), (0, b'\xfd7zXZ\x00', 'xz'), (0, b'\x28\xb5\x2f\xfd', 'zstd'),
+    (257, b'ustar', 'tar'), (0, b'\x7fELF', 'elf'), (0, b'MZ', 'exe'), (0, b'\xca\xfe\xba\xbe', 'class'),
+    (0, b'SQLite format 3\x00', 'sqlite'), (0, b'wOFF', 'woff'), (0, b'wOF2', 'woff2')
+)
+RIFF_TYPES = {b'WAVE': 'wav', b'AVI ': 'avi', b'WEBP': 'webp'}
+
+# التشابه التقريبي (MinHash/LSH)
+SKETCH_SIZE = 64                 # عدد قيم توقيع MinHash لكل ملف
+LSH_ROWS = 4                     # صفوف كل شريط: 16 شريطاً، عتبة المرشحين نحو (1/16)^(1/4) = 50%
+SKETCH_WINDOWS = 8               # أقل عدد نوافذ عينة في الملف
+SKETCH_WINDOW_SIZE = 32 * 1024
+DEFAULT_SIMILARITY = 70          # أدنى تشابه مقدّر (%) لضم ملفين في عنقود واحد
+SHINGLE_ANCHOR = re.compile(rb'\n|\xff[\x00-\x0f]')  # حدود القطع تحددها البايتات لا الإزاحة
+SKETCH_MIX = 0x9E3779B97F4A7C15  # ضرب فيبوناتشي لنشر بصمة CRC32 على 64 بت
+
+# تحليل القطع المشتركة (تقطيع بحدود يحددها المحتوى)
+CHUNK_CACHE_FILE = os.path.join(os.path.expanduser("~"), ".file_finder_chunks.sqlite")
+CHUNK_MIN_SIZE = 2 * 1024
+CHUNK_MAX_SIZE = 64 * 1024
+CHUNK_WINDOW = 16                # عرض النافذة المتدحرجة عند كل مرشح حد
+CHUNK_MASK = 0x7F                # حد واحد لكل 128 مرشحاً تقريباً (قطع بمتوسط ~8-16 KB)
+CHUNK_CANDIDATE = re.compile(rb'[\n\x00\xff]')  # بايتات مرشحة للحدود
+CHUNK_READ_SIZE = 1024 * 1024
+CHUNK_REPORT_FILES = 5           # الملفات الأخرى المعروضة في تقرير كل ملف
+CHUNK_AUTO_LIMIT = 1024 ** 3     # أكبر حجم مجموعة يُحلل تلقائياً عند النقر (الأكبر من القائمة)
+
+# قواعد التحديد: الملف الذي يُبقى في كل مجموعة (وتُحدد البقية للعزل)
+KEEP_POLICIES = {
+    'newest': "الأحدث تعديلاً",
+    'oldest': "الأقدم تعديلاً",
+    'largest': "الأكبر حجماً",
+    'shortest_path': "أقصر مسار",
+    'priority': "أولوية المسارات"
+}
+
+# لقطات الفحص الثنائية
+SNAPSHOT_MAGIC = b"FSDSNAP\0"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_EXTENSION = ".fsdsnap"
+SNAPSHOT_HEADER = struct.Struct('<8sHHIQI')  # التوقيع، الإصدار، أعلام، عدد السجلات، طول المتن، CRC32
+SNAPSHOT_SECTIONS = (
+    'meta', 'dirs', 'names', 'size_deltas', 'size_overflow', 'dir_ids',
+    'ext_ids', 'root_ids', 'host_ids', 'created_ids', 'modified_ids', 'type_ids', 'hashes'
+)
+SNAPSHOT_FLAG_HASHES = 0x1
+# أعمدة الأرقام (uint32) إلى الجداول المشتركة
+SNAPSHOT_COLUMNS = ('dir_ids', 'ext_ids', 'root_ids', 'host_ids', 'created_ids', 'modified_ids', 'type_ids')
+SNAPSHOT_EXTRA_KEYS = ('links', 'inode', 'path', 'archive', 'crc')  # حقول نادرة تُخزن في جدول جانبي مع رقم السجل
+LAST_SNAPSHOT_FILE = os.path.join(os.path.expanduser("~"), ".file_finder_last" + SNAPSHOT_EXTENSION)
+
 # ألوان المجموعات
 GROUP_COLORS = [
     "#E3F2FD", "#E8F5E9", "#FFF3E0", "#F3E5F5", "#E0F7FA",
@@ -98,6 +289,3348 @@ class OperationBatch:
     total_size: int
     operations: List[dict]
     restored: bool = False
+    source_folders: List[str] = field(default_factory=list)
+    dest_folders: List[str] = field(default_factory=list)
+
+
+@dataclass
+class ScanFilters:
+    """مرشحات الفحص - تُطبق داخل الماسح قبل بناء سجلات الملفات"""
+    include_patterns: List[str] = field(default_factory=list)
+    exclude_patterns: List[str] = field(default_factory=list)
+    min_size: int = 0
+    max_size: int = 0           # 0 = بلا حد أعلى
+    skip_hidden: bool = False
+    exclude_dirs: List[str] = field(default_factory=list)
+    max_depth: int = 0          # 0 = المجلد نفسه فقط، -1 = بلا حد
+
+    def __post_init__(self):
+        self._include = _compile_patterns(self.include_patterns)
+        self._exclude = _compile_patterns(self.exclude_patterns)
+        self._exclude_dirs = _compile_patterns(self.exclude_dirs)
+
+    def accepts_name(self, name: str) -> bool:
+        """فحص اسم الملف قبل قراءة بياناته"""
+        if self.skip_hidden and name.startswith('.'):
+            return False
+        lowered = name.lower()
+        if self._include and not self._include.match(lowered):
+            return False
+        if self._exclude and self._exclude.match(lowered):
+            return False
+        return True
+
+    def accepts_size(self, size: int) -> bool:
+        if size < self.min_size:
+            return False
+        if self.max_size and size > self.max_size:
+            return False
+        return True
+
+    def accepts_dir(self, name: str, depth: int) -> bool:
+        """هل ندخل المجلد الفرعي؟ (depth = عمق المجلد الفرعي نفسه)"""
+        if self.max_depth >= 0 and depth > self.max_depth:
+            return False
+        if name == OUTPUT_FOLDER_NAME:
+            return False
+        if self.skip_hidden and name.startswith('.'):
+            return False
+        if self._exclude_dirs and self._exclude_dirs.match(name.lower()):
+            return False
+        return True
+
+
+def _compile_patterns(patterns: List[str]):
+    """تجميع أنماط glob في تعبير نمطي واحد (بدون حساسية لحالة الأحرف)"""
+    patterns = [p.strip().lower() for p in patterns if p and p.strip()]
+    if not patterns:
+        return None
+    return re.compile("|".join(fnmatch.translate(p) for p in patterns))
+
+
+def parse_patterns(text: str, separators: str = ";,") -> List[str]:
+    """
+    تحويل نص مثل '*.mp4; *.mkv' إلى قائمة أنماط. مدخلات الأولوية مسارات قد تحوي فاصلة،
+    فتُفصل بـ ';' وحدها (separators=";").
+    """
+    return [p.strip() for p in re.split(f"[{re.escape(separators)}]", text or "") if p.strip()]
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# تحديد معدل الإدخال والإخراج
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class TokenBucket:
+    """
+    دلو رموز مشترك بين الخيوط: يمتلئ بمعدل rate وحدة/ث حتى سعة THROTTLE_BURST ثانية.
+    الطلب الأكبر من المتاح يُسجَّل ديناً ينتظر صاحبه سداده، فيبقى المعدل الوسطي مضبوطاً
+    حتى مع ملفات أكبر من سعة الدلو. rate = 0 يعني بلا حد، ويمكن تغييره أثناء الانتظار.
+    """
+    
+    def __init__(self, rate: float = 0):
+        self.rate = 0.0
+        self.tokens = 0.0
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+        self.set_rate(rate)
+    
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate > 0:
+            self.tokens = min(self.rate * THROTTLE_BURST, self.tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+    
+    def set_rate(self, rate: float):
+        with self._lock:
+            self._refill()
+            unlimited = self.rate <= 0
+            self.rate = max(0.0, float(rate))
+            # الدلو يبدأ ممتلئاً عند تفعيل الحد، ويُقص عند خفضه
+            capacity = self.rate * THROTTLE_BURST
+            self.tokens = capacity if unlimited else min(self.tokens, capacity)
+    
+    def acquire(self, amount: float, should_continue=None) -> float:
+        """حجز amount وحدة والانتظار حتى يُسدد ما تجاوز المتاح؛ يُرجع مدة الانتظار"""
+        if amount <= 0:
+            return 0.0
+        with self._lock:
+            if self.rate <= 0:
+                return 0.0
+            self._refill()
+            self.tokens -= amount
+            # كل طالب ينتظر دينه مع ديون من سبقه، فلا يستيقظ الجميع معاً
+            remaining = -self.tokens
+        
+        waited = 0.0
+        while remaining > 0 and not (should_continue and not should_continue()):
+            rate = self.rate
+            if rate <= 0:
+                break
+            delay = min(remaining / rate, THROTTLE_SLICE)
+            time.sleep(delay)
+            remaining -= delay * rate
+            waited += delay
+        return waited
+
+
+def set_thread_priority(nice: int, ioprio: int):
+    """
+    خفض أولوية المعالج والقرص للخيط الحالي. على لينكس تنطبق nice وioprio على الخيط
+    وحده عند تمرير 0؛ الأخطاء تُتجاهل لأن الأولوية تحسين وليست شرطاً.
+    """
+    if not hasattr(os, 'setpriority'):
+        return
+    try:
+        os.setpriority(os.PRIO_PROCESS, 0, max(nice, os.getpriority(os.PRIO_PROCESS, 0)))
+    except OSError:
+        pass
+    number = IOPRIO_SET_SYSCALL.get(os.uname().machine) if sys.platform.startswith('linux') else None
+    if number:
+        try:
+            ctypes.CDLL(None, use_errno=True).syscall(number, IOPRIO_WHO_PROCESS, 0, ioprio)
+        except (OSError, AttributeError):
+            pass
+
+
+def crosses_device(source: str, dest: str) -> bool:
+    """هل النقل من source إلى dest بين جهازين (فيُنسخ المحتوى بدلاً من إعادة التسمية)؟"""
+    parent = os.path.dirname(dest)
+    while not os.path.exists(parent) and os.path.dirname(parent) != parent:
+        parent = os.path.dirname(parent)
+    try:
+        return os.stat(source).st_dev != os.stat(parent).st_dev
+    except OSError:
+        return False
+
+
+class IOThrottle:
+    """
+    حدود مشتركة بين كل خيوط العمل: بايتات/ث وعمليات/ث (دلوا رموز)، وإيقاف مؤقت
+    ما دام متوسط حمل النظام أعلى من max_load، وأولوية منخفضة (nice/ionice) للخيوط.
+    النافذة تحتفظ بنسخة واحدة وتغيّر حدودها أثناء التشغيل عبر set_limits؛ الأولوية
+    تُطبق على كل خيط مرة واحدة عند أول عملية له ولا تُرفع لاحقاً (تتطلب صلاحيات).
+    on_notice(message) يُستدعى عند الإيقاف المؤقت والاستئناف (قد يُستدعى من خيوط مختلفة).
+    """
+    
+    def __init__(self, bytes_per_sec: float = 0, ops_per_sec: float = 0, max_load: float = 0.0,
+                 low_priority: bool = False, on_notice=None):
+        self.bytes = TokenBucket()
+        self.ops = TokenBucket()
+        self.max_load = 0.0
+        self.low_priority = low_priority
+        self.on_notice = on_notice
+        self.waited = 0.0  # ثوانٍ قضتها الخيوط في انتظار الحدود
+        self.paused = 0.0  # ثوانٍ قضتها الخيوط في انتظار انخفاض الحمل
+        self._is_paused = False
+        self._load = (float('-inf'), 0.0)  # (وقت القراءة، متوسط الحمل)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.set_limits(bytes_per_sec, ops_per_sec, max_load)
+    
+    def set_limits(self, bytes_per_sec: float, ops_per_sec: float, max_load: float):
+        self.bytes.set_rate(bytes_per_sec)
+        self.ops.set_rate(ops_per_sec)
+        self.max_load = max(0.0, float(max_load))
+    
+    def system_load(self) -> float:
+        """متوسط حمل الدقيقة الأخيرة، يُقرأ مرة كل LOAD_CHECK_INTERVAL على الأكثر"""
+        with self._lock:
+            stamp, load = self._load
+            now = time.monotonic()
+            if now - stamp >= LOAD_CHECK_INTERVAL:
+                try:
+                    load = os.getloadavg()[0]
+                except (OSError, AttributeError):
+                    load = 0.0
+                self._load = (now, load)
+            return load
+    
+    def _notice(self, paused: bool, load: float = 0.0):
+        with self._lock:
+            if self._is_paused == paused:
+                return
+            self._is_paused = paused
+        if self.on_notice:
+            self.on_notice(
+                f"⏸️ إيقاف مؤقت: حمل النظام {load:.1f} أعلى من {self.max_load:g}" if paused
+                else "▶️ استئناف: انخفض حمل النظام"
+            )
+    
+    def wait_for_load(self, should_continue=None) -> float:
+        waited = 0.0
+        while self.max_load and not (should_continue and not should_continue()):
+            load = self.system_load()
+            if load <= self.max_load:
+                if waited:
+                    self._notice(False)
+                break
+            self._notice(True, load)
+            time.sleep(THROTTLE_SLICE)
+            waited += THROTTLE_SLICE
+        return waited
+    
+    def before(self, nbytes: int, should_continue=None, ops: int = 1):
+        """الانتظار قبل ops عملية تنقل أو تقرأ nbytes بايت (ops=0: دفعة من عملية جارية)"""
+        if self.low_priority and not getattr(self._local, 'lowered', False):
+            self._local.lowered = True
+            set_thread_priority(LOW_PRIORITY_NICE, IOPRIO_LOW)
+        paused = self.wait_for_load(should_continue)
+        waited = self.ops.acquire(ops, should_continue) + self.bytes.acquire(nbytes, should_continue)
+        if paused or waited:
+            with self._lock:
+                self.paused += paused
+                self.waited += waited
+    
+    def metered(self, nbytes: int, should_continue, func, *args):
+        """
+        تنفيذ func(*args) مع حساب بايتاتها على دفعات من داخل حلقات القراءة والنسخ
+        (charge_io) بدل دفعة واحدة قبلها، فلا تنطلق القراءة الطويلة بعد الانتظار بأقصى
+        سرعة القرص. ما لم تحسبه الحلقات من nbytes يُحسب عند الانتهاء.
+        """
+        meter = {'throttle': self, 'should_continue': should_continue, 'charged': 0}
+        previous = getattr(_io_meter, 'current', None)
+        _io_meter.current = meter
+        try:
+            result = func(*args)
+        finally:
+            _io_meter.current = previous
+        if nbytes > meter['charged']:
+            self.before(nbytes - meter['charged'], should_continue, ops=0)
+        return result
+    
+    def take_report(self) -> List[str]:
+        """أسطر زمن الانتظار منذ آخر تقرير (مجموع الخيوط) ثم تصفير العدادات"""
+        with self._lock:
+            waited, paused = self.waited, self.paused
+            self.waited = self.paused = 0.0
+        lines = []
+        if waited >= 0.1:
+            lines.append(f"🚦 انتظار حدود المعدل: {waited:.1f} ث (مجموع الخيوط)")
+        if paused >= 0.1:
+            lines.append(f"⏸️ إيقاف بسبب حمل النظام: {paused:.1f} ث (مجموع الخيوط)")
+        return lines
+
+
+_io_meter = threading.local()
+
+
+def charge_io(nbytes: int):
+    """
+    حساب nbytes قُرئت أو نُسخت للتو على حد معدل العملية الجارية في هذا الخيط
+    (IOThrottle.metered)؛ لا يفعل شيئاً خارجها
+    """
+    meter = getattr(_io_meter, 'current', None)
+    if meter is not None:
+        meter['charged'] += nbytes
+        meter['throttle'].before(nbytes, meter['should_continue'], ops=0)
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# محرك الإدخال والإخراج المتزامن
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class ConcurrencyTuner:
+    """
+    ضبط التوازي أثناء التشغيل بتسلق التل: لكل مفتاح (المرحلة@الجهاز) تُقاس الإنتاجية
+    كل TUNE_INTERVAL ثانية؛ إن تحسنت يستمر التغيير في نفس الاتجاه، وإن تراجعت ينعكس،
+    وعند الثبات يُفضّل التوازي الأقل. القيم المختارة تُقرأ من الإعدادات وتُحفظ فيها لكل جذر.
+    on_decision(message) يُستدعى عند كل تغيير (قد يُستدعى من خيوط مختلفة).
+    """
+    
+    def __init__(self, initial: Optional[Dict[str, int]] = None, on_decision=None):
+        self.values = dict(initial or {})
+        self.on_decision = on_decision
+        self._state = {}
+        self._lock = threading.Lock()
+    
+    def value(self, key: str, default: int) -> int:
+        with self._lock:
+            return self.values.setdefault(key, max(1, int(default)))
+    
+    def adjust(self, key: str, rate: float, unit_bytes: bool) -> int:
+        """تسجيل إنتاجية الفترة الأخيرة وإرجاع التوازي للفترة التالية"""
+        with self._lock:
+            current = self.values[key]
+            state = self._state.setdefault(key, {'direction': 1, 'rate': None})
+            previous = state['rate']
+            if previous is not None:
+                if rate < previous * (1 - TUNE_TOLERANCE):
+                    state['direction'] = -state['direction']
+                elif rate <= previous * (1 + TUNE_TOLERANCE):
+                    state['direction'] = -1
+            state['rate'] = rate
+            step = max(1, current // 4)
+            new = min(TUNE_MAX_CONCURRENCY, max(1, current + state['direction'] * step))
+            self.values[key] = new
+        
+        if new != current and self.on_decision:
+            speed = f"{format_size(rate)}/ث" if unit_bytes else f"{rate:.0f} عملية/ث"
+            self.on_decision(f"🎚️ {key}: التوازي {current} ← {new} (الإنتاجية {speed})")
+        return new
+
+
+class AsyncIOEngine:
+    """
+    محرك إدخال/إخراج يُبقي عدة عمليات (stat / قراءة / نقل) قيد التنفيذ في آن واحد.
+    حلقة asyncio تدير نافذة محدودة من المهام فوق منفذ خيوط محدود الحجم، فتبقى
+    وصلة الشبكة مشغولة على NFS/SMB بدلاً من انتظار كل رحلة ذهاب وإياب على حدة.
+    injected_latency: تأخير مصطنع قبل كل عملية (لقياس الأداء دون مشاركة شبكية حقيقية).
+    throttle: حدود معدل مشتركة يُنتظر عندها قبل كل عملية (وأثناء قراءة الملفات الكبيرة).
+    """
+    
+    def __init__(self, concurrency: int = DEFAULT_IO_CONCURRENCY, injected_latency: float = 0.0,
+                 tuner: Optional[ConcurrencyTuner] = None, tune_key: str = "",
+                 throttle: Optional[IOThrottle] = None):
+        self.tuner = tuner if tune_key else None
+        self.tune_key = tune_key
+        self.concurrency = tuner.value(tune_key, concurrency) if self.tuner else max(1, int(concurrency))
+        self.injected_latency = injected_latency
+        self.throttle = throttle
+        self._throttle_args = (None, None)  # (should_continue, cost_of) للاستدعاء الجاري
+        self.files_done = 0
+        self.bytes_done = 0
+        self.busy_seconds = 0.0
+        self._loop = None
+        self._executor = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def close(self):
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._loop:
+            self._loop.close()
+            self._loop = None
+    
+    def _call(self, func, item):
+        if self.injected_latency:
+            time.sleep(self.injected_latency)
+        if not self.throttle:
+            return func(item)
+        should_continue, cost_of = self._throttle_args
+        cost = cost_of(item) if cost_of else 0
+        if cost <= THROTTLE_STEP:
+            self.throttle.before(cost, should_continue)
+            return func(item)
+        # الملف الكبير تُحسب بايتاته أثناء قراءته ونسخه (charge_io)
+        self.throttle.before(0, should_continue)
+        return self.throttle.metered(cost, should_continue, func, item)
+    
+    def map(self, func, items, should_continue=None, on_result=None, bytes_of=None,
+            cost_of=None) -> list:
+        """
+        تنفيذ func على كل عنصر مع إبقاء concurrency عملية على الأكثر قيد التنفيذ.
+        النتائج بنفس ترتيب العناصر؛ الاستثناءات تُعاد كقيم، والعناصر التي لم تبدأ
+        بسبب الإيقاف تبقى None. on_result(index, result) يُستدعى عند اكتمال كل عنصر.
+        bytes_of(item): عدد البايتات المقروءة لكل عنصر، لحساب الإنتاجية.
+        cost_of(item): البايتات المحسوبة على حد المعدل (الافتراضي bytes_of).
+        """
+        items = list(items)
+        if not items:
+            return []
+        self._throttle_args = (should_continue, cost_of or bytes_of)
+        
+        start = time.perf_counter()
+        if (self.concurrency == 1 and not self.tuner) or len(items) == 1:
+            results = [None] * len(items)
+            for idx, item in enumerate(items):
+                if should_continue and not should_continue():
+                    break
+                try:
+                    results[idx] = self._call(func, item)
+                except Exception as e:
+                    results[idx] = e
+                if on_result:
+                    on_result(idx, results[idx])
+        else:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                # مع الضبط التلقائي قد تتسع النافذة؛ الخيوط تُنشأ عند الحاجة فقط
+                self._executor = ThreadPoolExecutor(
+                    max_workers=TUNE_MAX_CONCURRENCY if self.tuner else self.concurrency
+                )
+            results = self._loop.run_until_complete(
+                self._map_async(func, items, should_continue, on_result, bytes_of)
+            )
+        
+        if bytes_of:
+            self.busy_seconds += time.perf_counter() - start
+            for item, result in zip(items, results):
+                if result is not None and not isinstance(result, Exception):
+                    self.files_done += 1
+                    self.bytes_done += bytes_of(item)
+        return results
+    
+    def throughput_report(self) -> List[str]:
+        if not self.busy_seconds:
+            return []
+        speed = self.bytes_done / self.busy_seconds
+        return [
+            f"⚙️ توازي {self.concurrency}: {self.files_done} ملف، {format_size(self.bytes_done)} "
+            f"في {self.busy_seconds:.1f} ث = {format_size(speed)}/ث"
+        ]
+    
+    async def _map_async(self, func, items, should_continue, on_result, bytes_of=None):
+        loop = asyncio.get_running_loop()
+        results = [None] * len(items)
+        # وحدات العمل المكتملة في فترة القياس الحالية (بايتات أو عمليات)
+        window = {'start': time.perf_counter(), 'units': 0, 'count': 0}
+        
+        async def run_one(idx):
+            try:
+                results[idx] = await loop.run_in_executor(
+                    self._executor, self._call, func, items[idx]
+                )
+            except Exception as e:
+                results[idx] = e
+            window['count'] += 1
+            window['units'] += bytes_of(items[idx]) if bytes_of else 1
+            if on_result:
+                on_result(idx, results[idx])
+        
+        pending = set()
+        next_idx = 0
+        while next_idx < len(items) or pending:
+            elapsed = time.perf_counter() - window['start']
+            if self.tuner and elapsed >= TUNE_INTERVAL and window['count'] >= self.concurrency:
+                self.concurrency = self.tuner.adjust(
+                    self.tune_key, window['units'] / elapsed, bytes_of is not None
+                )
+                window.update(start=time.perf_counter(), units=0, count=0)
+            while (next_idx < len(items) and len(pending) < self.concurrency
+                   and not (should_continue and not should_continue())):
+                pending.add(asyncio.ensure_future(run_one(next_idx)))
+                next_idx += 1
+            if not pending:
+                break
+            _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        return results
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# جدولة القراءة حسب موقع البيانات على القرص
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def physical_offset(fd: int) -> Optional[int]:
+    """موقع أول امتداد للملف على القرص عبر FIEMAP (لينكس فقط)"""
+    if fcntl is None:
+        return None
+    # struct fiemap مع مساحة لامتداد واحد (struct fiemap_extent = 56 بايت)
+    request = struct.pack("=QQLLLL", 0, 0xFFFFFFFFFFFFFFFF, 0, 0, 1, 0) + bytes(56)
+    try:
+        reply = fcntl.ioctl(fd, FS_IOC_FIEMAP, request)
+    except OSError:
+        return None
+    mapped_extents = struct.unpack_from("=L", reply, 20)[0]
+    if not mapped_extents:
+        return None
+    return struct.unpack_from("=Q", reply, 32 + 8)[0]
+
+
+def disk_location(path: str) -> Tuple[int, int]:
+    """(الجهاز، موقع تقريبي على القرص): إزاحة FIEMAP إن توفرت وإلا رقم الـ inode"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        stat = os.fstat(fd)
+        offset = physical_offset(fd)
+        return stat.st_dev, offset if offset is not None else stat.st_ino
+    finally:
+        os.close(fd)
+
+
+def _block_device_dir(dev: int) -> Optional[str]:
+    path = f"/sys/dev/block/{os.major(dev)}:{os.minor(dev)}"
+    return os.path.realpath(path) if os.path.exists(path) else None
+
+
+def device_is_rotational(dev: int) -> bool:
+    """هل الجهاز قرص دوّار؟ الأقسام ترث القيمة من القرص الأب؛ غير المعروف يُعامل كـ SSD"""
+    device_dir = _block_device_dir(dev)
+    if not device_dir:
+        return False
+    for candidate in (device_dir, os.path.dirname(device_dir)):
+        try:
+            with open(os.path.join(candidate, "queue", "rotational")) as f:
+                return f.read().strip() == "1"
+        except OSError:
+            continue
+    return False
+
+
+def path_device_name(path: str) -> str:
+    """اسم الجهاز الذي يحمل المسار (مفتاح الضبط التلقائي للتوازي)"""
+    try:
+        return device_name(os.stat(path).st_dev)
+    except OSError:
+        return "?"
+
+
+def device_name(dev: int) -> str:
+    device_dir = _block_device_dir(dev)
+    if device_dir:
+        return os.path.basename(device_dir)
+    return f"{os.major(dev)}:{os.minor(dev)}"
+
+
+class DiskScheduler:
+    """
+    جدولة قراءة محتوى الملفات حسب الجهاز: على الأقراص الدوّارة تُقرأ الملفات بترتيب
+    موقعها الفعلي وبتوازي محدود لتجنب كثرة حركة رأس القراءة، وعلى SSD والشبكة
+    يُستخدم التوازي الكامل. كل جهاز يعمل بالتوازي مع الأجهزة الأخرى، وتُسجل إنتاجيته.
+    الواجهة نفسها في AsyncIOEngine.map، فيمكن تمريره أينما يُمرر المحرك.
+    """
+    
+    def __init__(self, concurrency: int = DEFAULT_IO_CONCURRENCY,
+                 hdd_concurrency: int = HDD_IO_CONCURRENCY,
+                 tuner: Optional[ConcurrencyTuner] = None, stage: str = "hash",
+                 throttle: Optional[IOThrottle] = None):
+        self.concurrency = max(1, int(concurrency))
+        self.hdd_concurrency = max(1, int(hdd_concurrency))
+        self.tuner = tuner
+        self.throttle = throttle
+        self.stage = stage
+        self.device_stats = {}
+        self._lock = threading.Lock()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def close(self):
+        pass
+    
+    def map(self, func, items, should_continue=None, on_result=None, bytes_of=None,
+            cost_of=None) -> list:
+        items = list(items)
+        if not items:
+            return []
+        # الضبط التلقائي يقيس بالبايتات إن عُرفت وإلا بعدد العمليات
+        tune_bytes_of = bytes_of
+        bytes_of = bytes_of or (lambda item: 0)
+        
+        with AsyncIOEngine(self.concurrency, throttle=self.throttle) as probe_engine:
+            locations = probe_engine.map(
+                lambda item: disk_location(record_path(item)), items, should_continue
+            )
+        
+        by_device = {}
+        for idx, location in enumerate(locations):
+            dev, offset = location if isinstance(location, tuple) else (None, 0)
+            by_device.setdefault(dev, []).append((offset, idx))
+        
+        results = [None] * len(items)
+        
+        def report(idx, result):
+            if on_result:
+                with self._lock:
+                    on_result(idx, result)
+        
+        def run_device(dev, entries):
+            rotational = dev is not None and device_is_rotational(dev)
+            if rotational:
+                entries.sort()
+            order = [idx for _, idx in entries]
+            concurrency = self.hdd_concurrency if rotational else self.concurrency
+            tune_key = f"{self.stage}@{device_name(dev)}" if self.tuner and dev is not None else ""
+            
+            start = time.perf_counter()
+            with AsyncIOEngine(concurrency, tuner=self.tuner, tune_key=tune_key,
+                               throttle=self.throttle) as engine:
+                device_results = engine.map(
+                    func, [items[idx] for idx in order], should_continue,
+                    lambda pos, result: report(order[pos], result),
+                    bytes_of=tune_bytes_of, cost_of=cost_of
+                )
+                concurrency = engine.concurrency
+            elapsed = time.perf_counter() - start
+            
+            done_bytes = 0
+            done_files = 0
+            for idx, result in zip(order, device_results):
+                results[idx] = result
+                if result is not None and not isinstance(result, Exception):
+                    done_files += 1
+                    done_bytes += bytes_of(items[idx])
+            
+            with self._lock:
+                stats = self.device_stats.setdefault(dev, {
+                    'device': device_name(dev) if dev is not None else "?",
+                    'rotational': rotational,
+                    'concurrency': concurrency,
+                    'files': 0, 'bytes': 0, 'seconds': 0.0
+                })
+                stats['concurrency'] = concurrency
+                stats['files'] += done_files
+                stats['bytes'] += done_bytes
+                stats['seconds'] += elapsed
+        
+        threads = [
+            threading.Thread(target=run_device, args=(dev, entries), daemon=True)
+            for dev, entries in by_device.items()
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+    
+    def throughput_report(self) -> List[str]:
+        """سطر لكل جهاز: النوع والتوازي والإنتاجية"""
+        lines = []
+        for stats in self.device_stats.values():
+            kind = "HDD" if stats['rotational'] else "SSD/شبكة"
+            speed = stats['bytes'] / stats['seconds'] if stats['seconds'] else 0
+            lines.append(
+                f"💽 {stats['device']} ({kind}، توازي {stats['concurrency']}): "
+                f"{stats['files']} ملف، {format_size(stats['bytes'])} "
+                f"في {stats['seconds']:.1f} ث = {format_size(speed)}/ث"
+            )
+        return lines
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# الماسح
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def _is_hidden_entry(entry: os.DirEntry) -> bool:
+    if entry.name.startswith('.'):
+        return True
+    if sys.platform == "win32":
+        try:
+            # FILE_ATTRIBUTE_HIDDEN - متاح دون كلفة إضافية على ويندوز
+            return bool(entry.stat(follow_symlinks=False).st_file_attributes & 2)
+        except (OSError, AttributeError):
+            return False
+    return False
+
+
+class DirectoryTable:
+    """
+    جدول مجلدات بلا تكرار على شكل شجرة بادئات: كل مجلد عقدة (رقم الأب، اسم المقطع)،
+    فيُخزن كل مقطع مسار مرة واحدة مهما تكرر في مسارات الملفات. سجلات الملفات تحمل
+    رقم المجلد واسم الملف فقط، والمسار الكامل يُبنى عند الحاجة.
+    """
+    
+    def __init__(self):
+        self.parents = array('i')  # -1 للجذر
+        self.segments = []
+        self.ids = {}  # (رقم الأب، المقطع) -> رقم المجلد
+        self._lock = threading.Lock()
+        self._last = (None, -1)  # الماسح يمر على ملفات المجلد الواحد متتالية
+        self.path = lru_cache(maxsize=DIRECTORY_PATH_CACHE)(self._path)
+    
+    def __len__(self):
+        return len(self.segments)
+    
+    def clear(self):
+        """إفراغ الجدول؛ أرقام المجلدات السابقة لم تعد صالحة"""
+        with self._lock:
+            self.parents = array('i')
+            self.segments = []
+            self.ids = {}
+            self._last = (None, -1)
+            self.path.cache_clear()
+    
+    def intern(self, path: str) -> int:
+        """رقم المجلد (يُضاف مع آبائه إن لم يكن موجوداً)"""
+        last_path, last_id = self._last
+        if path == last_path:
+            return last_id
+        with self._lock:
+            dir_id = self._intern(path)
+        self._last = (path, dir_id)
+        return dir_id
+    
+    def _intern(self, path: str) -> int:
+        parent_path, segment = os.path.split(path)
+        if not segment:
+            # جذر نظام الملفات ("/" أو "C:\\") أو مسار نسبي فارغ
+            parent, segment = -1, path
+        else:
+            parent = self._intern(parent_path)
+        key = (parent, segment)
+        dir_id = self.ids.get(key)
+        if dir_id is None:
+            dir_id = self.ids[key] = len(self.segments)
+            self.parents.append(parent)
+            self.segments.append(segment)
+        return dir_id
+    
+    def _path(self, dir_id: int) -> str:
+        parent = self.parents[dir_id]
+        if parent < 0:
+            return self.segments[dir_id]
+        return os.path.join(self.path(parent), self.segments[dir_id])
+
+
+# جدول مشترك لكل السجلات في العملية وأرقام ملفات ثابتة حتى الفحص التالي
+DIRECTORIES = DirectoryTable()
+_file_ids = count(1)
+
+
+def reset_record_tables():
+    """
+    بدء جدول المجلدات وأرقام الملفات من جديد لفحص أو لقطة جديدة، فلا تتراكم مجلدات
+    كل الفحوص السابقة طوال الجلسة. السجلات السابقة تفقد مساراتها، فلا يُستدعى إلا بعد
+    التخلي عنها كلها.
+    """
+    global _file_ids
+    DIRECTORIES.clear()
+    _file_ids = count(1)
+
+
+def record_path(file_info: dict) -> str:
+    """المسار الكامل لسجل ملف (يُبنى من جدول المجلدات)"""
+    path = file_info.get('path')
+    if path is None:
+        path = os.path.join(DIRECTORIES.path(file_info['dir']), file_info['name'])
+    return path
+
+
+def intern_record(data: dict) -> dict:
+    """سجل مقروء من ملف (بمسار كامل) -> سجل برقم مجلد ورقم ملف جديد"""
+    path = data.get('path')
+    if path is not None:
+        folder, name = os.path.split(path)
+        # سجلات افتراضية قد لا يطابق اسمها آخر مقطع من المسار فيبقى مسارها كما هو
+        if name == data['name']:
+            del data['path']
+            data['dir'] = DIRECTORIES.intern(folder)
+    data['id'] = next(_file_ids)
+    return data
+
+
+def record_data(file_info: dict) -> dict:
+    """نسخة قابلة للتخزين خارج العملية: المسار الكامل بدلاً من رقمي المجلد والملف"""
+    data = {key: value for key, value in file_info.items() if key not in ('dir', 'id')}
+    data['path'] = record_path(file_info)
+    return data
+
+
+def make_file_record(path: str, name: str, stat: os.stat_result, root: str = "") -> dict:
+    """بناء سجل ملف من نتيجة stat"""
+    return {
+        'id': next(_file_ids),
+        'dir': DIRECTORIES.intern(os.path.dirname(path)),
+        'name': name,
+        'root': root,
+        'size': stat.st_size,
+        'ext': os.path.splitext(name)[1].lower(),
+        'created': datetime.fromtimestamp(stat.st_ctime).strftime("%Y-%m-%d %H:%M"),
+        'modified': datetime.fromtimestamp(stat.st_mtime).strftime("%Y-%m-%d %H:%M")
+    }
+
+
+def _list_dir(path: str) -> list:
+    with os.scandir(path) as it:
+        return list(it)
+
+
+def _stat_entry(entry: os.DirEntry) -> os.stat_result:
+    return entry.stat(follow_symlinks=False)
+
+
+def admit_file(path: str, name: str, stat: os.stat_result, root: str, filters: ScanFilters,
+               seen_inodes: Optional[dict] = None) -> Optional[dict]:
+    """
+    سجل ملف من نتيجة stat دون اتباع الروابط الرمزية، أو None إن لم يكن ملفاً عادياً
+    أو رفضت المرشحات حجمه أو كان رابطاً صلباً لملف سبق جمعه (يُضاف إلى روابط سجله الأول).
+    الروابط الرمزية لا تُجمع: هي والملف الذي تشير إليه نفس البيانات، ونقلها يترك رابطاً معلقاً.
+    بدون seen_inodes يحمل كل رابط صلب سجله الخاص مع inode، ويُدمج لاحقاً (الفرز الخارجي).
+    """
+    if not S_ISREG(stat.st_mode) or not filters.accepts_size(stat.st_size):
+        return None
+    record = make_file_record(path, name, stat, root)
+    if stat.st_nlink > 1 and stat.st_ino:
+        key = (stat.st_dev, stat.st_ino)
+        record['inode'] = [stat.st_dev, stat.st_ino]
+        if seen_inodes is not None:
+            first = seen_inodes.get(key)
+            if first is not None:
+                # رابط صلب لملف سبق جمعه - نفس البيانات على القرص
+                first.setdefault('links', []).append(path)
+                return None
+            seen_inodes[key] = record
+    return record
+
+
+def admit_path(path: str, roots: List[str], filters: ScanFilters) -> Optional[dict]:
+    """
+    سجل ملف واحد كما يبنيه فحص الجذور roots بالمرشحات filters، أو None إن كان خارجها
+    أو في مجلد لا يدخله الفحص (مستبعد أو أعمق من الحد) أو رفضت المرشحات اسمه أو حجمه
+    """
+    for root in normalize_roots(roots):
+        relative = os.path.relpath(os.path.dirname(path), root)
+        if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+            continue
+        parts = [] if relative == os.curdir else relative.split(os.sep)
+        if not all(filters.accepts_dir(name, depth) for depth, name in enumerate(parts, 1)):
+            return None
+        name = os.path.basename(path)
+        if not filters.accepts_name(name):
+            return None
+        try:
+            return admit_file(path, name, os.stat(path, follow_symlinks=False), root, filters)
+        except OSError:
+            return None
+    return None
+
+
+def scan_files(root: str, filters: ScanFilters, should_continue=None, on_progress=None,
+               seen_inodes: Optional[dict] = None, engine: Optional[AsyncIOEngine] = None,
+               state: Optional[dict] = None, on_batch_done=None):
+    """
+    مولّد يمر على الملفات تحت root ويُرجع سجلات الملفات المقبولة فقط.
+    الأسماء تُفحص قبل stat، والأحجام قبل بناء السجل، والمجلدات المستبعدة لا تُفتح أصلاً.
+    on_progress(fraction, found) يُستدعى أثناء الاستعراض بنسبة تقريبية بين 0 و 1.
+    seen_inodes: قاموس مشترك (st_dev, st_ino) -> سجل، تُدمج فيه الروابط الصلبة في سجل واحد.
+    engine: محرك الإدخال/الإخراج؛ تُقرأ عدة مجلدات وتُنفذ عدة stat بالتوازي بحسب concurrency.
+    state: حالة الاستعراض (المجلدات المتبقية والعدادات)، تُحدّث في مكانها ويمكن الاستئناف منها.
+    on_batch_done() يُستدعى بعد كل دفعة مجلدات مكتملة، حين تطابق الحالةُ السجلاتِ المُرجعة.
+    """
+    engine = engine or AsyncIOEngine(1)
+    state = state if state is not None else {}
+    stack = state.setdefault('stack', [(root, 0)])
+    # عرض الدفعة ثابت طوال الفحص حتى يبقى ترتيب الاستعراض واحداً عند الاستئناف
+    width = state.setdefault('width', engine.concurrency)
+    dirs_done = state.get('dirs_done', 0)
+    found = state.get('found', 0)
+
+    while stack:
+        if should_continue and not should_continue():
+            return
+        batch = [stack.pop() for _ in range(min(width, len(stack)))]
+        listings = engine.map(_list_dir, [dir_path for dir_path, _ in batch], should_continue)
+        if should_continue and not should_continue():
+            stack.extend(reversed(batch))
+            return
+
+        candidates = []
+        batch_subdirs = []
+        for (dir_path, depth), entries in zip(batch, listings):
+            subdirs = []
+            batch_subdirs.append(subdirs)
+            if not isinstance(entries, list):
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if filters.accepts_dir(entry.name, depth + 1) and not (
+                            filters.skip_hidden and _is_hidden_entry(entry)
+                        ):
+                            subdirs.append((entry.path, depth + 1))
+                    elif entry.is_file(follow_symlinks=False):
+                        if filters.accepts_name(entry.name) and not (
+                            filters.skip_hidden and _is_hidden_entry(entry)
+                        ):
+                            candidates.append(entry)
+                except (OSError, PermissionError):
+                    pass
+
+        known = dirs_done + len(stack) + len(batch) + sum(len(d) for d in batch_subdirs)
+
+        stats_done = 0
+
+        def stat_progress(_idx, _result):
+            nonlocal stats_done
+            stats_done += 1
+            if on_progress:
+                fraction = dirs_done + len(batch) * stats_done / len(candidates)
+                on_progress(fraction / known, found + stats_done)
+
+        stats = engine.map(_stat_entry, candidates, should_continue, stat_progress)
+        if should_continue and not should_continue():
+            # الدفعة لم تكتمل - تعود للمكدس حتى تبقى الحالة قابلة للاستئناف
+            stack.extend(reversed(batch))
+            return
+
+        for entry, stat in zip(candidates, stats):
+            if not isinstance(stat, os.stat_result):
+                continue
+            record = admit_file(entry.path, entry.name, stat, root, filters, seen_inodes)
+            if record is None:
+                continue
+            found += 1
+            yield record
+
+        dirs_done += len(batch)
+        # الترتيب العكسي يحافظ على ترتيب الاستعراض الطبيعي مع المكدس
+        for subdirs in reversed(batch_subdirs):
+            stack.extend(reversed(subdirs))
+        state['dirs_done'] = dirs_done
+        state['found'] = found
+        if on_progress:
+            on_progress(dirs_done / known, found)
+        if on_batch_done:
+            on_batch_done()
+
+
+def normalize_roots(roots: List[str]) -> List[str]:
+    """إزالة الجذور المكررة أو المتداخلة حتى لا يُفحص أي مجلد مرتين"""
+    result = []
+    for root in roots:
+        real = os.path.realpath(root)
+        if root and real not in result:
+            result.append(real)
+    return [
+        r for r in result
+        if not any(r != other and r.startswith(other.rstrip(os.sep) + os.sep) for other in result)
+    ]
+
+
+def scan_roots(roots: List[str], filters: ScanFilters, should_continue=None, on_progress=None,
+               engine: Optional[AsyncIOEngine] = None, state: Optional[dict] = None,
+               on_batch_done=None, merge_links: bool = True):
+    """
+    فحص عدة جذور في تمريرة واحدة تغذي التجميع نفسه.
+    الملفات التي تشير لنفس الـ inode (روابط صلبة) تظهر كسجل واحد فقط.
+    state: حالة الفحص الكاملة (الجذر الحالي وحالة استعراضه والروابط الصلبة) للاستئناف.
+    merge_links=False: لا جدول روابط في الذاكرة؛ كل رابط صلب سجل مستقل يحمل inode
+    ويدمجه ExternalSizeSorter أثناء التجميع.
+    """
+    state = state if state is not None else {}
+    if merge_links:
+        seen_inodes = state.setdefault('seen_inodes', {})
+    else:
+        state.pop('seen_inodes', None)
+        seen_inodes = None
+    roots = normalize_roots(roots)
+    while state.get('root_idx', 0) < len(roots):
+        root_idx = state.get('root_idx', 0)
+        found_before = state.get('found_before', 0)
+
+        def root_progress(fraction, found):
+            if on_progress:
+                on_progress((root_idx + fraction) / len(roots), found_before + found)
+
+        root_state = state.setdefault('root', {})
+        yield from scan_files(roots[root_idx], filters, should_continue, root_progress,
+                              seen_inodes, engine, root_state, on_batch_done)
+        if should_continue and not should_continue():
+            return
+        state['found_before'] = found_before + root_state.get('found', 0)
+        state['root_idx'] = root_idx + 1
+        state['root'] = {}
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# محتويات الأرشيفات
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def archive_kind(name: str) -> Optional[str]:
+    """'zip' أو 'tar' حسب امتداد الاسم، أو None لغير الأرشيفات"""
+    lower = name.lower()
+    if lower.endswith(ZIP_EXTENSIONS):
+        return 'zip'
+    if lower.endswith(TAR_EXTENSIONS):
+        return 'tar'
+    return None
+
+
+def member_name(file_info: dict) -> str:
+    """مسار عضو الأرشيف داخله"""
+    return record_path(file_info)[len(file_info['archive']) + len(ARCHIVE_SEPARATOR):]
+
+
+def _member_record(archive: dict, member: str, size: int, modified: str,
+                   crc: Optional[int]) -> dict:
+    name = member.rsplit('/', 1)[-1]
+    archive_path = record_path(archive)
+    record = {
+        'id': next(_file_ids),
+        'path': f"{archive_path}{ARCHIVE_SEPARATOR}{member}",
+        'name': name,
+        'root': archive.get('root', ""),
+        'size': size,
+        'ext': os.path.splitext(name)[1].lower(),
+        'created': modified,
+        'modified': modified,
+        'archive': archive_path
+    }
+    if crc is not None:
+        record['crc'] = crc
+    return record
+
+
+def archive_members(archive: dict, filters: ScanFilters) -> List[dict]:
+    """
+    سجلات افتراضية لأعضاء أرشيف zip أو tar دون استخراج أي شيء إلى القرص: zip من
+    الفهرس المركزي (الحجم وCRC32 بلا قراءة للبيانات)، وtar غير المضغوط من الترويسات
+    فقط، وtar المضغوط بقراءة متدفقة واحدة يُحسب فيها CRC32 لكل عضو مقبول لأن فك
+    الضغط يمر على بياناته أصلاً.
+    """
+    path = record_path(archive)
+    members = []
+    if archive_kind(archive['name']) == 'zip':
+        with zipfile.ZipFile(path) as zf:
+            for info in zf.infolist():
+                name = info.filename.rsplit('/', 1)[-1]
+                if info.is_dir() or not filters.accepts_name(name) or not filters.accepts_size(info.file_size):
+                    continue
+                modified = "%04d-%02d-%02d %02d:%02d" % info.date_time[:5]
+                members.append(_member_record(archive, info.filename, info.file_size, modified, info.CRC))
+        return members
+    
+    streamed = not archive['name'].lower().endswith('.tar')
+    with tarfile.open(path, 'r|*' if streamed else 'r:') as tf:
+        for info in tf:
+            name = info.name.rsplit('/', 1)[-1]
+            if not info.isfile() or not filters.accepts_name(name) or not filters.accepts_size(info.size):
+                continue
+            crc = None
+            if streamed:
+                crc = 0
+                stream = tf.extractfile(info)
+                for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b""):
+                    crc = zlib.crc32(chunk, crc)
+            modified = datetime.fromtimestamp(info.mtime).strftime("%Y-%m-%d %H:%M")
+            members.append(_member_record(archive, info.name, info.size, modified, crc))
+    return members
+
+
+def archive_member_digests(job: dict) -> Dict[str, str]:
+    """
+    البصمة الكاملة لعدة أعضاء من أرشيف واحد في فتح واحد له (وقراءة متدفقة واحدة لـ tar).
+    job: {'path': مسار الأرشيف، 'size'، 'members': أسماء الأعضاء}. يُرجع الاسم -> البصمة
+    """
+    wanted = set(job['members'])
+    digests = {}
+    
+    def stream_digest(stream):
+        digest = hashlib.blake2b(digest_size=16)
+        for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+        return digest.hexdigest()
+    
+    if archive_kind(job['path']) == 'zip':
+        with zipfile.ZipFile(job['path']) as zf:
+            for name in wanted:
+                with zf.open(name) as stream:
+                    digests[name] = stream_digest(stream)
+    else:
+        with tarfile.open(job['path'], 'r|*') as tf:
+            for info in tf:
+                if info.name in wanted and info.isfile():
+                    digests[info.name] = stream_digest(tf.extractfile(info))
+    return digests
+
+
+class ArchiveExpander:
+    """
+    مرشح يوضع أمام add_record أثناء جمع السجلات: كل سجل يمر كما هو، والأرشيفات
+    تُقرأ فهارسها على دفعات بالتوازي وتُضاف سجلات أعضائها إلى التجميع نفسه.
+    """
+    
+    def __init__(self, filters: ScanFilters, add_record, engine=None, should_continue=None):
+        self.filters = filters
+        self.add_record = add_record
+        self.engine = engine or AsyncIOEngine(1)
+        self.should_continue = should_continue
+        self.pending = []
+        self.member_counts = {}  # مسار الأرشيف -> عدد أعضائه المقبولة
+        self.failed = 0
+    
+    def __call__(self, file_info: dict):
+        self.add_record(file_info)
+        if is_local_record(file_info) and archive_kind(file_info['name']):
+            self.pending.append(file_info)
+            if len(self.pending) >= ARCHIVE_BATCH:
+                self.flush()
+    
+    def flush(self):
+        """قراءة فهارس الأرشيفات المعلّقة وتمرير أعضائها"""
+        pending, self.pending = self.pending, []
+        if not pending:
+            return
+        results = self.engine.map(
+            lambda archive: archive_members(archive, self.filters), pending, self.should_continue,
+            # فهرس zip في نهاية الملف؛ tar يُقرأ كاملاً
+            bytes_of=lambda archive: archive['size'] if archive_kind(archive['name']) == 'tar' else 0
+        )
+        for archive, members in zip(pending, results):
+            if isinstance(members, Exception):
+                self.failed += 1
+            if not isinstance(members, list):
+                continue
+            self.member_counts[record_path(archive)] = len(members)
+            for member in members:
+                self.add_record(member)
+
+
+def archive_overlaps(groups: List[List[dict]], member_counts: Optional[Dict[str, int]] = None
+                     ) -> List[dict]:
+    """
+    أزواج الأرشيفات التي تتشارك محتوى. الأعضاء تُطابق بالبصمة الكاملة إن حُسبت وإلا بالحجم
+    وCRC32 (مجاناً من فهرس الأرشيف)، فيصلح الملخص للمجموعات قبل التحقق من المحتوى أيضاً.
+    يُرجع [{'archives': (أ، ب)، 'shared': عدد المحتويات المشتركة، 'bytes'، 'ratio'}]
+    مرتبة بالحجم المشترك، وratio نسبة المشترك من أصغر الأرشيفين إن عُرف عدد أعضائهما.
+    """
+    pairs = {}
+    for group in groups:
+        by_content = {}
+        for file_info in group:
+            if 'archive' not in file_info:
+                continue
+            if file_info.get('hash'):
+                key = (file_info['size'], file_info['hash'])
+            elif file_info.get('crc') is not None:
+                key = (file_info['size'], file_info['crc'])
+            else:
+                continue
+            by_content.setdefault(key, set()).add(file_info['archive'])
+        for (size, _), archives in by_content.items():
+            for pair in combinations(sorted(archives), 2):
+                entry = pairs.setdefault(pair, [0, 0])
+                entry[0] += 1
+                entry[1] += size
+    
+    overlaps = []
+    for pair, (shared, shared_bytes) in pairs.items():
+        counts = [member_counts.get(archive) for archive in pair] if member_counts else [None]
+        ratio = shared / min(counts) if None not in counts and min(counts) else None
+        overlaps.append({'archives': pair, 'shared': shared, 'bytes': shared_bytes, 'ratio': ratio})
+    overlaps.sort(key=lambda o: o['bytes'], reverse=True)
+    return overlaps
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# نقاط الاستئناف
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class ScanCheckpoint:
+    """
+    نقطة استئناف لفحص جذور معينة بمرشحات معينة.
+    السجلات تُضاف تدريجياً إلى ملف JSONL (فلا يُعاد كتابة ما حُفظ سابقاً)، ثم تُكتب
+    حالة الاستعراض في ملف صغير بشكل ذري يحدد عدد البايتات الصالحة من ملف السجلات.
+    """
+    
+    def __init__(self, roots: List[str], filters: ScanFilters):
+        identity = json.dumps(
+            {'roots': normalize_roots(roots), 'filters': asdict(filters)},
+            sort_keys=True, ensure_ascii=False
+        )
+        key = hashlib.sha1(identity.encode('utf-8')).hexdigest()[:16]
+        folder = os.path.join(os.path.expanduser("~"), CHECKPOINT_DIR)
+        self.state_path = os.path.join(folder, f"{key}.state.json")
+        self.records_path = os.path.join(folder, f"{key}.records.jsonl")
+        self.saved_count = 0
+        self.saved_bytes = 0
+    
+    def exists(self) -> bool:
+        return os.path.exists(self.state_path) and os.path.exists(self.records_path)
+    
+    def info(self) -> dict:
+        """وقت آخر نقطة استئناف وعدد السجلات فيها"""
+        with open(self.state_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return {'timestamp': data['timestamp'], 'records': data['records_count']}
+    
+    def load(self, add_record) -> dict:
+        """
+        قراءة الحالة وتمرير السجلات المحفوظة واحداً تلو الآخر إلى add_record
+        (دون تحميلها كلها في الذاكرة)، مع إعادة بناء جدول الروابط الصلبة.
+        """
+        with open(self.state_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        links = {(dev, ino): paths for dev, ino, paths in data.get('links', [])}
+        
+        seen_inodes = {}
+        count = 0
+        # تجاهل أي سجلات أُضيفت بعد آخر حالة مكتملة (انقطاع أثناء الكتابة)
+        with open(self.records_path, 'r+b') as f:
+            f.truncate(data['records_bytes'])
+            f.seek(0)
+            for line in f:
+                record = intern_record(json.loads(line))
+                if 'inode' in record:
+                    key = tuple(record['inode'])
+                    if key in links:
+                        record['links'] = links[key]
+                    seen_inodes[key] = record
+                add_record(record)
+                count += 1
+        self.saved_count = count
+        self.saved_bytes = data['records_bytes']
+        
+        state = data['scan_state']
+        root_state = state.get('root', {})
+        if 'stack' in root_state:
+            root_state['stack'] = [tuple(item) for item in root_state['stack']]
+        state['seen_inodes'] = seen_inodes
+        return state
+    
+    def save(self, state: dict, new_records: List[dict]):
+        """إلحاق السجلات الجديدة منذ آخر نقطة ثم حفظ حالة الاستعراض"""
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        with open(self.records_path, 'ab') as f:
+            for record in new_records:
+                f.write(json.dumps(record_data(record), ensure_ascii=False).encode('utf-8') + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+            self.saved_bytes = f.tell()
+        self.saved_count += len(new_records)
+        
+        data = {
+            'version': CHECKPOINT_VERSION,
+            'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'records_count': self.saved_count,
+            'records_bytes': self.saved_bytes,
+            'scan_state': {k: v for k, v in state.items() if k != 'seen_inodes'},
+            'links': [
+                [dev, ino, record['links']]
+                for (dev, ino), record in state.get('seen_inodes', {}).items()
+                if record.get('links')
+            ]
+        }
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+            # بدون fsync قد يحل ملف فارغ محل النقطة السابقة بعد انقطاع مفاجئ
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.state_path)
+    
+    def discard(self):
+        for path in (self.state_path, self.records_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.saved_count = 0
+        self.saved_bytes = 0
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# مراقبة المجلدات
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def _load_inotify():
+    """ربط دوال inotify من libc عبر ctypes (لينكس فقط)، أو None إن لم تتوفر"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+_INOTIFY = _load_inotify()
+INOTIFY_AVAILABLE = _INOTIFY is not None
+
+
+class InotifyWatcher:
+    """
+    مراقبة أشجار مجلدات بـ inotify مع نفس مرشحات الفحص (المجلدات المستبعدة والعمق).
+    كل مجلد يُراقب بمفرده، والمجلدات الجديدة تُضاف للمراقبة فور ظهورها.
+    """
+    
+    MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE |
+            IN_DELETE | IN_DELETE_SELF)
+    
+    def __init__(self, filters: ScanFilters):
+        self.filters = filters
+        self.fd = _INOTIFY.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        self.watches = {}  # wd -> (المسار، العمق، الجذر)
+        self.failed = 0    # مجلدات تعذرت مراقبتها (حد max_user_watches مثلاً)
+    
+    def close(self):
+        os.close(self.fd)
+        self.watches = {}
+    
+    def add_tree(self, path: str, depth: int, root: str) -> List[str]:
+        """مراقبة مجلد وما تحته، وإرجاع الملفات الموجودة فيه (للمجلدات التي تظهر أثناء المراقبة)"""
+        wd = _INOTIFY.inotify_add_watch(self.fd, os.fsencode(path), self.MASK)
+        if wd < 0:
+            self.failed += 1
+            return []
+        self.watches[wd] = (path, depth, root)
+        files = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        if self.filters.accepts_dir(entry.name, depth + 1):
+                            files.extend(self.add_tree(entry.path, depth + 1, root))
+                    elif entry.is_file():
+                        files.append(entry.path)
+        except OSError:
+            pass
+        return files
+    
+    def remove_tree(self, path: str):
+        """إلغاء مراقبة مجلد نُقل أو حُذف وكل ما تحته"""
+        prefix = path.rstrip(os.sep) + os.sep
+        for wd, (watched, _, _) in list(self.watches.items()):
+            if watched == path or watched.startswith(prefix):
+                _INOTIFY.inotify_rm_watch(self.fd, wd)
+                del self.watches[wd]
+    
+    def read_events(self, timeout: float) -> List[tuple]:
+        """أحداث (القناع، المسار الكامل، العمق، الجذر) المتاحة خلال timeout ثانية"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _cookie, length = INOTIFY_EVENT.unpack_from(data, offset)
+            name = os.fsdecode(data[offset + INOTIFY_EVENT.size:
+                                    offset + INOTIFY_EVENT.size + length].rstrip(b"\0"))
+            offset += INOTIFY_EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                events.append((mask, "", 0, ""))
+                continue
+            watch = self.watches.get(wd)
+            if watch is None:
+                continue
+            if mask & IN_IGNORED:
+                del self.watches[wd]
+                continue
+            dir_path, depth, root = watch
+            events.append((mask, os.path.join(dir_path, name) if name else dir_path, depth, root))
+        return events
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# التجميع والتحقق من المحتوى
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def iter_size_groups(sorted_files, threshold_bytes: float, same_ext_only: bool):
+    """
+    مولّد يمر مرة واحدة على ملفات مرتبة حسب الحجم ويُرجع (ترتيب_المرساة، المجموعة).
+    كل مجموعة تبدأ بملف "مرساة" وتضم ما يليه ضمن حد التقارب منه، وهي نفس قاعدة
+    التجميع الأصلية لكن بتكلفة خطية بدلاً من المقارنة المتداخلة.
+    المجموعات تُرجع عند إغلاقها، لذا قد لا تأتي بترتيب المرساة عند تفعيل same_ext_only.
+    """
+    open_groups = {}
+    for seq, file_info in enumerate(sorted_files):
+        key = file_info['ext'] if same_ext_only else None
+        current = open_groups.get(key)
+        if current is not None and file_info['size'] - current[1] <= threshold_bytes:
+            current[2].append(file_info)
+            continue
+        if current is not None and len(current[2]) > 1:
+            yield current[0], current[2]
+        open_groups[key] = (seq, file_info['size'], [file_info])
+
+    for anchor_seq, _, group in open_groups.values():
+        if len(group) > 1:
+            yield anchor_seq, group
+
+
+def group_by_size(files_info: List[dict], threshold_bytes: float, same_ext_only: bool,
+                  should_continue=None) -> List[List[dict]]:
+    """ترتيب الملفات حسب الحجم وتجميع المتقاربة منها، بترتيب المرساة"""
+    files_info.sort(key=lambda x: x['size'])
+    groups = []
+    for anchor_seq, group in iter_size_groups(files_info, threshold_bytes, same_ext_only):
+        if should_continue and not should_continue():
+            return []
+        groups.append((anchor_seq, group))
+    groups.sort(key=lambda item: item[0])
+    return [group for _, group in groups]
+
+
+class SizeIndex:
+    """
+    فهرس أحجام لنتائج فحص مكتمل يسمح بإعادة التجميع بحد تقارب جديد دون إعادة الفحص.
+    السجلات مرتبة مرة واحدة حسب الحجم (ولكل امتداد قائمة فرعية بنفس الترتيب)، فتُحدد
+    نهاية كل مجموعة ببحث ثنائي من مرساتها: التكلفة بعدد المجموعات لا بعدد الملفات.
+    records قد تكون تسلسلاً كسولاً (لقطة محملة) مع أعمدة sizes/exts جاهزة، فلا تُبنى
+    إلا سجلات الملفات الداخلة في المجموعات.
+    """
+    
+    def __init__(self, files_info, presorted: bool = False,
+                 sizes: Optional[List[int]] = None, exts: Optional[List[str]] = None):
+        self.records = files_info if presorted else sorted(files_info, key=lambda x: x['size'])
+        self.sizes = sizes if sizes is not None else [f['size'] for f in self.records]
+        self.exts = exts
+        self._by_ext = None
+    
+    def __len__(self):
+        return len(self.records)
+    
+    @property
+    def by_ext(self) -> dict:
+        """لكل امتداد: (الأحجام، ترتيبها في الفهرس الكامل) - يُبنى عند الحاجة"""
+        if self._by_ext is None:
+            exts = self.exts if self.exts is not None else [f['ext'] for f in self.records]
+            self._by_ext = {}
+            for seq, (size, ext) in enumerate(zip(self.sizes, exts)):
+                sizes, positions = self._by_ext.setdefault(ext, ([], []))
+                sizes.append(size)
+                positions.append(seq)
+        return self._by_ext
+    
+    def _changed(self):
+        self.sizes = [f['size'] for f in self.records]
+        self.exts = None
+        self._by_ext = None
+    
+    def remove(self, paths) -> int:
+        """حذف سجلات الملفات المحلية ذات المسارات المعطاة (بعد نقلها مثلاً) مع أعضاء أرشيفاتها"""
+        paths = set(paths)
+        kept = [f for f in self.records if not record_in(f, paths)]
+        removed = len(self.records) - len(kept)
+        if removed:
+            self.records = kept
+            self._changed()
+        return removed
+    
+    def add(self, files_info: List[dict]):
+        """إضافة سجلات جديدة في موضعها حسب الحجم (بعد أي سجلات بنفس الحجم)"""
+        if not files_info:
+            return
+        self.records = list(self.records) + list(files_info)
+        # الفرز المستقر على قائمة شبه مرتبة يكاد يكون خطياً
+        self.records.sort(key=lambda x: x['size'])
+        self._changed()
+    
+    def _anchor_groups(self, sizes: List[int], positions, threshold_bytes: float):
+        """(ترتيب المرساة، المجموعة) لكل مجموعة من ملفين فأكثر في قائمة أحجام مرتبة"""
+        start = 0
+        count = len(sizes)
+        while start < count:
+            end = bisect.bisect_right(sizes, sizes[start] + threshold_bytes, start + 1)
+            if end - start > 1:
+                if positions is None:
+                    yield start, self.records[start:end]
+                else:
+                    yield positions[start], [self.records[pos] for pos in positions[start:end]]
+            start = end
+    
+    def groups(self, threshold_bytes: float, same_ext_only: bool) -> List[List[dict]]:
+        """نفس نتيجة group_by_size على السجلات المفهرسة"""
+        if not same_ext_only:
+            return [group for _, group in self._anchor_groups(self.sizes, None, threshold_bytes)]
+        groups = []
+        for sizes, positions in self.by_ext.values():
+            groups.extend(self._anchor_groups(sizes, positions, threshold_bytes))
+        groups.sort(key=lambda item: item[0])
+        return [group for _, group in groups]
+
+
+class ExternalSizeSorter:
+    """
+    تجميع حسب الحجم بذاكرة محدودة لفهارس ضخمة.
+    السجلات تُكتب إلى ملف مؤقت فور وصولها، ويبقى في الذاكرة مفتاح صغير لكل ملف
+    (الحجم، رقم السجل، موقعه، بصمة هويته، الامتداد). عند بلوغ حد الذاكرة تُفرز المفاتيح
+    وتُكتب كتسلسل مرتب إلى ملف، ثم تُدمج التسلسلات دمجاً متعدد الطرق أثناء التجميع.
+    رقم السجل يكسر التعادل بترتيب الوصول، فتطابق النتائج الفرز المستقر في الذاكرة.
+    الروابط الصلبة (نفس الجهاز و inode) والمسارات المكررة من أجزاء متداخلة لها نفس الحجم،
+    فتتجاور في الدمج وتُدمج هناك في سجلها الأول دون جدول يبقى في الذاكرة طوال الفحص.
+    """
+    
+    def __init__(self, memory_mb: int):
+        self.run_length = max(1000, memory_mb * 1024 * 1024 // SORT_ENTRY_BYTES)
+        self.tmp_dir = None
+        self.records_file = None
+        self.keys = []
+        self.runs = []
+        self.count = 0
+        self.merged = 0
+    
+    def __enter__(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix="fsdf-sort-")
+        self.records_file = open(os.path.join(self.tmp_dir, "records.jsonl"), 'w+b')
+        return self
+    
+    def __exit__(self, *exc):
+        self.records_file.close()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        return False
+    
+    @staticmethod
+    def _identity(record: dict) -> tuple:
+        """هوية البيانات على القرص: الجهاز و inode للروابط الصلبة، وإلا الجهاز المضيف والمسار"""
+        host = record.get('host', '')
+        if 'inode' in record:
+            return ('inode', host, *record['inode'])
+        return ('path', host, record_path(record))
+    
+    def add(self, record: dict):
+        record_id = self.count
+        self.count += 1
+        offset = self.records_file.tell()
+        self.records_file.write(json.dumps(record, ensure_ascii=False).encode('utf-8') + b"\n")
+        ident = hashlib.blake2b(repr(self._identity(record)).encode('utf-8', 'surrogateescape'),
+                                digest_size=8).digest()
+        self.keys.append((record['size'], record_id, offset, int.from_bytes(ident, 'little'), record['ext']))
+        if len(self.keys) >= self.run_length:
+            self._spill()
+    
+    def _spill(self):
+        self.keys.sort()
+        path = os.path.join(self.tmp_dir, f"run{len(self.runs)}.bin")
+        with open(path, 'wb') as f:
+            for size, record_id, offset, ident, ext in self.keys:
+                ext_bytes = ext.encode('utf-8')
+                f.write(SORT_RUN_FORMAT.pack(size, record_id, offset, ident, len(ext_bytes)) + ext_bytes)
+        self.runs.append(path)
+        self.keys = []
+    
+    @staticmethod
+    def _read_run(path: str):
+        with open(path, 'rb', buffering=HASH_CHUNK_SIZE) as f:
+            while True:
+                header = f.read(SORT_RUN_FORMAT.size)
+                if not header:
+                    return
+                size, record_id, offset, ident, ext_len = SORT_RUN_FORMAT.unpack(header)
+                yield size, record_id, offset, ident, f.read(ext_len).decode('utf-8')
+    
+    def _load(self, offset: int) -> dict:
+        self.records_file.seek(offset)
+        return json.loads(self.records_file.readline())
+    
+    def _record(self, entry: dict) -> dict:
+        record = self._load(entry['offset'])
+        if entry.get('links'):
+            links = record.setdefault('links', [])
+            links.extend(path for path in entry['links'] if path not in links)
+        return record
+    
+    def _entries(self, merged):
+        """
+        مدخلات التجميع من التسلسل المدمج مع إسقاط المكرر: نفس البصمة داخل نفس الحجم
+        تُتحقق بقراءة السجلين، فالمسار المكرر يُحذف والرابط الصلب يُضاف إلى روابط المدخل
+        الأول (ولا يبقى منه شيء في الذاكرة بعد إغلاق مجموعته).
+        """
+        current_size = None
+        firsts = {}
+        for size, record_id, offset, ident, ext in merged:
+            if size != current_size:
+                current_size = size
+                firsts = {}
+            entry = {'size': size, 'ext': ext, 'id': record_id, 'offset': offset}
+            first = firsts.get(ident)
+            if first is None:
+                firsts[ident] = entry
+                yield entry
+                continue
+            first_record = self._load(first['offset'])
+            record = self._load(offset)
+            if self._identity(first_record) != self._identity(record):
+                yield entry  # تصادم بصمة نادر بين ملفين مختلفين
+                continue
+            self.merged += 1
+            own_paths = {record_path(first_record), *first_record.get('links', ())}
+            links = first.setdefault('links', [])
+            for path in (record_path(record), *record.get('links', ())):
+                if path not in own_paths and path not in links:
+                    links.append(path)
+    
+    def group(self, threshold_bytes: float, same_ext_only: bool,
+              should_continue=None) -> List[List[dict]]:
+        """دمج التسلسلات المرتبة وتجميعها بنفس قاعدة group_by_size"""
+        self.records_file.flush()
+        if self.runs and self.keys:
+            self._spill()
+        if self.runs:
+            merged = heapq.merge(*(self._read_run(path) for path in self.runs))
+        else:
+            self.keys.sort()
+            merged = iter(self.keys)
+        
+        groups = []
+        for anchor_seq, group in iter_size_groups(self._entries(merged), threshold_bytes, same_ext_only):
+            if should_continue and not should_continue():
+                return []
+            groups.append((anchor_seq, [self._record(entry) for entry in group]))
+        groups.sort(key=lambda item: item[0])
+        return [group for _, group in groups]
+
+
+def file_digest(path: str, limit: Optional[int] = None) -> str:
+    """بصمة محتوى الملف (أو أول limit بايت منه فقط)"""
+    digest = hashlib.blake2b(digest_size=16)
+    remaining = limit
+    with open(path, 'rb') as f:
+        while remaining is None or remaining > 0:
+            chunk = f.read(HASH_CHUNK_SIZE if remaining is None else min(HASH_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            charge_io(len(chunk))
+            digest.update(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+    return digest.hexdigest()
+
+
+def ensure_digests(files: List[dict], should_continue=None,
+                   engine: Optional[AsyncIOEngine] = None, on_progress=None):
+    """
+    حساب البصمات الناقصة على مرحلتين: بصمة جزئية لأول جزء من الملف،
+    ثم بصمة كاملة فقط للملفات التي تشترك في الحجم والبصمة الجزئية.
+    السجلات القادمة من أجزاء فحص تحتوي البصمات مسبقاً فلا يُقرأ أي شيء.
+    أعضاء الأرشيفات بصمتها الجزئية CRC32 من فهرس الأرشيف: تُقرأ فقط إن شاركها عضو آخر
+    الحجم وCRC أو شاركها ملف عادي الحجم، وأعضاء الأرشيف الواحد تُقرأ في فتح واحد له.
+    on_progress(done, total) يُستدعى بعد كل بصمة في كل مرحلة.
+    """
+    engine = engine or AsyncIOEngine(1)
+    
+    def phase_progress(total):
+        done = [0]
+        
+        def report(_idx, _result):
+            done[0] += 1
+            on_progress(done[0], total)
+        return report if on_progress else None
+    
+    def partial_digest(file_info):
+        return file_digest(record_path(file_info), PARTIAL_HASH_SIZE)
+    
+    def full_digest(file_info):
+        return file_digest(record_path(file_info))
+    
+    need_partial = [
+        f for f in files
+        if is_local_record(f) and 'partial_hash' not in f and 'hash' not in f
+    ]
+    partial_digests = engine.map(
+        partial_digest, need_partial, should_continue, phase_progress(len(need_partial)),
+        bytes_of=lambda f: min(f['size'], PARTIAL_HASH_SIZE)
+    )
+    for file_info, digest in zip(need_partial, partial_digests):
+        file_info['partial_hash'] = digest if isinstance(digest, str) else None
+    
+    members_by_size = {}
+    file_sizes = set()
+    for file_info in files:
+        if 'archive' in file_info:
+            if 'hash' not in file_info and file_info.get('host', LOCAL_HOST) == LOCAL_HOST:
+                members_by_size.setdefault(file_info['size'], []).append(file_info)
+        elif is_local_record(file_info) and (file_info.get('hash') or file_info.get('partial_hash')):
+            file_sizes.add(file_info['size'])
+    
+    buckets = {}
+    for file_info in files:
+        if 'hash' in file_info or not file_info.get('partial_hash'):
+            continue
+        if not is_local_record(file_info):
+            continue
+        if file_info['size'] <= PARTIAL_HASH_SIZE:
+            # البصمة الجزئية تغطي الملف بالكامل
+            file_info['hash'] = file_info['partial_hash']
+            continue
+        buckets.setdefault((file_info['size'], file_info['partial_hash']), []).append(file_info)
+    
+    need_full = [
+        f for (size, _), bucket in buckets.items()
+        if len(bucket) > 1 or size in members_by_size for f in bucket
+    ]
+    
+    need_members = {}
+    for size, members in members_by_size.items():
+        crcs = Counter(f.get('crc') for f in members)
+        for file_info in members:
+            crc = file_info.get('crc')
+            if size in file_sizes or crcs[crc] > 1 or (len(members) > 1 and (crc is None or None in crcs)):
+                need_members.setdefault(file_info['archive'], []).append(file_info)
+    jobs = [
+        {'path': archive, 'size': sum(f['size'] for f in members),
+         'members': [member_name(f) for f in members]}
+        for archive, members in need_members.items()
+    ]
+    member_digests = engine.map(
+        archive_member_digests, jobs, should_continue, phase_progress(len(jobs)),
+        bytes_of=lambda job: job['size']
+    )
+    for members, digests in zip(need_members.values(), member_digests):
+        for file_info in members:
+            digest = digests.get(member_name(file_info)) if isinstance(digests, dict) else None
+            file_info['hash'] = digest
+    full_digests = engine.map(
+        full_digest, need_full, should_continue, phase_progress(len(need_full)),
+        bytes_of=lambda f: f['size']
+    )
+    for file_info, digest in zip(need_full, full_digests):
+        file_info['hash'] = digest if isinstance(digest, str) else None
+
+
+def is_local_record(file_info: dict) -> bool:
+    """
+    هل السجل ملف على هذا الجهاز يمكن قراءته ونقله مباشرة؟ (سجلات الأجزاء قد تأتي من أجهزة
+    أخرى، وسجلات فهرس الأقراص تخص أقراصاً قد لا تكون متصلة، وأعضاء الأرشيفات ليست ملفات)
+    """
+    return ('volume' not in file_info and 'archive' not in file_info
+            and file_info.get('host', LOCAL_HOST) == LOCAL_HOST)
+
+
+def record_in(file_info: dict, paths: set) -> bool:
+    """هل السجل ملف محلي من paths أو عضو في أرشيف منها؟"""
+    if 'archive' in file_info:
+        return file_info['archive'] in paths and file_info.get('host', LOCAL_HOST) == LOCAL_HOST
+    return record_path(file_info) in paths and is_local_record(file_info)
+
+
+def group_savings(group: List[dict]) -> int:
+    """التوفير المحتمل لمجموعة: جميع الملفات عدا الأكبر"""
+    return sum(f['size'] for f in group) - max(f['size'] for f in group)
+
+
+def split_group_by_content(group: List[dict]) -> List[List[dict]]:
+    """
+    تقسيم مجموعة إلى مجموعات ملفات متطابقة المحتوى. سجلات أجهزة أخرى بلا بصمة لا يمكن
+    التحقق منها هنا، فلا تُسقط: تُعلّم 'unverified' وتبقى مع ما لم يطابق شيئاً من ملفات
+    المجموعة في مجموعة أخيرة متقاربة الحجم فقط.
+    """
+    by_content = {}
+    unverified = []
+    for file_info in group:
+        if file_info.get('hash'):
+            by_content.setdefault((file_info['size'], file_info['hash']), []).append(file_info)
+        elif file_info.get('host', LOCAL_HOST) != LOCAL_HOST:
+            file_info['unverified'] = True
+            unverified.append(file_info)
+    groups = [files for files in by_content.values() if len(files) > 1]
+    if unverified:
+        unmatched = {id(files[0]) for files in by_content.values() if len(files) == 1}
+        rest = [f for f in group if f.get('unverified') or id(f) in unmatched]
+        if len(rest) > 1:
+            groups.append(rest)
+    return groups
+
+
+def is_unverified_group(group: List[dict]) -> bool:
+    """مجموعة تضم سجلات لم يُتحقق من محتواها (أجهزة أخرى بلا بصمة)"""
+    return any(f.get('unverified') for f in group)
+
+
+def detect_type(header: bytes) -> Optional[str]:
+    """نوع المحتوى من أول بايتات الملف (تواقيع معروفة ثم نص UTF-8)، أو None إن لم يُعرف"""
+    kind = next((k for offset, signature, k in MAGIC_SIGNATURES
+                 if header.startswith(signature, offset)), None)
+    if kind == 'riff':
+        return RIFF_TYPES.get(header[8:12], kind)
+    if kind == 'isobmff':
+        brand = header[8:12]
+        return 'mov' if brand == b'qt  ' else 'heic' if brand in (b'heic', b'heix', b'mif1') else 'mp4'
+    if kind == 'zip':
+        # مستندات أوفيس وOpenDocument/EPUB أرشيفات zip تُعرف من أول عضو فيها
+        if b'[Content_Types].xml' in header:
+            return 'ooxml'
+        if header.startswith(b'mimetype', 30):
+            return 'opendocument'
+    if kind == 'bmp' and header[6:10] != bytes(4):
+        kind = None  # "BM" وحدها ضعيفة: حقلا BMP المحجوزان أصفار
+    if kind is None and header and b'\0' not in header:
+        try:
+            # المفكك التدريجي يتسامح مع حرف مقطوع في نهاية الترويسة
+            codecs.getincrementaldecoder('utf-8')().decode(header)
+            return 'text'
+        except UnicodeDecodeError:
+            return None
+    return kind
+
+
+def read_header(file_info: dict, partial: bool = False) -> Tuple[Optional[str], Optional[str]]:
+    """
+    قراءة واحدة لأول الملف تكفي لكشف نوعه ولبصمته الجزئية معاً (partial=True تقرأ
+    PARTIAL_HASH_SIZE بدلاً من TYPE_HEADER_SIZE). يُرجع (النوع، البصمة الجزئية أو None)
+    """
+    with open(record_path(file_info), 'rb') as f:
+        data = f.read(PARTIAL_HASH_SIZE if partial else TYPE_HEADER_SIZE)
+    digest = hashlib.blake2b(data, digest_size=16).hexdigest() if partial else None
+    return detect_type(data[:TYPE_HEADER_SIZE]), digest
+
+
+def detect_types(files: List[dict], with_partial: bool = False, should_continue=None,
+                 engine: Optional[AsyncIOEngine] = None) -> int:
+    """
+    كشف نوع المحتوى للسجلات التي لم يُكشف نوعها بعد ('type'، وNone إن لم يُعرف).
+    with_partial: تُحفظ البصمة الجزئية من القراءة نفسها فلا تعيد ensure_digests القراءة.
+    يُرجع عدد الملفات المقروءة.
+    """
+    engine = engine or AsyncIOEngine(1)
+    need = [f for f in files if 'type' not in f and is_local_record(f)]
+    
+    def header_of(file_info):
+        return read_header(file_info, with_partial and 'partial_hash' not in file_info
+                           and 'hash' not in file_info)
+    
+    results = engine.map(
+        header_of, need, should_continue,
+        bytes_of=lambda f: min(f['size'], PARTIAL_HASH_SIZE if with_partial else TYPE_HEADER_SIZE)
+    )
+    for file_info, result in zip(need, results):
+        if isinstance(result, tuple):
+            file_info['type'], digest = result
+            if digest:
+                file_info['partial_hash'] = digest
+    return len(need)
+
+
+def type_key(file_info: dict) -> str:
+    """مفتاح التجميع بالنوع: النوع المكشوف، أو الامتداد إن لم يُعرف النوع"""
+    return file_info.get('type') or file_info['ext']
+
+
+def split_group_by_type(group: List[dict]) -> List[List[dict]]:
+    """تقسيم مجموعة حسب نوع المحتوى الفعلي"""
+    by_type = {}
+    for file_info in group:
+        by_type.setdefault(type_key(file_info), []).append(file_info)
+    return [files for files in by_type.values() if len(files) > 1]
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# التشابه التقريبي
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def sketch_offsets(size: int) -> List[int]:
+    """
+    مواضع نوافذ العينة: مضاعفات خطوة ثابتة لكل نطاق أحجام (قوة 2)، فتقع نوافذ الملفات
+    المتقاربة بالحجم على نفس الإزاحات ويبقى المحتوى المضاف في النهاية خارج المقارنة.
+    ملف على حد نطاقين خطوته نصف خطوة الآخر فتتطابق نصف نوافذه.
+    """
+    if size <= SKETCH_WINDOW_SIZE * SKETCH_WINDOWS:
+        return [0]
+    step = max(SKETCH_WINDOW_SIZE, (1 << (size.bit_length() - 1)) // SKETCH_WINDOWS)
+    return list(range(0, size, step))
+
+
+def content_sketch(path: str, size: int) -> Optional[array]:
+    """
+    توقيع MinHash لمحتوى الملف من عينات موزعة: كل نافذة تُقطع عند مراسٍ يحددها المحتوى
+    (SHINGLE_ANCHOR) فلا تتغير القطع بإزاحة البيانات، وكل قطعة تُختزل إلى CRC32.
+    التوقيع بطريقة التبديل الواحد (one-permutation hashing): كل بصمة موزعة توضع في إحدى
+    SKETCH_SIZE خانات ويُحفظ أصغرها، والخانات الفارغة تأخذ قيمة أقرب خانة تالية (تكثيف).
+    """
+    windows = []
+    with open(path, 'rb') as f:
+        offsets = sketch_offsets(size)
+        if offsets == [0]:
+            windows.append(f.read())
+        else:
+            for offset in offsets:
+                f.seek(offset)
+                windows.append(f.read(SKETCH_WINDOW_SIZE))
+    shingles = set()
+    for data in windows:
+        shingles.update(zlib.crc32(chunk) for chunk in SHINGLE_ANCHOR.split(data) if chunk)
+    if not shingles:
+        return None
+    
+    empty = (1 << 64) - 1
+    bins = [empty] * SKETCH_SIZE
+    value_bits = 64 - (SKETCH_SIZE - 1).bit_length()
+    value_mask = (1 << value_bits) - 1
+    for shingle in shingles:
+        mixed = (shingle * SKETCH_MIX) & empty
+        slot = mixed >> value_bits
+        value = mixed & value_mask
+        if value < bins[slot]:
+            bins[slot] = value
+    filled = [i for i, value in enumerate(bins) if value != empty]
+    for i in range(SKETCH_SIZE):
+        if bins[i] == empty:
+            donor = next((j for j in filled if j > i), filled[0])
+            # إزاحة بالمسافة حتى لا تتطابق الخانات المستعارة مع أصلها
+            bins[i] = bins[donor] + (((donor - i) % SKETCH_SIZE) << value_bits)
+    return array('Q', bins)
+
+
+def sketch_similarity(first: array, second: array) -> float:
+    """تقدير تشابه جاكارد بين مجموعتي قطع من نسبة قيم التوقيع المتساوية"""
+    return sum(a == b for a, b in zip(first, second)) / SKETCH_SIZE
+
+
+def sketch_files(files: List[dict], should_continue=None,
+                 engine: Optional[AsyncIOEngine] = None) -> int:
+    """حساب توقيع المحتوى ('sketch') للسجلات المحلية التي لم يُحسب توقيعها. يُرجع عدد المقروء"""
+    engine = engine or AsyncIOEngine(1)
+    need = [f for f in files if 'sketch' not in f and is_local_record(f)]
+    results = engine.map(
+        lambda f: content_sketch(record_path(f), f['size']), need, should_continue,
+        bytes_of=lambda f: min(f['size'], len(sketch_offsets(f['size'])) * SKETCH_WINDOW_SIZE)
+    )
+    for file_info, sketch in zip(need, results):
+        if sketch is None or isinstance(sketch, array):
+            file_info['sketch'] = sketch
+    return len(need)
+
+
+def cluster_similar(group: List[dict], threshold: float) -> List[List[dict]]:
+    """
+    تقسيم مجموعة إلى عناقيد ملفات متشابهة المحتوى دون مقارنة كل زوج: التوقيعات تُوزع
+    على دلاء LSH (شريط من LSH_ROWS قيم لكل دلو)، وكل ملف يُقارن فقط بأول ملف في كل
+    دلو يشاركه، ويُضم إليه إن بلغ التشابه المقدّر threshold.
+    """
+    sketched = [f for f in group if f.get('sketch') is not None]
+    parent = list(range(len(sketched)))
+    
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+    
+    buckets = {}
+    for idx, file_info in enumerate(sketched):
+        sketch = file_info['sketch']
+        for band in range(0, SKETCH_SIZE, LSH_ROWS):
+            first = buckets.setdefault((band, sketch[band:band + LSH_ROWS].tobytes()), idx)
+            if first == idx or find(first) == find(idx):
+                continue
+            if sketch_similarity(sketched[first]['sketch'], sketch) >= threshold:
+                parent[find(idx)] = find(first)
+    
+    clusters = {}
+    for idx, file_info in enumerate(sketched):
+        clusters.setdefault(find(idx), []).append(file_info)
+    return [files for files in clusters.values() if len(files) > 1]
+
+
+def group_similarity(group: List[dict]) -> Optional[float]:
+    """أدنى تشابه مقدّر بين أول ملف في المجموعة وبقية ملفاتها (None إن نقص توقيع)"""
+    if any(f.get('sketch') is None for f in group):
+        return None
+    first = group[0]['sketch']
+    return min(sketch_similarity(first, f['sketch']) for f in group[1:])
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# تحليل القطع المشتركة
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def iter_chunks(stream, should_continue=None):
+    """
+    تقطيع متدفق بحدود يحددها المحتوى: مرشحو الحدود بايتات معينة يجدها التعبير النمطي
+    (بسرعة C)، وعند كل مرشح تُحسب بصمة النافذة المتدحرجة (CHUNK_WINDOW بايت قبله)
+    ويُقطع إن طابقت القناع، مع حدين أدنى وأعلى لطول القطعة. الحد يعتمد على البايتات
+    حوله فقط، فإدراج بيانات في الملف لا يغيّر إلا القطع المحيطة به.
+    يُرجع (بصمة 64 بت، الطول) لكل قطعة، والذاكرة محدودة بكتلة قراءة وقطعة واحدة.
+    should_continue() يُفحص قبل قراءة كل كتلة، وعند الإيقاف يتوقف التقطيع حيث وصل.
+    """
+    data = b""
+    while True:
+        if should_continue and not should_continue():
+            return
+        block = stream.read(CHUNK_READ_SIZE)
+        charge_io(len(block))
+        data = data + block if data else block
+        start = 0
+        pos = CHUNK_MIN_SIZE - 1
+        while True:
+            match = CHUNK_CANDIDATE.search(data, pos)
+            if match is None or match.end() - start > CHUNK_MAX_SIZE:
+                if len(data) - start < CHUNK_MAX_SIZE:
+                    break
+                end = start + CHUNK_MAX_SIZE  # قطع إجباري عند الحد الأعلى
+            else:
+                end = match.end()
+                if zlib.crc32(data[end - CHUNK_WINDOW:end]) & CHUNK_MASK:
+                    pos = end
+                    continue
+            yield int.from_bytes(hashlib.blake2b(data[start:end], digest_size=8).digest(), 'little'), end - start
+            start = end
+            pos = start + CHUNK_MIN_SIZE - 1
+        if not block:
+            if start < len(data):
+                yield (int.from_bytes(hashlib.blake2b(data[start:], digest_size=8).digest(), 'little'),
+                       len(data) - start)
+            return
+        data = data[start:]
+
+
+def file_chunks(path: str, should_continue=None) -> Optional[Tuple[array, array]]:
+    """بصمات قطع الملف وأطوالها بترتيب ظهورها، أو None إن أُوقف قبل نهايته"""
+    digests, lengths = array('Q'), array('I')
+    with open(path, 'rb') as f:
+        for digest, length in iter_chunks(f, should_continue):
+            digests.append(digest)
+            lengths.append(length)
+    if should_continue and not should_continue():
+        return None
+    return digests, lengths
+
+
+class ChunkCache:
+    """
+    ذاكرة دائمة لبصمات القطع (SQLite) مفتاحها المسار والحجم ووقت التعديل، فإعادة
+    التحليل لا تقرأ إلا الملفات الجديدة أو المتغيرة
+    """
+    
+    def __init__(self, path: str = CHUNK_CACHE_FILE):
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS chunks (path TEXT PRIMARY KEY, size INTEGER, "
+            "mtime INTEGER, digests BLOB, lengths BLOB)"
+        )
+    
+    def close(self):
+        self.db.close()
+    
+    def get(self, path: str, stat: os.stat_result) -> Optional[Tuple[array, array]]:
+        row = self.db.execute(
+            "SELECT digests, lengths FROM chunks WHERE path = ? AND size = ? AND mtime = ?",
+            (path, stat.st_size, stat.st_mtime_ns)
+        ).fetchone()
+        if row is None:
+            return None
+        digests, lengths = array('Q'), array('I')
+        digests.frombytes(row[0])
+        lengths.frombytes(row[1])
+        return digests, lengths
+    
+    def put(self, path: str, stat: os.stat_result, chunks: Tuple[array, array]):
+        with self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, chunks[0].tobytes(), chunks[1].tobytes())
+            )
+
+
+def compare_chunks(chunks: Tuple[array, array], other_digests: set) -> Tuple[int, int]:
+    """(البايتات الموجودة في قطع الملف الآخر، البايتات الفريدة المتصلة في نهاية الملف)"""
+    digests, lengths = chunks
+    shared = sum(length for digest, length in zip(digests, lengths) if digest in other_digests)
+    tail = 0
+    for digest, length in zip(reversed(digests), reversed(lengths)):
+        if digest in other_digests:
+            break
+        tail += length
+    return shared, tail
+
+
+def shared_bytes_report(files: List[dict], chunks: Dict[int, Tuple[array, array]]) -> Dict[int, List[str]]:
+    """
+    تقرير البايتات المشتركة لكل ملف في المجموعة من فهرس قطعها: نسبة ما يشترك به مع
+    بقية المجموعة، ثم مع كل ملف آخر (الأكثر اشتراكاً أولاً) مثل "97% من A + ذيل 40 MB".
+    chunks: رقم السجل -> (البصمات، الأطوال). يُرجع رقم السجل -> أسطر التقرير
+    """
+    index = {}  # بصمة القطعة -> أرقام الملفات التي تحتويها
+    for file_id, (digests, _) in chunks.items():
+        for digest in set(digests):
+            index.setdefault(digest, set()).add(file_id)
+    digest_sets = {file_id: set(digests) for file_id, (digests, _) in chunks.items()}
+    
+    reports = {}
+    for file_info in files:
+        file_id = file_info['id']
+        if file_id not in chunks:
+            continue
+        digests, lengths = chunks[file_id]
+        total = sum(lengths) or 1
+        shared_any = sum(
+            length for digest, length in zip(digests, lengths) if len(index[digest]) > 1
+        )
+        # النسب تُقرّب للأسفل حتى لا يظهر 100% لملف غير مطابق تماماً
+        lines = [f"🧱 يشترك مع بقية المجموعة في {format_size(shared_any)} "
+                 f"({shared_any * 100 // total}%) من {len(digests)} قطعة"]
+        
+        comparisons = []
+        for other in files:
+            if other['id'] == file_id or other['id'] not in chunks:
+                continue
+            shared, tail = compare_chunks(chunks[file_id], digest_sets[other['id']])
+            if shared * 100 >= total:  # أقل من 1% اشتراك عارض لا يُعرض
+                comparisons.append((shared, tail, other))
+        comparisons.sort(key=lambda item: item[0], reverse=True)
+        for shared, tail, other in comparisons[:CHUNK_REPORT_FILES]:
+            unique = total - shared
+            if not unique:
+                detail = ""
+            elif tail >= unique / 2:
+                detail = f" + ذيل {format_size(tail)}"
+            else:
+                detail = f" + {format_size(unique)} مختلفة"
+            lines.append(f"   • {shared * 100 // total}% من {other['name']}{detail}")
+        reports[file_id] = lines
+    return reports
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# التقدير السريع بالعينات
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def _sample_listing(path: str, depth: int, filters: ScanFilters, cache: dict,
+                    before_io=None) -> tuple:
+    """
+    (الملفات المقبولة بالاسم، المجلدات الفرعية المقبولة) لمجلد، مع التخزين المؤقت.
+    الروابط الرمزية لا تُتبع، كما في الفحص الكامل، فلا تُحتسب ملفاتها مرتين.
+    """
+    if path not in cache:
+        files, subdirs = [], []
+        if before_io:
+            before_io()
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        if filters.skip_hidden and _is_hidden_entry(entry):
+                            continue
+                        if entry.is_dir(follow_symlinks=False):
+                            if filters.accepts_dir(entry.name, depth + 1):
+                                subdirs.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False) and filters.accepts_name(entry.name):
+                            files.append(entry)
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+        cache[path] = (files, subdirs)
+    return cache[path]
+
+
+def random_walk_sample(roots: List[str], filters: ScanFilters, rng: random.Random,
+                       dir_cache: dict, stat_cache: dict, before_io=None) -> List[tuple]:
+    """
+    مسار عشوائي واحد من جذر إلى ورقة (مقدّر Knuth لحجم الشجرة): في كل مجلد يُختار
+    مجلد فرعي عشوائياً ويُضرب الوزن في عدد الخيارات، فوزن كل ملف في العينة هو مقلوب
+    احتمال اختياره ومجموع الأوزان تقدير غير متحيز لعدد الملفات.
+    before_io() يُستدعى قبل كل قراءة مجلد أو stat لم تُخزن بعد (حدود المعدل).
+    يُرجع (المسار، الحجم، الامتداد، الوزن) لكل ملف في العينة.
+    """
+    weight = len(roots)
+    path, depth = rng.choice(roots), 0
+    sample = []
+    while True:
+        files, subdirs = _sample_listing(path, depth, filters, dir_cache, before_io)
+        if files:
+            chosen = files if len(files) <= QUICK_FILES_PER_DIR else rng.sample(files, QUICK_FILES_PER_DIR)
+            file_weight = weight * len(files) / len(chosen)
+            for entry in chosen:
+                if entry.path not in stat_cache:
+                    if before_io:
+                        before_io()
+                    try:
+                        stat_cache[entry.path] = entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        stat_cache[entry.path] = None
+                size = stat_cache[entry.path]
+                if size is not None and filters.accepts_size(size):
+                    ext = os.path.splitext(entry.name)[1].lower()
+                    sample.append((entry.path, size, ext, file_weight))
+        if not subdirs:
+            return sample
+        weight *= len(subdirs)
+        path = rng.choice(subdirs)
+        depth += 1
+
+
+def estimate_from_walks(walks: List[List[tuple]], threshold_bytes: float,
+                        same_ext_only: bool) -> dict:
+    """
+    تقدير عدد الملفات والمجموعات والتوفير المحتمل من عينة المسارات العشوائية.
+    لكل ملف في العينة يُقدّر λ = العدد المتوقع لملفات المجتمع ضمن حد التقارب منه
+    (وبنفس الامتداد عند طلب ذلك) من أوزان العينة، ثم:
+    احتمال أن يكون في مجموعة = 1 - e^(-λ)، حجم مجموعته المتوقع = 1 + λ،
+    والتوفير منه (جميع الملفات عدا الأكبر) = حجمه × λ / (1 + λ).
+    """
+    # الملف الذي ظهر في عدة مسارات يُجمع وزنه (مقدّر Hansen-Hurwitz)
+    units = {}
+    for walk in walks:
+        for path, size, ext, weight in walk:
+            unit = units.setdefault(path, [size, ext if same_ext_only else None, 0.0])
+            unit[2] += weight / len(walks)
+    
+    by_key = {}
+    for size, key, weight in units.values():
+        by_key.setdefault(key, []).append((size, weight))
+    
+    files = groups = savings = 0.0
+    for entries in by_key.values():
+        entries.sort()
+        sizes = [size for size, _ in entries]
+        prefix = [0.0]
+        for _, weight in entries:
+            prefix.append(prefix[-1] + weight)
+        for size, weight in entries:
+            lo = bisect.bisect_left(sizes, size - threshold_bytes)
+            hi = bisect.bisect_right(sizes, size + threshold_bytes)
+            neighbors = max(0.0, prefix[hi] - prefix[lo] - weight)
+            in_group = 1 - math.exp(-neighbors)
+            files += weight
+            groups += weight * in_group / (1 + neighbors)
+            savings += weight * size * in_group * neighbors / (1 + neighbors)
+    return {'files': files, 'groups': groups, 'savings': savings}
+
+
+def quick_estimate(roots: List[str], threshold_bytes: float, same_ext_only: bool,
+                   filters: ScanFilters, seconds: float = QUICK_ESTIMATE_SECONDS,
+                   should_continue=None, on_progress=None, seed: Optional[int] = None,
+                   throttle: Optional[IOThrottle] = None) -> dict:
+    """
+    تقدير سريع بالعينات خلال seconds ثانية. المسارات توزع دورياً على QUICK_REPLICATES
+    عينة مستقلة، وفترة الثقة 95% تُحسب من تباين تقديرات هذه العينات حول تقدير العينة الكاملة.
+    throttle: كل قراءة مجلد أو stat عملية واحدة على حدود المعدل المشتركة.
+    """
+    roots = normalize_roots(roots)
+    before_io = (lambda: throttle.before(0, should_continue)) if throttle else None
+    rng = random.Random(seed)
+    dir_cache, stat_cache = {}, {}
+    replicates = [[] for _ in range(QUICK_REPLICATES)]
+    start = time.monotonic()
+    walks = 0
+    while time.monotonic() - start < seconds:
+        if should_continue and not should_continue():
+            break
+        replicates[walks % QUICK_REPLICATES].append(
+            random_walk_sample(roots, filters, rng, dir_cache, stat_cache, before_io)
+        )
+        walks += 1
+        if on_progress and walks % 50 == 0:
+            on_progress(min(1.0, (time.monotonic() - start) / seconds), walks)
+    
+    result = {
+        'walks': walks,
+        'dirs_listed': len(dir_cache),
+        'files_sampled': len(stat_cache),
+        'seconds': time.monotonic() - start
+    }
+    if walks < QUICK_REPLICATES:
+        return result
+    
+    estimate = estimate_from_walks([w for rep in replicates for w in rep], threshold_bytes, same_ext_only)
+    per_replicate = [estimate_from_walks(rep, threshold_bytes, same_ext_only) for rep in replicates]
+    for key, value in estimate.items():
+        spread = statistics.stdev(r[key] for r in per_replicate) / math.sqrt(QUICK_REPLICATES)
+        result[key] = value
+        result[f"{key}_low"] = max(0.0, value - 1.96 * spread)
+        result[f"{key}_high"] = value + 1.96 * spread
+    return result
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# أجزاء الفحص الموزع
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def write_scan_shard(path: str, roots: List[str], filters: ScanFilters,
+                     records: List[dict], host: Optional[str] = None):
+    """
+    كتابة جزء فحص مستقل بذاته (السجلات + البصمات إن وجدت) لمجلد فرعي أو جهاز.
+    الكتابة تتم في ملف مؤقت ثم تُستبدل دفعة واحدة حتى لا يُقرأ جزء ناقص.
+    """
+    shard = {
+        'format': SHARD_FORMAT,
+        'version': SHARD_VERSION,
+        'host': host or LOCAL_HOST,
+        'created': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'roots': roots,
+        'filters': asdict(filters),
+        'has_hashes': any('hash' in r or 'partial_hash' in r for r in records),
+        'records': [record_data(record) for record in records]
+    }
+    tmp_path = path + ".tmp"
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        json.dump(shard, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def read_scan_shard(path: str) -> dict:
+    """قراءة جزء فحص والتحقق من صيغته"""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        shard = json.load(f)
+    if shard.get('format') != SHARD_FORMAT:
+        raise ValueError(f"الملف ليس جزء فحص صالحاً: {path}")
+    if shard.get('version', 0) > SHARD_VERSION:
+        raise ValueError(f"إصدار جزء الفحص غير مدعوم: {path}")
+    return shard
+
+
+def iter_scan_shards(paths: List[str]):
+    """
+    مولّد يمر على سجلات أجزاء الفحص (أو لقطات الفحص) جزءاً بعد جزء، وكل سجل يحمل
+    اسم الجهاز الذي فُحص عليه. لا يُسقط المكرر بين الأجزاء: ExternalSizeSorter يدمجه
+    أثناء التجميع، و merge_scan_shards في الذاكرة.
+    """
+    for path in paths:
+        if path.endswith(SNAPSHOT_EXTENSION):
+            with ScanSnapshot(path) as snapshot:
+                for record in snapshot:
+                    record['host'] = record.get('host', LOCAL_HOST)
+                    yield record
+        else:
+            shard = read_scan_shard(path)
+            host = shard.get('host', '')
+            for record in shard.pop('records'):
+                record = intern_record(record)
+                record['host'] = host
+                yield record
+
+
+def merge_scan_shards(paths: List[str]) -> List[dict]:
+    """
+    دمج أي عدد من أجزاء الفحص (أو لقطات الفحص) في قائمة سجلات واحدة دون إعادة الفحص.
+    كل سجل يحمل اسم الجهاز الذي فُحص عليه، والسجلات المكررة (نفس الجهاز والمسار)
+    من أجزاء متداخلة تُحتسب مرة واحدة، وكذلك الروابط الصلبة لنفس الملف (كما في ExternalSizeSorter).
+    """
+    merged = []
+    seen = set()
+    seen_inodes = {}
+    for record in iter_scan_shards(paths):
+        host = record['host']
+        if (host, record_path(record)) in seen:
+            continue
+        paths_of = (record_path(record), *record.get('links', ()))
+        seen.update((host, path) for path in paths_of)
+        if 'inode' in record:
+            first = seen_inodes.get((host, *record['inode']))
+            if first is not None:
+                # نفس الملف باسم رابط آخر في جزء متداخل
+                links = first.setdefault('links', [])
+                links.extend(path for path in paths_of if path != record_path(first) and path not in links)
+                continue
+            seen_inodes[(host, *record['inode'])] = record
+        merged.append(record)
+    return merged
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# لقطات الفحص
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class _Interner:
+    """جدول نصوص بلا تكرار: النص -> رقم ثابت"""
+    
+    def __init__(self):
+        self.ids = {}
+        self.values = []
+    
+    def __call__(self, value: str) -> int:
+        idx = self.ids.get(value)
+        if idx is None:
+            idx = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return idx
+
+
+def _join_strings(values) -> bytes:
+    return "\0".join(values).encode('utf-8', 'surrogateescape')
+
+
+def _split_strings(blob) -> List[str]:
+    return bytes(blob).decode('utf-8', 'surrogateescape').split("\0") if len(blob) else []
+
+
+def snapshot_meta(roots: List[str], filters: Optional[ScanFilters], threshold_mb: float,
+                  same_ext_only: bool, verified: bool, same_type: bool = False) -> dict:
+    """بيانات الفحص المحفوظة مع اللقطة لإعادة عرض نتائجه كما كانت"""
+    return {
+        'roots': roots,
+        'filters': asdict(filters) if filters else None,
+        'threshold_mb': threshold_mb,
+        'same_ext': same_ext_only,
+        'same_type': same_type,
+        'verified': verified,
+        'host': LOCAL_HOST,
+        'timestamp': datetime.now().isoformat()
+    }
+
+
+def write_snapshot(path: str, records: List[dict], meta: dict):
+    """
+    كتابة لقطة فحص ثنائية مدمجة. السجلات تُرتب حسب الحجم وتُخزن أعمدةً:
+    فروق الأحجام المتتالية (uint32، والفروق الكبيرة في جدول منفصل)، وأرقام المجلدات
+    من جدول مجلدات بلا تكرار مع أسماء الملفات، وأرقام للامتدادات والجذور والأجهزة
+    والتواريخ وأنواع المحتوى من جداول مشتركة، والبصمات الكاملة (16 بايت) إن وُجدت.
+    الترويسة تحمل الإصدار وCRC32 للمتن، والكتابة ذرية عبر ملف مؤقت.
+    """
+    records = sorted(records, key=lambda x: x['size'])
+    dirs, exts, roots, hosts, times, types = (_Interner() for _ in range(6))
+    types("")  # الرقم 0: لم يُكشف النوع (None: كُشف ولم يُعرف)
+    names = []
+    size_deltas, size_overflow = array('I'), []
+    columns = {key: array('I') for key in SNAPSHOT_COLUMNS}
+    hashes = bytearray()
+    has_hashes = any(r.get('hash') for r in records)
+    extras = {}
+    
+    previous = 0
+    for idx, record in enumerate(records):
+        delta = record['size'] - previous
+        previous = record['size']
+        if delta >= 0xFFFFFFFF:
+            size_deltas.append(0xFFFFFFFF)
+            size_overflow.append(struct.pack('<IQ', idx, delta))
+        else:
+            size_deltas.append(delta)
+        columns['dir_ids'].append(dirs(os.path.dirname(record_path(record))))
+        names.append(record['name'])
+        columns['ext_ids'].append(exts(record['ext']))
+        columns['root_ids'].append(roots(record.get('root', "")))
+        columns['host_ids'].append(hosts(record.get('host', "")))
+        columns['created_ids'].append(times(record['created']))
+        columns['modified_ids'].append(times(record['modified']))
+        columns['type_ids'].append(types(record['type']) if 'type' in record else 0)
+        if has_hashes:
+            hashes += bytes.fromhex(record['hash']) if record.get('hash') else bytes(16)
+        extra = {key: record[key] for key in SNAPSHOT_EXTRA_KEYS if key in record}
+        if extra:
+            extras[idx] = extra
+    
+    # الجداول المشتركة في مفتاح خاص بها حتى لا تحل محل جذور الفحص في meta['roots']
+    meta = dict(meta, tables={'exts': exts.values, 'roots': roots.values, 'hosts': hosts.values,
+                              'times': times.values, 'types': types.values}, extras=extras)
+    sections = {
+        'meta': json.dumps(meta, ensure_ascii=False).encode('utf-8'),
+        'dirs': _join_strings(dirs.values),
+        'names': _join_strings(names),
+        'size_deltas': size_deltas.tobytes(),
+        'size_overflow': b"".join(size_overflow),
+        'hashes': bytes(hashes),
+        **{key: column.tobytes() for key, column in columns.items()}
+    }
+    if sys.byteorder != 'little':
+        for key in ('size_deltas', *columns):
+            column = array('I', sections[key])
+            column.byteswap()
+            sections[key] = column.tobytes()
+    
+    table = struct.pack(f'<{len(SNAPSHOT_SECTIONS)}Q', *(len(sections[k]) for k in SNAPSHOT_SECTIONS))
+    body = table + b"".join(sections[k] for k in SNAPSHOT_SECTIONS)
+    header = SNAPSHOT_HEADER.pack(
+        SNAPSHOT_MAGIC, SNAPSHOT_VERSION, SNAPSHOT_FLAG_HASHES if has_hashes else 0,
+        len(records), len(body), zlib.crc32(body)
+    )
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        f.write(body)
+    os.replace(tmp_path, path)
+
+
+class ScanSnapshot:
+    """
+    لقطة فحص محملة عبر mmap: الأعمدة تُقرأ مباشرة من الملف المعيّن في الذاكرة، والأحجام
+    تُستعاد بجمع تراكمي واحد، أما سجلات الملفات فتُبنى عند الطلب فقط (وتُحفظ بعد بنائها
+    حتى تبقى البصمات وأي تعديل عليها). تعمل كتسلسل سجلات مرتب حسب الحجم.
+    """
+    
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._map)
+        try:
+            if len(view) < SNAPSHOT_HEADER.size:
+                raise ValueError("ملف اللقطة تالف")
+            magic, version, flags, count, body_len, crc = SNAPSHOT_HEADER.unpack_from(view)
+            if magic != SNAPSHOT_MAGIC:
+                raise ValueError("الملف ليس لقطة فحص")
+            if version != SNAPSHOT_VERSION:
+                raise ValueError(f"إصدار لقطة غير مدعوم: {version}")
+            body = view[SNAPSHOT_HEADER.size:SNAPSHOT_HEADER.size + body_len]
+            if len(body) != body_len or zlib.crc32(body) != crc:
+                raise ValueError("ملف اللقطة تالف (CRC)")
+        except ValueError:
+            view.release()
+            self._map.close()
+            raise
+        
+        table = struct.Struct(f'<{len(SNAPSHOT_SECTIONS)}Q')
+        offset = table.size
+        sections = {}
+        spans = {}
+        for key, length in zip(SNAPSHOT_SECTIONS, table.unpack_from(body)):
+            sections[key] = body[offset:offset + length]
+            spans[key] = (SNAPSHOT_HEADER.size + offset, SNAPSHOT_HEADER.size + offset + length)
+            offset += length
+        
+        def column(key):
+            data = sections[key]
+            if sys.byteorder != 'little':
+                swapped = array('I', data)
+                swapped.byteswap()
+                return swapped
+            return data.cast('I')
+        
+        self.count = count
+        self.meta = json.loads(bytes(sections['meta']).decode('utf-8'))
+        self.dirs = _split_strings(sections['dirs'])
+        self._dir_ids = [None] * len(self.dirs)  # رقم مجلد اللقطة -> رقمه في جدول المجلدات
+        self._names_blob = sections['names']
+        self._names_span = spans['names']
+        tables = self.meta.pop('tables')
+        self._exts = tables['exts']
+        self._roots = tables['roots']
+        self._hosts = tables['hosts']
+        self._times = tables['times']
+        self._types = tables['types']
+        self._extras = {int(k): v for k, v in self.meta.pop('extras').items()}
+        self._columns = {key: column(key) for key in ('size_deltas', *SNAPSHOT_COLUMNS)}
+        self._hashes = sections['hashes'] if flags & SNAPSHOT_FLAG_HASHES else None
+        overflow = sections['size_overflow']
+        self._overflow = dict(
+            struct.unpack_from('<IQ', overflow, pos) for pos in range(0, len(overflow), 12)
+        )
+        self._sizes = None
+        self._exts_column = None
+        self._names = None
+        self._records = {}
+    
+    def close(self):
+        self._columns = {}
+        self._hashes = None
+        self._names_blob = None
+        self._map.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def __len__(self):
+        return self.count
+    
+    def _size_deltas(self) -> List[int]:
+        deltas = self._columns['size_deltas'].tolist()
+        for idx, delta in self._overflow.items():
+            deltas[idx] = delta
+        return deltas
+    
+    # الأعمدة الكاملة تُبنى عند أول وصول عشوائي فقط؛ المرور المتسلسل لا يحتاجها
+    @property
+    def sizes(self) -> List[int]:
+        if self._sizes is None:
+            self._sizes = list(accumulate(self._size_deltas()))
+        return self._sizes
+    
+    @property
+    def exts(self) -> List[str]:
+        if self._exts_column is None:
+            self._exts_column = [self._exts[i] for i in self._columns['ext_ids']]
+        return self._exts_column
+    
+    @property
+    def names(self) -> List[str]:
+        if self._names is None:
+            self._names = _split_strings(self._names_blob)
+        return self._names
+    
+    def _build(self, idx: int, size: int, name: str) -> dict:
+        columns = self._columns
+        snapshot_dir = columns['dir_ids'][idx]
+        dir_id = self._dir_ids[snapshot_dir]
+        if dir_id is None:
+            dir_id = self._dir_ids[snapshot_dir] = DIRECTORIES.intern(self.dirs[snapshot_dir])
+        record = {
+            'id': next(_file_ids),
+            'dir': dir_id,
+            'name': name,
+            'root': self._roots[columns['root_ids'][idx]],
+            'size': size,
+            'ext': self._exts[columns['ext_ids'][idx]],
+            'created': self._times[columns['created_ids'][idx]],
+            'modified': self._times[columns['modified_ids'][idx]]
+        }
+        # سجلات فحص محلي بلا جهاز تنتمي لجهاز اللقطة، فلا تُعامل كمحلية على جهاز آخر
+        host = self._hosts[columns['host_ids'][idx]] or self.meta.get('host', LOCAL_HOST)
+        if host != LOCAL_HOST:
+            record['host'] = host
+        type_id = columns['type_ids'][idx]
+        if type_id:
+            record['type'] = self._types[type_id]
+        if self._hashes is not None:
+            digest = bytes(self._hashes[idx * 16:idx * 16 + 16])
+            if any(digest):
+                record['hash'] = digest.hex()
+        record.update(self._extras.get(idx, ()))
+        return record
+    
+    def record(self, idx: int) -> dict:
+        record = self._records.get(idx)
+        if record is None:
+            record = self._records[idx] = self._build(idx, self.sizes[idx], self.names[idx])
+        return record
+    
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self.record(i) for i in range(*idx.indices(self.count))]
+        if idx < 0:
+            idx += self.count
+        if not 0 <= idx < self.count:
+            raise IndexError(idx)
+        return self.record(idx)
+    
+    def __iter__(self):
+        return (self.record(i) for i in range(self.count))
+    
+    def iter_records(self):
+        """
+        مرور متسلسل بترتيب الحجم بذاكرة ثابتة: الأحجام بجمع تراكمي والأسماء من الملف
+        مباشرة، والسجلات المبنية لا تُحفظ (عدا ما بُني سابقاً فيُعاد نفسه)
+        """
+        start, stop = self._names_span
+        deltas = self._columns['size_deltas']
+        size = 0
+        for idx in range(self.count):
+            delta = deltas[idx]
+            size += self._overflow[idx] if delta == 0xFFFFFFFF else delta
+            end = self._map.find(b"\0", start, stop)
+            if end < 0:
+                end = stop
+            name = self._map[start:end].decode('utf-8', 'surrogateescape')
+            start = end + 1
+            yield self._records.get(idx) or self._build(idx, size, name)
+    
+    def size_index(self) -> SizeIndex:
+        """فهرس أحجام فوق اللقطة دون بناء كل السجلات"""
+        return SizeIndex(self, presorted=True, sizes=self.sizes, exts=self.exts)
+    
+    def groups(self, threshold_bytes: float, same_ext_only: bool,
+               verified: bool = False, same_type: bool = False) -> List[List[dict]]:
+        groups = self.size_index().groups(threshold_bytes, same_ext_only)
+        if same_type:
+            # الأنواع المكشوفة محفوظة مع سجلات المرشحين
+            groups = [g for group in groups for g in split_group_by_type(group)]
+        if verified:
+            groups = [g for group in groups for g in split_group_by_content(group)]
+        return groups
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# مقارنة اللقطات
+# ═══════════════════════════════════════════════════════════════════════════════
+
+DIFF_LABELS = {'new': "جديدة", 'grown': "نمت", 'resolved': "حُلّت"}
+
+
+def record_key(file_info: dict) -> tuple:
+    """هوية الملف عبر الفحوصات: الجهاز والمسار"""
+    return file_info.get('host', LOCAL_HOST), record_path(file_info)
+
+
+def _classify_component(old_groups: List[List[dict]], new_groups: List[List[dict]]):
+    """
+    تصنيف مجموعات متداخلة الأحجام من الفحصين: مجموعة حالية لا تشترك مع مجموعات الفحص
+    السابق في ملفين فأكثر جديدة، وإن اشتركت وزادت عليها ملفات فقد نمت؛ ومجموعة سابقة
+    لم يبق منها ملفان في مجموعات الفحص الحالي قد حُلّت
+    """
+    old_keys = {record_key(f) for group in old_groups for f in group}
+    new_keys = {record_key(f) for group in new_groups for f in group}
+    for group in new_groups:
+        keys = [record_key(f) for f in group]
+        common = sum(1 for key in keys if key in old_keys)
+        added = {key for key in keys if key not in old_keys}
+        if common < 2:
+            yield {'status': 'new', 'files': group, 'changed': added}
+        elif added:
+            yield {'status': 'grown', 'files': group, 'changed': added}
+    for group in old_groups:
+        keys = [record_key(f) for f in group]
+        if sum(1 for key in keys if key in new_keys) < 2:
+            yield {'status': 'resolved', 'files': group,
+                   'changed': {key for key in keys if key not in new_keys}}
+
+
+def diff_snapshots(old_records, new_records, threshold_bytes: float, same_ext_only: bool,
+                   old_verified: bool = False, new_verified: bool = False):
+    """
+    مقارنة فحصين بمرور دمج واحد على سجلاتهما المرتبة حسب الحجم، مع تجميع كل جانب
+    بنفس قاعدة المرساة. المجموعات المغلقة تنتظر حتى تتجاوز مراسي المجموعات المفتوحة
+    في الجانبين أكبر أحجامها، ثم تُقسم إلى مكونات متداخلة وتُصنف وتُنسى؛ فالذاكرة
+    بحجم المجموعات المتداخلة لحظياً لا بعدد الملفات.
+    مولّد يُرجع {'status': new|grown|resolved, 'files', 'changed'} حيث changed مفاتيح
+    الملفات المضافة (أو التي خرجت من المجموعة المحلولة).
+    """
+    verified = (old_verified, new_verified)
+    open_groups = ({}, {})
+    pending = {}  # المفتاح -> [أكبر حجم، [(الجانب، أصغر حجم، أكبر حجم، المجموعات)]]
+    
+    def close_group(side, key, files):
+        groups = split_group_by_content(files) if verified[side] else [files]
+        if not groups:
+            return
+        entry = pending.setdefault(key, [files[-1]['size'], []])
+        entry[0] = max(entry[0], files[-1]['size'])
+        entry[1].append((side, files[0]['size'], files[-1]['size'], groups))
+    
+    def flush(key):
+        _, closed = pending.pop(key)
+        closed.sort(key=lambda item: item[1])
+        component = ([], [])
+        component_hi = None
+        for side, lo, hi, groups in closed:
+            if component_hi is not None and lo > component_hi:
+                yield from _classify_component(*component)
+                component = ([], [])
+                component_hi = None
+            component[side].extend(groups)
+            component_hi = hi if component_hi is None else max(component_hi, hi)
+        yield from _classify_component(*component)
+    
+    def tagged(records, side):
+        for record in records:
+            yield record['size'], side, record
+    
+    for size, side, record in heapq.merge(tagged(old_records, 0), tagged(new_records, 1),
+                                          key=lambda item: item[0]):
+        key = record['ext'] if same_ext_only else None
+        current = open_groups[side].get(key)
+        if current is not None and size - current[0] <= threshold_bytes:
+            current[1].append(record)
+            continue
+        if current is not None and len(current[1]) > 1:
+            close_group(side, key, current[1])
+        open_groups[side][key] = (size, [record])
+        
+        entry = pending.get(key)
+        if entry is not None and all(
+            key not in groups or groups[key][0] > entry[0] for groups in open_groups
+        ):
+            yield from flush(key)
+    
+    for side, groups in enumerate(open_groups):
+        for key, (_, files) in groups.items():
+            if len(files) > 1:
+                close_group(side, key, files)
+    for key in list(pending):
+        yield from flush(key)
+
+
+def diff_report_groups(changes: List[dict]) -> Tuple[List[List[dict]], List[str], set]:
+    """تحويل نتائج المقارنة إلى مدخلات تقارير TXT/CSV: المجموعات، حالة كل منها، الملفات المتغيرة"""
+    order = {status: idx for idx, status in enumerate(DIFF_LABELS)}
+    changes = sorted(changes, key=lambda change: order[change['status']])
+    marked = set()
+    for change in changes:
+        marked.update(change['changed'])
+    return ([change['files'] for change in changes],
+            [DIFF_LABELS[change['status']] for change in changes], marked)
+
+
+def write_json_diff(file_path: str, changes: List[dict], old_meta: dict, new_meta: dict):
+    """كتابة نتائج المقارنة بصيغة JSON للمعالجة الآلية"""
+    def file_entry(file_info, changed):
+        entry = {'path': record_path(file_info), 'size': file_info['size'],
+                 'changed': record_key(file_info) in changed}
+        if 'host' in file_info:
+            entry['host'] = file_info['host']
+        if 'hash' in file_info:
+            entry['hash'] = file_info['hash']
+        return entry
+    
+    result = {
+        'format': "fsd-diff",
+        'version': 1,
+        'created': datetime.now().isoformat(),
+        'old': {k: old_meta.get(k) for k in ('roots', 'host', 'timestamp')},
+        'new': {k: new_meta.get(k) for k in ('roots', 'host', 'timestamp')},
+        'summary': {status: sum(1 for c in changes if c['status'] == status) for status in DIFF_LABELS},
+        'groups': [
+            {
+                'status': change['status'],
+                'savings': group_savings(change['files']),
+                'files': [file_entry(f, change['changed']) for f in change['files']]
+            }
+            for change in changes
+        ]
+    }
+    with open(file_path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# فهرس المحتوى عبر الأقراص
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class BloomFilter:
+    """مرشح Bloom مدمج: "غير موجود" مؤكد، و"ربما موجود" يُتحقق منه في الفهرس"""
+    
+    def __init__(self, bits: int, hashes: int = BLOOM_HASHES, data: Optional[bytes] = None):
+        self.bits = max(64, bits)
+        self.hashes = hashes
+        self.data = bytearray(data) if data is not None else bytearray((self.bits + 7) // 8)
+    
+    @classmethod
+    def for_items(cls, count: int) -> 'BloomFilter':
+        return cls(count * BLOOM_BITS_PER_ITEM)
+    
+    def _positions(self, key: bytes):
+        # تجزئة مزدوجة: k موضعاً من بصمة واحدة
+        h1, h2 = struct.unpack('<QQ', hashlib.blake2b(key, digest_size=16).digest())
+        return ((h1 + i * h2) % self.bits for i in range(self.hashes))
+    
+    def add(self, key: bytes):
+        for pos in self._positions(key):
+            self.data[pos >> 3] |= 1 << (pos & 7)
+    
+    def __contains__(self, key: bytes) -> bool:
+        return all(self.data[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+def _unescape_label(name: str) -> str:
+    """
+    فك ترميز udev في أسماء /dev/disk: البايتات غير الآمنة تُكتب \\xNN (\\x20 = مسافة)،
+    فتُعاد بايتات ثم يُفك الاسم كله UTF-8 (التسميات العربية تُرمّز بايتاً بايتاً)
+    """
+    raw = re.sub(rb'\\x([0-9a-fA-F]{2})', lambda m: bytes([int(m[1], 16)]), os.fsencode(name))
+    return raw.decode('utf-8', 'surrogateescape')
+
+
+def _disk_label(device: int) -> Optional[str]:
+    """تسمية القرص (أو معرّفه) من /dev/disk على لينكس"""
+    for folder in ("/dev/disk/by-label", "/dev/disk/by-uuid"):
+        try:
+            names = os.listdir(folder)
+        except OSError:
+            continue
+        for name in names:
+            try:
+                if os.stat(os.path.join(folder, name)).st_rdev == device:
+                    return _unescape_label(name)
+            except OSError:
+                continue
+    return None
+
+
+def volume_of(path: str) -> Tuple[str, str]:
+    """(تسمية القرص، نقطة التركيب) للمسار - التسمية ثابتة مهما تغيّرت نقطة التركيب"""
+    mount = os.path.realpath(path)
+    while not os.path.ismount(mount) and os.path.dirname(mount) != mount:
+        mount = os.path.dirname(mount)
+    label = None
+    if sys.platform == "win32":
+        name = ctypes.create_unicode_buffer(261)
+        serial = ctypes.c_uint32()
+        if ctypes.windll.kernel32.GetVolumeInformationW(
+            mount, name, len(name), ctypes.byref(serial), None, None, None, 0
+        ):
+            label = name.value or f"{serial.value:08X}"
+    else:
+        try:
+            label = _disk_label(os.stat(mount).st_dev)
+        except OSError:
+            pass
+    return label or mount, mount
+
+
+class ContentCatalog:
+    """
+    فهرس دائم لمحتوى الأقراص (الحجم، البصمة الجزئية، البصمة الكاملة، القرص، المسار)
+    يُجمع من الفحوصات المتتالية، مع مرشح Bloom لأحجام كل قرص. المسارات نسبية لنقطة
+    التركيب حتى يتعرف على القرص المتنقل أينما رُكّب. الاتصال يُستخدم في خيط واحد.
+    """
+    
+    def __init__(self, path: str = CATALOG_FILE):
+        self.db = sqlite3.connect(path)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS volumes (
+                label TEXT PRIMARY KEY, mount TEXT, files INTEGER,
+                bloom BLOB, bloom_bits INTEGER, updated TEXT
+            );
+            CREATE TABLE IF NOT EXISTS files (
+                volume TEXT, path TEXT, size INTEGER, partial_hash TEXT, hash TEXT,
+                PRIMARY KEY (volume, path)
+            );
+            CREATE INDEX IF NOT EXISTS files_size ON files (volume, size);
+        """)
+    
+    def close(self):
+        self.db.close()
+    
+    def volumes(self) -> List[dict]:
+        rows = self.db.execute("SELECT label, mount, files, updated FROM volumes ORDER BY label")
+        return [{'label': label, 'mount': mount, 'files': files, 'updated': updated}
+                for label, mount, files, updated in rows]
+    
+    def update(self, root: str, records: List[dict]) -> str:
+        """
+        استبدال ما تحت root في الفهرس بسجلات فحصه الحالي (مساراتها تبدأ بـ root)
+        وإعادة بناء مرشح القرص
+        """
+        label, mount = volume_of(root)
+        prefix = os.path.relpath(os.path.realpath(root), mount)
+        prefix = "" if prefix == os.curdir else prefix.rstrip(os.sep) + os.sep
+        base = len(root.rstrip(os.sep)) + 1
+        with self.db:
+            self.db.execute(
+                "DELETE FROM files WHERE volume = ? AND substr(path, 1, ?) = ?",
+                (label, len(prefix), prefix)
+            )
+            self.db.executemany(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                ((label, prefix + record_path(r)[base:], r['size'],
+                  r.get('partial_hash'), r.get('hash')) for r in records)
+            )
+            count = self.db.execute("SELECT COUNT(*) FROM files WHERE volume = ?", (label,)).fetchone()[0]
+            bloom = BloomFilter.for_items(count)
+            for (size,) in self.db.execute("SELECT size FROM files WHERE volume = ?", (label,)):
+                bloom.add(SIZE_KEY.pack(size))
+            self.db.execute(
+                "INSERT OR REPLACE INTO volumes VALUES (?, ?, ?, ?, ?, ?)",
+                (label, mount, count, bytes(bloom.data), bloom.bits,
+                 datetime.now().strftime("%Y-%m-%d %H:%M"))
+            )
+        return label
+    
+    def blooms(self, exclude=()) -> Dict[str, BloomFilter]:
+        return {
+            label: BloomFilter(bits, data=data)
+            for label, data, bits in self.db.execute("SELECT label, bloom, bloom_bits FROM volumes")
+            if label not in exclude
+        }
+    
+    def files_with_sizes(self, label: str, sizes: List[int]):
+        """صفوف (المسار، الحجم، البصمة الجزئية، البصمة) لقرص بأحجام معينة"""
+        for start in range(0, len(sizes), CATALOG_QUERY_BATCH):
+            batch = sizes[start:start + CATALOG_QUERY_BATCH]
+            yield from self.db.execute(
+                f"SELECT path, size, partial_hash, hash FROM files "
+                f"WHERE volume = ? AND size IN ({','.join('?' * len(batch))})",
+                (label, *batch)
+            )
+
+
+def catalog_record(label: str, path: str, size: int, partial_hash: Optional[str],
+                   full_hash: Optional[str]) -> dict:
+    """سجل افتراضي لملف على قرص آخر من الفهرس (لا يُنقل ولا يُقرأ)"""
+    name = os.path.basename(path)
+    record = {
+        'id': next(_file_ids), 'path': path, 'name': name, 'root': "", 'size': size,
+        'ext': os.path.splitext(name)[1].lower(), 'created': "", 'modified': "", 'volume': label
+    }
+    if partial_hash:
+        record['partial_hash'] = partial_hash
+    if full_hash:
+        record['hash'] = full_hash
+    return record
+
+
+def find_catalog_matches(catalog: ContentCatalog, records: List[dict], exclude_volumes,
+                         verify: bool, engine=None, should_continue=None) -> List[List[dict]]:
+    """
+    مجموعات تجمع ملفات الفحص الحالي بنسخ لها على أقراص أخرى في الفهرس دون الوصول لتلك
+    الأقراص: مرشح Bloom لكل قرص يستبعد معظم الأحجام، ولا يُستعلم الفهرس إلا عن الأحجام
+    المرشحة. مع التحقق تُحسب البصمة الجزئية للمرشحين فقط، والكاملة لمن طابقت بصمته الجزئية.
+    """
+    blooms = catalog.blooms(exclude_volumes)
+    local = {}
+    for record in records:
+        if record['size'] and is_local_record(record):
+            local.setdefault(record['size'], []).append(record)
+    
+    rows = {}  # الحجم -> [(القرص، المسار، البصمة الجزئية، البصمة)]
+    for label, bloom in blooms.items():
+        sizes = [size for size in local if SIZE_KEY.pack(size) in bloom]
+        for path, size, partial_hash, full_hash in catalog.files_with_sizes(label, sizes):
+            rows.setdefault(size, []).append((label, path, partial_hash, full_hash))
+    if not rows or (should_continue and not should_continue()):
+        return []
+    
+    matches = {}  # المفتاح -> (الملفات المحلية، الصفوف)
+    if not verify:
+        for size, size_rows in rows.items():
+            matches[size] = (local[size], size_rows)
+    else:
+        engine = engine or AsyncIOEngine(1)
+        candidates = [r for size in rows for r in local[size] if 'partial_hash' not in r]
+        for record, digest in zip(candidates, engine.map(
+            lambda r: file_digest(record_path(r), PARTIAL_HASH_SIZE), candidates, should_continue
+        )):
+            if isinstance(digest, str):
+                record['partial_hash'] = digest
+        partials = {(size, row[2]) for size, size_rows in rows.items() for row in size_rows if row[2]}
+        candidates = [
+            r for size in rows for r in local[size]
+            if (size, r.get('partial_hash')) in partials and 'hash' not in r
+        ]
+        for record, digest in zip(candidates, engine.map(
+            lambda r: file_digest(record_path(r)), candidates, should_continue
+        )):
+            if isinstance(digest, str):
+                record['hash'] = digest
+        for size, size_rows in rows.items():
+            for record in local[size]:
+                if record.get('hash'):
+                    matches.setdefault((size, record['hash']), ([], []))[0].append(record)
+            for row in size_rows:
+                if (size, row[3]) in matches:
+                    matches[(size, row[3])][1].append(row)
+    
+    groups = []
+    for key, (files, size_rows) in matches.items():
+        if files and size_rows:
+            size = key[0] if verify else key
+            groups.append(files + [
+                catalog_record(label, path, size, partial_hash, full_hash)
+                for label, path, partial_hash, full_hash in size_rows
+            ])
+    return groups
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# الملفات المعروفة
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def file_digests(path: str, algorithms) -> Dict[str, str]:
+    """عدة بصمات للملف في قراءة واحدة"""
+    hashers = {
+        algo: hashlib.blake2b(digest_size=16) if algo == INTERNAL_HASH else hashlib.new(algo)
+        for algo in algorithms
+    }
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            charge_io(len(chunk))
+            for hasher in hashers.values():
+                hasher.update(chunk)
+    return {algo: hasher.hexdigest() for algo, hasher in hashers.items()}
+
+
+class ReferenceSet:
+    """
+    مجموعة ملفات معروفة (نسخ أصلية، قائمة مورّد...) مفهرسة للمطابقة السريعة:
+    أزواج (الحجم، الاسم) وبصمات بخوارزميتها. البصمات المعروف حجمها تُفحص فقط للملفات
+    بنفس الحجم، والتي بلا حجم (مخرجات sha256sum مثلاً) فقط للملفات بنفس الاسم.
+    """
+    
+    def __init__(self):
+        self.hashes = {}   # الخوارزمية -> مجموعة البصمات
+        self.by_size = {}  # الحجم -> (الأسماء، الخوارزميات)
+        self.by_name = {}  # الاسم -> الخوارزميات (بصمات بلا حجم)
+        self.entries = 0
+        self.sources = []
+    
+    def __len__(self):
+        return self.entries
+    
+    def _size_entry(self, size: int):
+        return self.by_size.setdefault(size, (set(), set()))
+    
+    def add_name(self, size: int, name: str):
+        self._size_entry(size)[0].add(os.path.normcase(name))
+        self.entries += 1
+    
+    def add_hash(self, algo: str, digest: str, size: Optional[int] = None, name: str = ""):
+        self.hashes.setdefault(algo, set()).add(digest.lower())
+        if size is not None:
+            self._size_entry(size)[1].add(algo)
+        elif name:
+            self.by_name.setdefault(os.path.normcase(name), set()).add(algo)
+        else:
+            return
+        self.entries += 1
+    
+    def probe(self, file_info: dict) -> Tuple[bool, set]:
+        """(مطابق بالحجم والاسم، الخوارزميات التي يجب حساب بصمتها للتأكد)"""
+        name = os.path.normcase(file_info['name'])
+        algos = set(self.by_name.get(name, ()))
+        entry = self.by_size.get(file_info['size'])
+        if entry is not None:
+            if name in entry[0]:
+                return True, set()
+            algos |= entry[1]
+        return False, algos
+    
+    def matches(self, digests: Dict[str, str]) -> bool:
+        return any(digest in self.hashes.get(algo, ()) for algo, digest in digests.items())
+    
+    def load(self, path: str) -> int:
+        """إضافة ملف مرجعي: لقطة فحص أو CSV أو قائمة نصية. يُرجع عدد المدخلات المضافة"""
+        before = self.entries
+        if path.endswith(SNAPSHOT_EXTENSION):
+            with ScanSnapshot(path) as snapshot:
+                for record in snapshot.iter_records():
+                    if record.get('hash'):
+                        self.add_hash(INTERNAL_HASH, record['hash'], record['size'])
+                    else:
+                        self.add_name(record['size'], record['name'])
+        elif path.lower().endswith('.csv'):
+            self._load_csv(path)
+        else:
+            self._load_manifest(path)
+        self.sources.append(os.path.basename(path))
+        return self.entries - before
+    
+    def _load_csv(self, path: str):
+        # أعمدة تقارير CSV للتطبيق أو أعمدة عامة (size/name/md5/sha1/sha256/hash)
+        size_columns = ('الحجم (بايت)', 'size', 'bytes')
+        name_columns = ('اسم الملف', 'name', 'filename')
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            for row in csv.DictReader(f):
+                row = {key.strip().lower(): (value or "").strip() for key, value in row.items() if key}
+                size = next((int(row[c]) for c in size_columns if row.get(c, "").isdigit()), None)
+                name = next((os.path.basename(row[c]) for c in name_columns if row.get(c)), "")
+                hashed = False
+                for algo in ('md5', 'sha1', 'sha256', 'sha512', 'hash'):
+                    digest = row.get(algo)
+                    if digest:
+                        algo = REFERENCE_ALGORITHMS.get(len(digest), algo) if algo == 'hash' else algo
+                        self.add_hash(algo, digest, size, name)
+                        hashed = True
+                if not hashed and size is not None and name:
+                    self.add_name(size, name)
+    
+    def _load_manifest(self, path: str):
+        """
+        أسطر بأحد الأشكال: "الحجم الاسم"، "البصمة الحجم [الاسم]"، أو "البصمة  الاسم"
+        (مخرجات md5sum/sha256sum). الخوارزمية تُعرف من طول البصمة.
+        """
+        with open(path, 'r', encoding='utf-8', errors='surrogateescape') as f:
+            for line in f:
+                parts = line.strip().split(None, 2)
+                if len(parts) < 2 or line.startswith('#'):
+                    continue
+                first, second = parts[0], parts[1]
+                rest = parts[2] if len(parts) > 2 else ""
+                if first.isdigit():
+                    self.add_name(int(first), os.path.basename(line.strip().split(None, 1)[1]))
+                    continue
+                algo = REFERENCE_ALGORITHMS.get(len(first))
+                if algo is None:
+                    continue
+                if second.isdigit():
+                    self.add_hash(algo, first, int(second), os.path.basename(rest))
+                else:
+                    name = line.strip().split(None, 1)[1].lstrip('*')  # وضع ثنائي في sha256sum
+                    self.add_hash(algo, first, None, os.path.basename(name))
+
+
+class ReferenceMatcher:
+    """
+    مرشح يوضع أمام add_record أثناء جمع السجلات: الحجم المجموع أصلاً يُفحص في المجموعة
+    المرجعية أولاً، والمطابق بالاسم يُحسم فوراً، ولا تُحسب البصمات إلا لمن قد يطابق
+    (على دفعات بجدولة الأقراص). المطابق يُعلَّم بـ 'known' أو يُستبعد.
+    """
+    
+    def __init__(self, reference: ReferenceSet, add_record, exclude: bool = False,
+                 engine=None, should_continue=None):
+        self.reference = reference
+        self.add_record = add_record
+        self.exclude = exclude
+        self.engine = engine or AsyncIOEngine(1)
+        self.should_continue = should_continue
+        self.pending = []
+        self.probed = 0
+        self.hashed = 0
+        self.matched = 0
+    
+    def __call__(self, file_info: dict):
+        if not is_local_record(file_info):
+            self.add_record(file_info)
+            return
+        by_name, algos = self.reference.probe(file_info)
+        if by_name:
+            self.probed += 1
+            self._resolve(file_info, True)
+        elif algos:
+            self.probed += 1
+            self.pending.append((file_info, algos))
+            if len(self.pending) >= REFERENCE_HASH_BATCH:
+                self.flush()
+        else:
+            self.add_record(file_info)
+    
+    def flush(self):
+        """حساب بصمات المرشحين المعلّقين وتمريرهم"""
+        pending, self.pending = self.pending, []
+        if not pending:
+            return
+        results = self.engine.map(
+            lambda item: file_digests(record_path(item[0]), item[1] | {INTERNAL_HASH}),
+            pending, self.should_continue,
+            bytes_of=lambda item: item[0]['size']
+        )
+        for (file_info, _), digests in zip(pending, results):
+            if not isinstance(digests, dict):
+                self.add_record(file_info)
+                continue
+            self.hashed += 1
+            # البصمة الداخلية تُحفظ فلا يُعاد حسابها عند التحقق من المحتوى
+            file_info['hash'] = digests.pop(INTERNAL_HASH)
+            if INTERNAL_HASH in self.reference.hashes:
+                digests[INTERNAL_HASH] = file_info['hash']
+            self._resolve(file_info, self.reference.matches(digests))
+    
+    def _resolve(self, file_info: dict, matched: bool):
+        if matched:
+            self.matched += 1
+            if self.exclude:
+                return
+            file_info['known'] = "، ".join(self.reference.sources)
+        self.add_record(file_info)
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# قواعد التحديد
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# (دالة الاختيار، المفتاح) - max وmin تُرجعان أول ملف عند التساوي فالنتيجة ثابتة
+KEEP_RULES = {
+    'newest': (max, lambda f: f['modified']),  # "YYYY-MM-DD HH:MM" يُرتب كنص
+    'oldest': (min, lambda f: f['modified']),
+    'largest': (max, lambda f: f['size']),
+    'shortest_path': (min, lambda f: len(record_path(f)))
+}
+
+
+def priority_rank(priorities: List[str]):
+    """
+    مفتاح قاعدة أولوية المسارات: رقم أول مدخل يطابق المسار (بادئة مجلد أو نمط glob)،
+    والملفات التي لا تطابق أي مدخل بعدها، ثم أقصر مسار عند التساوي
+    """
+    entries = []
+    for entry in priorities:
+        entry = os.path.normcase(entry.strip())
+        if any(c in entry for c in '*?['):
+            entries.append(re.compile(fnmatch.translate(entry)).match)
+        else:
+            prefix = entry.rstrip(os.sep) + os.sep
+            entries.append(lambda path, prefix=prefix: path.startswith(prefix))
+    
+    def rank(file_info):
+        path = os.path.normcase(record_path(file_info))
+        return next((i for i, matches in enumerate(entries) if matches(path)), len(entries)), len(path)
+    return rank
+
+
+def select_by_policy(groups: List[List[dict]], policy: str,
+                     priorities: Optional[List[str]] = None) -> List[List[dict]]:
+    """
+    تطبيق قاعدة إبقاء على كل المجموعات في تمريرة واحدة: في كل مجموعة يُبقى ملف واحد
+    حسب القاعدة وتُحدد بقية ملفاتها. يُختار المُبقى من الملفات المحلية فقط ولا تُحدد
+    السجلات غير المحلية (أجهزة وأقراص أخرى، أعضاء أرشيفات) لأنها لا تُنقل من هنا،
+    ولا يُحدد شيء في مجموعة لم يُتحقق من محتوى بعض ملفاتها.
+    يُرجع قائمة المحدد لكل مجموعة بنفس ترتيب groups (فارغة إن لم يُحدد شيء).
+    """
+    if policy == 'priority':
+        choose, key = min, priority_rank(priorities or [])
+    else:
+        choose, key = KEEP_RULES[policy]
+    selected = []
+    for group in groups:
+        local = [f for f in group if is_local_record(f)]
+        if len(local) < 2 or is_unverified_group(group):
+            selected.append([])
+            continue
+        kept = choose(local, key=key)
+        selected.append([f for f in local if f is not kept])
+    return selected
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# التقارير
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def format_size(size: int) -> str:
+    """تنسيق الحجم"""
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size < 1024:
+            return f"{size:.2f} {unit}"
+        size /= 1024
+    return f"{size:.2f} TB"
+
+
+def display_path(file_info: dict) -> str:
+    """المسار كما يُعرض للمستخدم (مع اسم الجهاز لسجلات الأجهزة الأخرى)"""
+    if is_local_record(file_info):
+        return record_path(file_info)
+    if 'archive' in file_info and file_info.get('host', LOCAL_HOST) == LOCAL_HOST:
+        return f"📦 {record_path(file_info)}"
+    if 'volume' in file_info:
+        return f"💾 {file_info['volume']}:{record_path(file_info)}"
+    return f"{file_info['host']}:{record_path(file_info)}"
+
+
+def write_txt_report(file_path: str, groups: List[List[dict]],
+                     labels: Optional[List[str]] = None, marked: Optional[set] = None):
+    """
+    كتابة تقرير المجموعات بصيغة TXT. labels حالة لكل مجموعة وmarked مفاتيح ملفات
+    تُعلَّم بـ (+) - يستخدمان في تقرير مقارنة لقطتين
+    """
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write("=" * 80 + "\n")
+        f.write("تقرير التغييرات منذ الفحص السابق\n" if labels else "تقرير الملفات المتقاربة بالحجم\n")
+        f.write(f"تاريخ التقرير: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        f.write(f"تطوير: {DEVELOPER} | {EMAIL}\n")
+        f.write("=" * 80 + "\n\n")
+        
+        for idx, group in enumerate(groups, 1):
+            f.write(f"\n{'─' * 60}\n")
+            status = f" - {labels[idx - 1]}" if labels else ""
+            f.write(f"المجموعة {idx} ({len(group)} ملفات){status}\n")
+            f.write(f"{'─' * 60}\n")
+            
+            for file_info in group:
+                flag = " (+)" if marked and record_key(file_info) in marked else ""
+                f.write(f"  • {file_info['name']}{flag}\n")
+                f.write(f"    الحجم: {format_size(file_info['size'])}\n")
+                f.write(f"    المسار: {display_path(file_info)}\n\n")
+
+
+def write_csv_report(file_path: str, groups: List[List[dict]],
+                     labels: Optional[List[str]] = None, marked: Optional[set] = None):
+    """كتابة تقرير المجموعات بصيغة CSV (مع عمودي الحالة والتغيير في تقرير المقارنة)"""
+    with open(file_path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        header = ['المجموعة', 'اسم الملف', 'الحجم (بايت)', 'الحجم', 'الامتداد', 'المسار']
+        if labels:
+            header += ['الحالة', 'متغير']
+        writer.writerow(header)
+        
+        for idx, group in enumerate(groups, 1):
+            for file_info in group:
+                row = [
+                    idx,
+                    file_info['name'],
+                    file_info['size'],
+                    format_size(file_info['size']),
+                    file_info['ext'],
+                    display_path(file_info)
+                ]
+                if labels:
+                    row += [labels[idx - 1], "+" if marked and record_key(file_info) in marked else ""]
+                writer.writerow(row)
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -108,109 +3641,670 @@ class FileSearchThread(QThread):
     """خيط منفصل للبحث عن الملفات المتقاربة"""
     progress = pyqtSignal(int, str)
     finished_search = pyqtSignal(list)
+    verified_groups = pyqtSignal(list)
+    indexed = pyqtSignal(object)
     error = pyqtSignal(str)
+    log = pyqtSignal(str, str)
     
-    def __init__(self, folder_path: str, threshold_mb: float, same_ext_only: bool):
+    def __init__(self, roots: List[str], threshold_mb: float, same_ext_only: bool,
+                 filters: Optional[ScanFilters] = None, verify_content: bool = False,
+                 shard_paths: Optional[List[str]] = None,
+                 io_concurrency: int = DEFAULT_IO_CONCURRENCY, resume: bool = False,
+                 sort_memory_mb: int = 0, tuner: Optional[ConcurrencyTuner] = None,
+                 use_catalog: bool = False, reference_paths: Optional[List[str]] = None,
+                 reference_exclude: bool = False, scan_archives: bool = False,
+                 same_type_only: bool = False, similarity: int = 0,
+                 throttle: Optional[IOThrottle] = None):
         super().__init__()
-        self.folder_path = folder_path
+        self.roots = roots
         self.threshold_mb = threshold_mb
         self.same_ext_only = same_ext_only
+        self.same_type_only = same_type_only  # تقسيم المجموعات حسب النوع المكشوف من التواقيع
+        self.similarity = similarity  # أدنى تشابه تقريبي (%) لعناقيد المحتوى، 0 = معطل
+        self.filters = filters or ScanFilters()
+        self.verify_content = verify_content
+        self.shard_paths = shard_paths
+        self.io_concurrency = io_concurrency
+        self.resume = resume
+        self.sort_memory_mb = sort_memory_mb  # 0 = الفرز في الذاكرة
+        self.use_catalog = use_catalog
+        self.reference_paths = reference_paths or []
+        self.reference_exclude = reference_exclude  # استبعاد الملفات المعروفة بدلاً من تعليمها
+        self.reference_matcher = None
+        self.scan_archives = scan_archives  # إضافة أعضاء أرشيفات zip/tar كسجلات افتراضية
+        self.archive_expander = None
+        self.catalog_groups = []  # مجموعات مع نسخ على أقراص أخرى من فهرس الأقراص
+        self.tuner = tuner
+        if tuner:
+            tuner.on_decision = lambda message: self.log.emit(message, "INFO")
+        self.throttle = throttle
+        if throttle:
+            throttle.on_notice = lambda message: self.log.emit(message, "INFO")
+        self.checkpoint = None
+        self.engine = None
         self.is_running = True
+        self._last_progress = -1
     
     def stop(self):
         self.is_running = False
     
+    def _on_scan_progress(self, fraction: float, found: int):
+        progress = min(49, int(fraction * 50))
+        if progress != self._last_progress:
+            self._last_progress = progress
+            self.progress.emit(progress, f"جاري فحص الملفات... ({found} ملف)")
+    
+    def collect_files(self, add_record):
+        """جمع السجلات وتمريرها إلى add_record: من أجزاء فحص جاهزة إن وُجدت، وإلا بفحص الجذور"""
+        if self.shard_paths:
+            self.progress.emit(0, f"جاري دمج {len(self.shard_paths)} جزء فحص...")
+            # مع حد ذاكرة الفرز تمر السجلات مباشرة إلى الفارز الذي يُسقط المكرر بنفسه
+            records = (iter_scan_shards if self.sort_memory_mb else merge_scan_shards)(self.shard_paths)
+            for record in records:
+                add_record(record)
+            return
+        
+        self.checkpoint = ScanCheckpoint(self.roots, self.filters)
+        if self.resume and self.checkpoint.exists():
+            state = self.checkpoint.load(add_record)
+            self.log.emit(f"استئناف الفحص من نقطة محفوظة ({self.checkpoint.saved_count} ملف)", "INFO")
+        else:
+            self.checkpoint.discard()
+            state = {}
+        
+        # السجلات الجديدة منذ آخر نقطة استئناف
+        pending = []
+        last_save = time.monotonic()
+        
+        def on_batch_done():
+            nonlocal last_save
+            if time.monotonic() - last_save >= CHECKPOINT_INTERVAL:
+                self.checkpoint.save(state, pending)
+                pending.clear()
+                last_save = time.monotonic()
+        
+        self.progress.emit(0, "جاري جمع معلومات الملفات...")
+        # جمع معلومات الملفات من جميع الجذور (المرشحات تُطبق داخل الماسح)
+        for file_info in scan_roots(
+            self.roots, self.filters,
+            should_continue=lambda: self.is_running,
+            on_progress=self._on_scan_progress,
+            engine=self.engine,
+            state=state,
+            on_batch_done=on_batch_done,
+            merge_links=not self.sort_memory_mb
+        ):
+            add_record(file_info)
+            pending.append(file_info)
+        
+        # حفظ نقطة عند الإيقاف (أو عند اكتمال الفحص قبل مراحل التجميع والتحقق)
+        self.checkpoint.save(state, pending)
+        if not self.is_running:
+            self.log.emit(f"تم حفظ نقطة استئناف ({self.checkpoint.saved_count} ملف)", "INFO")
+    
     def run(self):
         try:
-            self.progress.emit(0, "جاري جمع معلومات الملفات...")
-            files_info = []
-            
-            # جمع معلومات الملفات
-            items = os.listdir(self.folder_path)
-            total_items = len(items)
-            
-            for idx, item in enumerate(items):
+            tune_key = f"scan@{path_device_name(self.roots[0])}" if self.roots else ""
+            with AsyncIOEngine(self.io_concurrency, tuner=self.tuner, tune_key=tune_key,
+                               throttle=self.throttle) as self.engine:
+                self.search()
+            if self.throttle:
+                for line in self.throttle.take_report():
+                    self.log.emit(line, "INFO")
+        except Exception as e:
+            self.error.emit(str(e))
+    
+    def search(self):
+        """مراحل البحث: جمع السجلات ثم التجميع ثم التحقق من المحتوى"""
+        threshold_bytes = self.threshold_mb * 1024 * 1024
+        index = None
+        if self.sort_memory_mb:
+            # فهارس ضخمة: السجلات على القرص والفرز بتسلسلات مرتبة تُدمج أثناء التجميع
+            with ExternalSizeSorter(self.sort_memory_mb) as sorter:
+                self.collect_files(self.with_reference(self.with_archives(sorter.add)))
+                self.finish_reference()
+                self.finish_archives()
                 if not self.is_running:
                     return
-                
-                item_path = os.path.join(self.folder_path, item)
-                if os.path.isfile(item_path):
-                    try:
-                        stat = os.stat(item_path)
-                        size = stat.st_size
-                        ext = os.path.splitext(item)[1].lower()
-                        created = datetime.fromtimestamp(stat.st_ctime)
-                        modified = datetime.fromtimestamp(stat.st_mtime)
-                        
-                        files_info.append({
-                            'path': item_path,
-                            'name': item,
-                            'size': size,
-                            'ext': ext,
-                            'created': created.strftime("%Y-%m-%d %H:%M"),
-                            'modified': modified.strftime("%Y-%m-%d %H:%M")
-                        })
-                    except (OSError, PermissionError):
-                        continue
-                
-                progress = int((idx + 1) / total_items * 50)
-                self.progress.emit(progress, f"جاري فحص الملفات... ({idx + 1}/{total_items})")
-            
+                self.progress.emit(50, "جاري تحليل التقارب في الأحجام...")
+                groups = sorter.group(
+                    threshold_bytes, self.same_ext_only,
+                    should_continue=lambda: self.is_running
+                )
+                self.log.emit(
+                    f"فرز {sorter.count - sorter.merged} ملف بحد ذاكرة {self.sort_memory_mb} MB "
+                    f"({len(sorter.runs) or 1} تسلسل مرتب)", "INFO"
+                )
+        else:
+            files_info = []
+            self.collect_files(self.with_reference(self.with_archives(files_info.append)))
+            self.finish_reference()
+            self.finish_archives()
             if not self.is_running:
                 return
-            
             self.progress.emit(50, "جاري تحليل التقارب في الأحجام...")
             
-            # ترتيب حسب الحجم
-            files_info.sort(key=lambda x: x['size'])
-            
-            # إيجاد المجموعات المتقاربة
-            threshold_bytes = self.threshold_mb * 1024 * 1024
+            # إيجاد المجموعات المتقاربة (تمريرة واحدة على السجلات المرتبة)
+            groups = group_by_size(
+                files_info, threshold_bytes, self.same_ext_only,
+                should_continue=lambda: self.is_running
+            )
+            # group_by_size رتّب السجلات حسب الحجم - تُحفظ كفهرس لإعادة التجميع الفورية
+            index = SizeIndex(files_info, presorted=True)
+        
+        if not self.is_running:
+            return
+        
+        if self.same_type_only:
+            groups = self.split_by_type(groups)
+            if not self.is_running:
+                return
+        
+        if self.similarity:
+            groups = self.cluster_by_similarity(groups)
+            if not self.is_running:
+                return
+        
+        if self.verify_content:
+            groups = self.verify_groups(groups)
+            if not self.is_running:
+                return
+        
+        if self.use_catalog:
+            if index is None:
+                self.log.emit("فهرس الأقراص يحتاج فهرس الأحجام - عطّل حد ذاكرة الفرز", "WARNING")
+            elif not self.shard_paths:
+                self.catalog_groups = self.match_catalog(index.records)
+                if not self.is_running:
+                    return
+                if self.catalog_groups and self.verify_content:
+                    # المجموعات المتحقق منها عُرضت تباعاً - تُلحق بها مجموعات الأقراص الأخرى
+                    self.verified_groups.emit(self.catalog_groups)
+                groups = groups + self.catalog_groups
+        
+        if self.archive_expander is not None:
+            self.report_archive_overlaps(groups)
+        
+        if self.checkpoint:
+            self.checkpoint.discard()
+        if index is not None:
+            self.save_last_snapshot(index)
+        self.progress.emit(100, f"اكتمل البحث - {len(groups)} مجموعة")
+        self.indexed.emit(index)
+        self.finished_search.emit(groups)
+    
+    def with_reference(self, add_record):
+        """add_record كما هو، أو مسبوقاً بمطابقة الملفات المعروفة إن حُددت ملفات مرجعية"""
+        if not self.reference_paths:
+            return add_record
+        reference = ReferenceSet()
+        for path in self.reference_paths:
+            try:
+                count = reference.load(path)
+                self.log.emit(f"الملفات المعروفة: {count} مدخل من {os.path.basename(path)}", "INFO")
+            except (OSError, ValueError, csv.Error) as e:
+                self.log.emit(f"تعذر تحميل الملف المرجعي {path}: {e}", "WARNING")
+        if not reference:
+            return add_record
+        self.reference_matcher = ReferenceMatcher(
+            reference, add_record, self.reference_exclude,
+            engine=self.engine, should_continue=lambda: self.is_running
+        )
+        return self.reference_matcher
+    
+    def finish_reference(self):
+        matcher = self.reference_matcher
+        if matcher is None:
+            return
+        matcher.flush()
+        action = "استُبعد" if self.reference_exclude else "عُلّم"
+        self.log.emit(
+            f"الملفات المعروفة: {matcher.probed} مرشح بالحجم أو الاسم، حُسبت بصمة {matcher.hashed}، "
+            f"{action} {matcher.matched}", "INFO"
+        )
+    
+    def split_by_type(self, groups: List[List[dict]]) -> List[List[dict]]:
+        """
+        كشف نوع المحتوى لملفات المجموعات المرشحة فقط ثم تقسيمها حسبه. مع التحقق من
+        المحتوى تُحسب البصمة الجزئية من القراءة نفسها فلا يكلف كشف النوع قراءة إضافية.
+        """
+        self.progress.emit(60, "جاري كشف أنواع الملفات...")
+        scheduler = DiskScheduler(self.io_concurrency, tuner=self.tuner, throttle=self.throttle)
+        read = detect_types(
+            [f for group in groups for f in group], with_partial=self.verify_content,
+            should_continue=lambda: self.is_running, engine=scheduler
+        )
+        split = [g for group in groups for g in split_group_by_type(group)]
+        self.log.emit(
+            f"كشف النوع: قُرئت ترويسة {read} ملف - {len(groups)} مجموعة أصبحت {len(split)}", "INFO"
+        )
+        return split
+    
+    def cluster_by_similarity(self, groups: List[List[dict]]) -> List[List[dict]]:
+        """تقسيم كل مجموعة إلى عناقيد متشابهة المحتوى من توقيعات MinHash لملفاتها"""
+        self.progress.emit(65, "جاري حساب توقيعات التشابه...")
+        scheduler = DiskScheduler(self.io_concurrency, tuner=self.tuner, throttle=self.throttle)
+        read = sketch_files(
+            [f for group in groups for f in group],
+            should_continue=lambda: self.is_running, engine=scheduler
+        )
+        clusters = [c for group in groups for c in cluster_similar(group, self.similarity / 100)]
+        self.log.emit(
+            f"التشابه التقريبي: توقيعات {read} ملف - {len(groups)} مجموعة أصبحت "
+            f"{len(clusters)} عنقوداً بتشابه {self.similarity}% على الأقل", "INFO"
+        )
+        return clusters
+    
+    def with_archives(self, add_record):
+        """add_record كما هو، أو مع إضافة أعضاء الأرشيفات إن فُعّل البحث داخلها"""
+        if not self.scan_archives:
+            return add_record
+        self.archive_expander = ArchiveExpander(
+            self.filters, add_record, engine=self.engine, should_continue=lambda: self.is_running
+        )
+        return self.archive_expander
+    
+    def finish_archives(self):
+        expander = self.archive_expander
+        if expander is None:
+            return
+        expander.flush()
+        members = sum(expander.member_counts.values())
+        self.log.emit(
+            f"الأرشيفات: {members} عضو من {len(expander.member_counts)} أرشيف"
+            + (f" (تعذرت قراءة {expander.failed})" if expander.failed else ""), "INFO"
+        )
+    
+    def report_archive_overlaps(self, groups: List[List[dict]]):
+        """ملخص في السجل للأرشيفات التي تتكرر محتوياتها في أرشيفات أخرى"""
+        overlaps = archive_overlaps(groups, self.archive_expander.member_counts)
+        if not overlaps:
+            return
+        self.log.emit(f"📦 {len(overlaps)} زوج أرشيفات بمحتوى مشترك:", "INFO")
+        for overlap in overlaps[:ARCHIVE_REPORT_PAIRS]:
+            first, second = (os.path.basename(path) for path in overlap['archives'])
+            ratio = f" ({overlap['ratio']:.0%} من الأصغر)" if overlap['ratio'] is not None else ""
+            self.log.emit(
+                f"   {first} ↔ {second}: {overlap['shared']} عضو مشترك{ratio}، "
+                f"{format_size(overlap['bytes'])}", "INFO"
+            )
+    
+    def match_catalog(self, records: List[dict]) -> List[List[dict]]:
+        """
+        مطابقة الملفات مع فهرس الأقراص الأخرى ثم تحديث الفهرس بهذا الفحص (بعد المطابقة
+        حتى تُحفظ البصمات التي حُسبت أثناءها)
+        """
+        self.progress.emit(95, "جاري المطابقة مع فهرس الأقراص...")
+        roots = normalize_roots(self.roots)
+        catalog = ContentCatalog()
+        try:
+            volumes = {volume_of(root)[0] for root in roots}
+            groups = find_catalog_matches(
+                catalog, records, volumes, self.verify_content,
+                engine=DiskScheduler(self.io_concurrency, tuner=self.tuner, throttle=self.throttle),
+                should_continue=lambda: self.is_running
+            )
+            if not self.is_running:
+                return []
+            for root in roots:
+                catalog.update(root, [r for r in records if r.get('root') == root and 'archive' not in r])
+            matched = sorted({f['volume'] for group in groups for f in group if 'volume' in f})
+            self.log.emit(
+                f"فهرس الأقراص: {len(groups)} مجموعة لها نسخ على أقراص أخرى"
+                + (f" ({'، '.join(matched)})" if matched else "")
+                + f" - تحديث فهرس {'، '.join(sorted(volumes))}", "INFO"
+            )
+        except sqlite3.Error as e:
+            self.log.emit(f"تعذر استخدام فهرس الأقراص: {e}", "WARNING")
             groups = []
-            used_indices = set()
+        finally:
+            catalog.close()
+        return groups
+    
+    def save_last_snapshot(self, index: SizeIndex):
+        """حفظ نتائج الفحص كلقطة تُحمّل عند التشغيل التالي (بعد التحقق حتى تُحفظ البصمات)"""
+        meta = snapshot_meta(self.roots, self.filters, self.threshold_mb,
+                             self.same_ext_only, self.verify_content, self.same_type_only)
+        try:
+            write_snapshot(LAST_SNAPSHOT_FILE, index.records, meta)
+        except OSError as e:
+            self.log.emit(f"تعذر حفظ لقطة الفحص: {e}", "WARNING")
+    
+    def verify_groups(self, groups: List[List[dict]]) -> List[List[dict]]:
+        """
+        الإبقاء فقط على الملفات متطابقة المحتوى داخل كل مجموعة.
+        المجموعات تُعالج دفعات بترتيب التوفير المحتمل (الأكبر أولاً) وتُرسل نتائج كل دفعة
+        فور اكتمالها، فإن أُوقف البحث مبكراً يكون معظم الحجم القابل للاسترداد قد عولج.
+        """
+        groups = sorted(groups, key=group_savings, reverse=True)
+        total_savings = sum(group_savings(group) for group in groups) or 1
+        checked_savings = 0
+        
+        # قراءة المحتوى تُجدول حسب الجهاز وموقع البيانات على القرص داخل كل دفعة
+        scheduler = DiskScheduler(self.io_concurrency, tuner=self.tuner, throttle=self.throttle)
+        verified = []
+        idx = 0
+        while idx < len(groups) and self.is_running:
+            wave = []
+            wave_files = 0
+            while idx < len(groups) and wave_files < VERIFY_WAVE_FILES:
+                wave.append(groups[idx])
+                wave_files += len(groups[idx])
+                idx += 1
             
-            total_files = len(files_info)
+            ensure_digests(
+                [f for group in wave for f in group],
+                should_continue=lambda: self.is_running,
+                engine=scheduler
+            )
+            if not self.is_running:
+                break
             
-            for i, file1 in enumerate(files_info):
-                if not self.is_running:
-                    return
-                
-                if i in used_indices:
-                    continue
-                
-                current_group = [file1]
-                used_indices.add(i)
-                
-                for j, file2 in enumerate(files_info[i+1:], start=i+1):
-                    if j in used_indices:
+            wave_verified = []
+            for group in wave:
+                wave_verified.extend(split_group_by_content(group))
+            verified.extend(wave_verified)
+            if wave_verified:
+                self.verified_groups.emit(wave_verified)
+            
+            checked_savings += sum(group_savings(group) for group in wave)
+            self.progress.emit(
+                75 + int(checked_savings / total_savings * 25),
+                f"جاري التحقق من المحتوى... ({idx}/{len(groups)} مجموعة، "
+                f"{checked_savings * 100 // total_savings}% من التوفير المحتمل)"
+            )
+        
+        for line in scheduler.throughput_report():
+            self.log.emit(line, "INFO")
+        unverified = sum(1 for group in verified for f in group if f.get('unverified'))
+        if unverified:
+            self.log.emit(
+                f"{unverified} ملف من أجهزة أخرى بلا بصمة - عُرضت في مجموعات لم يُتحقق من محتواها",
+                "WARNING"
+            )
+        return verified
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# خيط التقدير السريع
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class QuickEstimateThread(QThread):
+    """خيط يقدّر المجموعات والتوفير المحتمل من عينة عشوائية خلال ثوانٍ"""
+    progress = pyqtSignal(int, str)
+    finished_estimate = pyqtSignal(dict)
+    error = pyqtSignal(str)
+    
+    def __init__(self, roots: List[str], threshold_mb: float, same_ext_only: bool,
+                 filters: Optional[ScanFilters] = None, throttle: Optional[IOThrottle] = None):
+        super().__init__()
+        self.roots = roots
+        self.threshold_mb = threshold_mb
+        self.same_ext_only = same_ext_only
+        self.filters = filters or ScanFilters()
+        self.throttle = throttle
+        self.is_running = True
+    
+    def stop(self):
+        self.is_running = False
+    
+    def run(self):
+        try:
+            result = quick_estimate(
+                self.roots, self.threshold_mb * 1024 * 1024, self.same_ext_only, self.filters,
+                should_continue=lambda: self.is_running,
+                on_progress=lambda fraction, walks: self.progress.emit(
+                    int(fraction * 100), f"تقدير سريع... ({walks} مسار عشوائي)"
+                ),
+                throttle=self.throttle
+            )
+            self.finished_estimate.emit(result)
+        except Exception as e:
+            self.error.emit(str(e))
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# خيط قراءة المرشحين الجدد
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class CandidateReadThread(QThread):
+    """
+    خيط يقرأ ما ينقص المرشحين الجدد (بعد المراقبة أو الإرجاع أو تغيير الإعدادات): ترويسة
+    النوع ثم توقيع التشابه لمن بقي بعد التقسيم حسب النوع، ليُعاد التجميع من فهرس الأحجام
+    دون فحص جديد ودون إيقاف الواجهة
+    """
+    finished_read = pyqtSignal()
+    error = pyqtSignal(str)
+    log = pyqtSignal(str, str)
+    
+    def __init__(self, groups: List[List[dict]], same_type: bool, similarity: bool,
+                 io_concurrency: int = DEFAULT_IO_CONCURRENCY, throttle: Optional[IOThrottle] = None):
+        super().__init__()
+        self.groups = groups
+        self.same_type = same_type
+        self.similarity = similarity
+        self.io_concurrency = io_concurrency
+        self.throttle = throttle
+        self.is_running = True
+    
+    def stop(self):
+        self.is_running = False
+    
+    def run(self):
+        try:
+            start = time.perf_counter()
+            scheduler = DiskScheduler(self.io_concurrency, throttle=self.throttle)
+            groups = self.groups
+            typed = sketched = 0
+            if self.same_type:
+                typed = detect_types(
+                    [f for group in groups for f in group],
+                    should_continue=lambda: self.is_running, engine=scheduler
+                )
+                groups = [g for group in groups for g in split_group_by_type(group)]
+            if self.similarity and self.is_running:
+                sketched = sketch_files(
+                    [f for group in groups for f in group],
+                    should_continue=lambda: self.is_running, engine=scheduler
+                )
+            if not self.is_running:
+                return
+            self.log.emit(
+                f"قراءة المرشحين الجدد: ترويسة {typed} ملف وتوقيع {sketched} ملف "
+                f"في {time.perf_counter() - start:.1f} ث", "INFO"
+            )
+            self.finished_read.emit()
+        except Exception as e:
+            self.error.emit(str(e))
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# خيط تحليل القطع
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class ChunkAnalysisThread(QThread):
+    """خيط يقطّع ملفات مجموعة (أو يقرأ قطعها من الذاكرة الدائمة) ويحسب البايتات المشتركة"""
+    finished_analysis = pyqtSignal(dict)
+    error = pyqtSignal(str)
+    log = pyqtSignal(str, str)
+    
+    def __init__(self, files: List[dict], io_concurrency: int = DEFAULT_IO_CONCURRENCY,
+                 throttle: Optional[IOThrottle] = None):
+        super().__init__()
+        self.files = files
+        self.io_concurrency = io_concurrency
+        self.throttle = throttle
+        self.is_running = True
+    
+    def stop(self):
+        self.is_running = False
+    
+    def run(self):
+        try:
+            start = time.perf_counter()
+            cache = ChunkCache()
+            try:
+                chunks, missing = {}, []
+                for file_info in self.files:
+                    path = record_path(file_info)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
                         continue
-                    
-                    size_diff = abs(file2['size'] - file1['size'])
-                    
-                    if size_diff <= threshold_bytes:
-                        if self.same_ext_only:
-                            if file1['ext'] == file2['ext']:
-                                current_group.append(file2)
-                                used_indices.add(j)
-                        else:
-                            current_group.append(file2)
-                            used_indices.add(j)
+                    cached = cache.get(path, stat)
+                    if cached is None:
+                        missing.append((file_info, path, stat))
                     else:
-                        break
+                        chunks[file_info['id']] = cached
+                cached_count = len(chunks)
                 
-                if len(current_group) > 1:
-                    groups.append(current_group)
-                
-                progress = 50 + int((i + 1) / total_files * 50)
-                self.progress.emit(progress, f"جاري تحليل المجموعات... ({len(groups)} مجموعة)")
-            
-            self.progress.emit(100, f"اكتمل البحث - {len(groups)} مجموعة")
-            self.finished_search.emit(groups)
+                with AsyncIOEngine(self.io_concurrency, throttle=self.throttle) as engine:
+                    results = engine.map(
+                        lambda item: file_chunks(item[1], lambda: self.is_running), missing,
+                        should_continue=lambda: self.is_running,
+                        bytes_of=lambda item: item[2].st_size
+                    )
+                if not self.is_running:
+                    return
+                for (file_info, path, stat), result in zip(missing, results):
+                    if isinstance(result, tuple):
+                        chunks[file_info['id']] = result
+                        cache.put(path, stat, result)
+            finally:
+                cache.close()
             
+            reports = shared_bytes_report(self.files, chunks)
+            elapsed = time.perf_counter() - start
+            self.log.emit(
+                f"تحليل القطع: {len(self.files)} ملف ({len(chunks) - cached_count} قُطّع، "
+                f"{cached_count} من الذاكرة) في {elapsed:.1f} ث", "INFO"
+            )
+            self.finished_analysis.emit(reports)
         except Exception as e:
             self.error.emit(str(e))
 
 
+# ═══════════════════════════════════════════════════════════════════════════════
+# النسخ المتحقق بين الأجهزة
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def _copy_range(src_fd: int, dst_fd: int, offset: int, count: int, methods: List[str]) -> int:
+    """
+    نسخ حتى count بايت عند الإزاحة offset بأول طريقة مدعومة في methods وإرجاع عدد
+    البايتات المنسوخة (0 عند نهاية المصدر). الطرق غير المدعومة تُحذف من القائمة.
+    """
+    while True:
+        method = methods[0]
+        try:
+            if method == 'copy_file_range':
+                return os.copy_file_range(src_fd, dst_fd, count, offset, offset)
+            if method == 'sendfile':
+                os.lseek(dst_fd, offset, os.SEEK_SET)
+                return os.sendfile(dst_fd, src_fd, offset, count)
+            os.lseek(src_fd, offset, os.SEEK_SET)
+            data = memoryview(os.read(src_fd, count))
+            os.lseek(dst_fd, offset, os.SEEK_SET)
+            written = 0
+            while written < len(data):
+                written += os.write(dst_fd, data[written:])
+            return written
+        except OSError as e:
+            if method == 'read' or e.errno not in COPY_FALLBACK_ERRORS:
+                raise
+            methods.pop(0)
+
+
+def copy_verified(source: str, dest: str, expected: Optional[str] = None) -> str:
+    """
+    نسخ ملف إلى جهاز آخر داخل النواة (copy_file_range ثم sendfile) مع مقارنة أثناء النسخ:
+    كل جزء يُقرأ بعد نسخه مباشرة من المصدر والوجهة عبر mmap، وتُقارن بصمتا الملفين في
+    النهاية. القراءة من ذاكرة النواة المؤقتة لا من القرص: المقارنة تكشف أخطاء النسخ وتغيّر
+    المصدر، لا أخطاء الكتابة على وسيط التخزين نفسه (الثبات يضمنه fsync لاحقاً).
+    expected: بصمة الفحص (كما في file_digest) للتأكد من أن المصدر لم يتغير منذ الفحص.
+    عند أي خطأ أو اختلاف تُحذف الوجهة ويبقى المصدر. لا يستدعي fsync (انظر sync_directory).
+    يُرجع بصمة المحتوى.
+    """
+    src_digest = hashlib.blake2b(digest_size=16)
+    dst_digest = hashlib.blake2b(digest_size=16)
+    methods = list(COPY_METHODS)
+    # 'x' يضمن ألا يُكتب فوق ملف موجود - وبالتالي أن الحذف عند الفشل يطال نسختنا فقط
+    with open(source, 'rb') as src, open(dest, 'xb+') as dst:
+        try:
+            size = os.fstat(src.fileno()).st_size
+            offset = 0
+            while offset < size:
+                count = min(COPY_CHUNK_SIZE, size - offset)
+                done = 0
+                while done < count:
+                    copied = _copy_range(src.fileno(), dst.fileno(), offset + done, count - done, methods)
+                    if not copied:
+                        raise OSError(errno.EIO, "المصدر أقصر من حجمه - تغيّر أثناء النقل", source)
+                    charge_io(copied)
+                    done += copied
+                with mmap.mmap(src.fileno(), count, offset=offset, access=mmap.ACCESS_READ) as data:
+                    src_digest.update(data)
+                with mmap.mmap(dst.fileno(), count, offset=offset, access=mmap.ACCESS_READ) as data:
+                    dst_digest.update(data)
+                offset += count
+            
+            digest = src_digest.hexdigest()
+            if dst_digest.hexdigest() != digest:
+                raise OSError(errno.EIO, "النسخة لا تطابق الأصل", dest)
+            if expected and expected != digest:
+                raise OSError(errno.EIO, "تغيّر محتوى الملف منذ الفحص", source)
+        except BaseException:
+            dst.close()
+            os.unlink(dest)
+            raise
+    shutil.copystat(source, dest)
+    return digest
+
+
+def make_dirs(path: str) -> List[str]:
+    """
+    مثل os.makedirs(path, exist_ok=True) لكن يُرجع المجلدات التي أنشأها فعلاً (من الأعلى)،
+    لأن مدخل كل مجلد جديد في أبيه يحتاج fsync للأب قبل اعتبار ما بداخله ثابتاً
+    """
+    missing = []
+    while not os.path.isdir(path):
+        missing.append(path)
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    created = []
+    for directory in reversed(missing):
+        try:
+            os.mkdir(directory)
+        except FileExistsError:
+            # أنشأه خيط آخر في نفس اللحظة - وهو من يسجله
+            continue
+        created.append(directory)
+    return created
+
+
+def sync_directory(batch: Tuple[str, List[str]]):
+    """
+    تثبيت الملفات المنسوخة إلى مجلد واحد دفعة واحدة: fsync لكل ملف ثم للمجلد نفسه
+    مرة واحدة لتثبيت مدخلات أسمائها. batch = (المجلد، مسارات الملفات فيه).
+    """
+    directory, paths = batch
+    # على ويندوز يتطلب fsync صلاحية الكتابة، ولا تُفتح المجلدات
+    flags = os.O_RDWR | getattr(os, 'O_BINARY', 0) if sys.platform == "win32" else os.O_RDONLY
+    for path in paths:
+        fd = os.open(path, flags)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    if sys.platform != "win32":
+        fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # خيط النقل
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -220,21 +4314,162 @@ class FileMoveThread(QThread):
     progress = pyqtSignal(int, str)
     finished_move = pyqtSignal(dict)
     error = pyqtSignal(str)
+    log = pyqtSignal(str, str)
     
-    def __init__(self, selected_files: List[Dict], base_folder: str, operation_id: str):
+    def __init__(self, selected_files: List[Dict], base_folder: str, operation_id: str,
+                 io_concurrency: int = DEFAULT_IO_CONCURRENCY,
+                 tuner: Optional[ConcurrencyTuner] = None,
+                 throttle: Optional[IOThrottle] = None):
         super().__init__()
         self.selected_files = selected_files
         self.base_folder = base_folder
         self.operation_id = operation_id
+        self.io_concurrency = io_concurrency
+        self.tuner = tuner
+        if tuner:
+            tuner.on_decision = lambda message: self.log.emit(message, "INFO")
+        self.throttle = throttle
+        if throttle:
+            throttle.on_notice = lambda message: self.log.emit(message, "INFO")
         self.is_running = True
     
     def stop(self):
         self.is_running = False
     
+    def output_folder_for(self, file_info: dict) -> str:
+        """مجلد العزل داخل الجذر الذي جاء منه الملف"""
+        return os.path.join(file_info.get('root') or self.base_folder, OUTPUT_FOLDER_NAME)
+    
+    def plan_moves(self, error_files: List[str]) -> List[dict]:
+        """
+        تحديد وجهة كل ملف مسبقاً. أسماء كل مجلد وجهة تُقرأ مرة واحدة وتُحجز الأسماء
+        في الذاكرة، فتصبح عمليات النقل نفسها مستقلة ويمكن تنفيذها بالتوازي.
+        """
+        plans = []
+        taken_names = {}
+        for group_idx, group_files in enumerate(self.selected_files, 1):
+            for file_info in group_files:
+                if not is_local_record(file_info):
+                    # سجل من جزء فحص لجهاز آخر أو عضو في أرشيف - لا يُنقل من هنا
+                    if 'volume' in file_info:
+                        location = f"على القرص {file_info['volume']}"
+                    elif 'archive' in file_info:
+                        location = f"داخل الأرشيف {os.path.basename(file_info['archive'])}"
+                    else:
+                        location = f"على الجهاز {file_info['host']}"
+                    error_files.append(f"{file_info['name']} ({location})")
+                    continue
+                
+                output_folder = self.output_folder_for(file_info)
+                group_folder = os.path.join(output_folder, f"folder_{group_idx}")
+                if group_folder not in taken_names:
+                    try:
+                        taken_names[group_folder] = set(os.listdir(group_folder))
+                    except OSError:
+                        taken_names[group_folder] = set()
+                taken = taken_names[group_folder]
+                
+                # التعامل مع الأسماء المكررة
+                filename = os.path.basename(record_path(file_info))
+                counter = 1
+                base_name, ext = os.path.splitext(filename)
+                while filename in taken:
+                    filename = f"{base_name}_{counter}{ext}"
+                    counter += 1
+                taken.add(filename)
+                
+                plans.append({
+                    'info': file_info,
+                    'group': group_idx,
+                    'output_folder': output_folder,
+                    'dest': os.path.join(group_folder, filename)
+                })
+        return plans
+    
+    @staticmethod
+    def move_one(plan: dict) -> int:
+        """
+        نقل ملف واحد وإرجاع حجمه. بين جهازين يُنسخ الملف ويُقارن بأصله فقط، ويبقى المصدر
+        حتى تُثبت الوجهة على القرص (plan['copied'] - انظر commit_copies)
+        """
+        filepath = record_path(plan['info'])
+        if not os.path.isfile(filepath):
+            raise FileNotFoundError(filepath)
+        plan['created_dirs'] = make_dirs(os.path.dirname(plan['dest']))
+        file_size = os.path.getsize(filepath)
+        try:
+            os.rename(filepath, plan['dest'])
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            copy_verified(filepath, plan['dest'], plan['info'].get('hash'))
+            plan['copied'] = True
+        return file_size
+    
+    def commit_copies(self, engine: AsyncIOEngine, plans: List[dict], results: list):
+        """
+        إكمال النقل بين الأجهزة: fsync على دفعات لكل مجلد وجهة، ثم لآباء المجلدات التي
+        أُنشئت أثناء النقل (حتى لا تضيع مدخلاتها بعد انقطاع)، ثم حذف المصادر.
+        ملفات المجلد الذي فشل تثبيته تُحذف نسختها ويبقى مصدرها، وتُسجل نتيجتها كخطأ.
+        """
+        copied = [idx for idx, (plan, result) in enumerate(zip(plans, results))
+                  if plan.get('copied') and not isinstance(result, Exception)]
+        if not copied:
+            return
+        self.progress.emit(100, f"جاري تثبيت {len(copied)} نسخة على القرص...")
+        
+        batches = {}
+        for idx in copied:
+            batches.setdefault(os.path.dirname(plans[idx]['dest']), []).append(idx)
+        directories = list(batches)
+        synced = engine.map(
+            sync_directory,
+            [(directory, [plans[idx]['dest'] for idx in batches[directory]]) for directory in directories]
+        )
+        for directory, error in zip(directories, synced):
+            if isinstance(error, Exception):
+                for idx in batches[directory]:
+                    results[idx] = error
+        
+        # المجلد الجديد يُثبت مدخله بـ fsync لأبيه، حتى أول مجلد كان موجوداً قبل النقل
+        parents = sorted({os.path.dirname(directory) for plan in plans
+                          for directory in plan.get('created_dirs', ())})
+        synced = engine.map(sync_directory, [(parent, []) for parent in parents])
+        for parent, error in zip(parents, synced):
+            if isinstance(error, Exception):
+                prefix = parent.rstrip(os.sep) + os.sep
+                for idx in copied:
+                    if plans[idx]['dest'].startswith(prefix) and not isinstance(results[idx], Exception):
+                        results[idx] = error
+        durable = [idx for idx in copied if not isinstance(results[idx], Exception)]
+        
+        removed = engine.map(lambda idx: os.unlink(record_path(plans[idx]['info'])), durable)
+        for idx, error in zip(durable, removed):
+            if isinstance(error, Exception):
+                results[idx] = error
+            else:
+                # حُذف المصدر: النسخة أصبحت الملف الوحيد ولا يجوز حذفها بعد الآن
+                del plans[idx]['copied']
+        
+        # النسخ التي لم يكتمل نقلها تُحذف فيبقى الملف في مكانه الأصلي وحده
+        failed = [idx for idx in copied if isinstance(results[idx], Exception)]
+        for idx in failed:
+            try:
+                os.unlink(plans[idx]['dest'])
+            except OSError:
+                pass
+            del plans[idx]['copied']
+        committed = len(copied) - len(failed)
+        if committed:
+            self.log.emit(
+                f"🛡️ نقل متحقق بين الأجهزة: {committed} ملف، "
+                f"{format_size(sum(plans[idx]['info']['size'] for idx in copied if idx not in failed))}",
+                "INFO"
+            )
+    
     def run(self):
         try:
-            output_folder = os.path.join(self.base_folder, "duplicates_sorted")
-            os.makedirs(output_folder, exist_ok=True)
+            output_folders = []
             
             operations = []
             moved_count = 0
@@ -242,61 +4477,77 @@ class FileMoveThread(QThread):
             total_size = 0
             
             total_files = sum(len(group) for group in self.selected_files)
-            current_file = 0
+            plans = self.plan_moves(error_files)
+            done = [len(error_files)]
             
-            for group_idx, group_files in enumerate(self.selected_files, 1):
-                if not self.is_running:
-                    return
-                
-                group_folder = os.path.join(output_folder, f"folder_{group_idx}")
-                os.makedirs(group_folder, exist_ok=True)
+            def on_moved(_idx, _result):
+                done[0] += 1
+                progress = int(done[0] / total_files * 100)
+                self.progress.emit(progress, f"جاري النقل... ({done[0]}/{total_files})")
+            
+            tune_key = f"move@{path_device_name(self.base_folder)}"
+            with AsyncIOEngine(self.io_concurrency, tuner=self.tuner, tune_key=tune_key,
+                               throttle=self.throttle) as engine:
+                # النقل داخل الجهاز إعادة تسمية لا تنقل بايتات - تُحسب عملية فقط
+                results = engine.map(
+                    self.move_one, plans, lambda: self.is_running, on_moved,
+                    bytes_of=lambda plan: plan['info']['size'],
+                    cost_of=lambda plan: plan['info']['size']
+                        if crosses_device(record_path(plan['info']), plan['dest']) else 0
+                )
+                # مرحلة التثبيت لا تُقاطع: بعد أن تبدأ بحذف المصادر يجب أن تكتمل ويُسجل ما نُقل
+                committing = self.is_running
+                if committing:
+                    self.commit_copies(engine, plans, results)
+            if self.throttle:
+                for line in self.throttle.take_report():
+                    self.log.emit(line, "INFO")
+            
+            if not committing:
+                # النسخ بين الأجهزة التي لم تُثبت بعد تُحذف - ما دام مصدرها باقياً
+                for plan in plans:
+                    if plan.get('copied') and os.path.isfile(record_path(plan['info'])):
+                        try:
+                            os.unlink(plan['dest'])
+                        except OSError:
+                            pass
+                return
+            
+            for plan, result in zip(plans, results):
+                file_info = plan['info']
+                if isinstance(result, FileNotFoundError):
+                    error_files.append(file_info['name'])
+                    continue
+                if isinstance(result, Exception):
+                    error_files.append(f"{file_info['name']} ({str(result)})")
+                    continue
                 
-                for file_info in group_files:
-                    if not self.is_running:
-                        return
-                    
-                    current_file += 1
-                    filepath = file_info['path']
-                    
-                    try:
-                        if os.path.exists(filepath) and os.path.isfile(filepath):
-                            filename = os.path.basename(filepath)
-                            dest_path = os.path.join(group_folder, filename)
-                            
-                            # التعامل مع الأسماء المكررة
-                            counter = 1
-                            base_name, ext = os.path.splitext(filename)
-                            while os.path.exists(dest_path):
-                                filename = f"{base_name}_{counter}{ext}"
-                                dest_path = os.path.join(group_folder, filename)
-                                counter += 1
-                            
-                            file_size = os.path.getsize(filepath)
-                            shutil.move(filepath, dest_path)
-                            
-                            operations.append({
-                                'source': filepath,
-                                'dest': dest_path,
-                                'name': file_info['name'],
-                                'size': file_size,
-                                'group': group_idx
-                            })
-                            
-                            moved_count += 1
-                            total_size += file_size
-                        else:
-                            error_files.append(file_info['name'])
-                    except Exception as e:
-                        error_files.append(f"{file_info['name']} ({str(e)})")
-                    
-                    progress = int(current_file / total_files * 100)
-                    self.progress.emit(progress, f"جاري النقل... ({current_file}/{total_files})")
+                if plan['output_folder'] not in output_folders:
+                    output_folders.append(plan['output_folder'])
+                operations.append({
+                    'source': record_path(file_info),
+                    'dest': plan['dest'],
+                    'name': file_info['name'],
+                    'size': result,
+                    'group': plan['group'],
+                    'root': file_info.get('root') or self.base_folder
+                })
+                moved_count += 1
+                total_size += result
+            
+            source_folders = []
+            for op in operations:
+                if op['root'] not in source_folders:
+                    source_folders.append(op['root'])
             
             result = {
                 'operation_id': self.operation_id,
                 'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                'source_folder': self.base_folder,
-                'dest_folder': output_folder,
+                'source_folder': source_folders[0] if source_folders else self.base_folder,
+                'dest_folder': output_folders[0] if output_folders else
+                    os.path.join(self.base_folder, OUTPUT_FOLDER_NAME),
+                'source_folders': source_folders,
+                'dest_folders': output_folders,
                 'operations': operations,
                 'moved_count': moved_count,
                 'error_files': error_files,
@@ -318,74 +4569,223 @@ class FileRestoreThread(QThread):
     progress = pyqtSignal(int, str)
     finished_restore = pyqtSignal(dict)
     error = pyqtSignal(str)
+    log = pyqtSignal(str, str)
     
-    def __init__(self, batch: dict):
+    def __init__(self, batch: dict, io_concurrency: int = DEFAULT_IO_CONCURRENCY,
+                 tuner: Optional[ConcurrencyTuner] = None,
+                 throttle: Optional[IOThrottle] = None):
         super().__init__()
         self.batch = batch
+        self.io_concurrency = io_concurrency
+        self.tuner = tuner
+        if tuner:
+            tuner.on_decision = lambda message: self.log.emit(message, "INFO")
+        self.throttle = throttle
+        if throttle:
+            throttle.on_notice = lambda message: self.log.emit(message, "INFO")
         self.is_running = True
     
     def stop(self):
         self.is_running = False
     
+    @staticmethod
+    def restore_one(op: dict) -> str:
+        """إرجاع ملف واحد إلى موقعه الأصلي وإرجاع المسار النهائي"""
+        if not os.path.exists(op['dest']):
+            raise FileNotFoundError(op['dest'])
+        
+        # التأكد من وجود المجلد المصدر
+        source_dir = os.path.dirname(op['source'])
+        os.makedirs(source_dir, exist_ok=True)
+        
+        # التعامل مع الملفات الموجودة
+        dest_path = op['source']
+        if os.path.exists(dest_path):
+            base, ext = os.path.splitext(dest_path)
+            counter = 1
+            while os.path.exists(dest_path):
+                dest_path = f"{base}_restored_{counter}{ext}"
+                counter += 1
+        
+        shutil.move(op['dest'], dest_path)
+        return dest_path
+    
     def run(self):
         try:
             operations = self.batch['operations']
             total = len(operations)
             restored_count = 0
             error_files = []
+            done = [0]
             
-            for idx, op in enumerate(operations):
-                if not self.is_running:
-                    return
-                
-                try:
-                    if os.path.exists(op['dest']):
-                        # التأكد من وجود المجلد المصدر
-                        source_dir = os.path.dirname(op['source'])
-                        os.makedirs(source_dir, exist_ok=True)
-                        
-                        # التعامل مع الملفات الموجودة
-                        dest_path = op['source']
-                        if os.path.exists(dest_path):
-                            base, ext = os.path.splitext(dest_path)
-                            counter = 1
-                            while os.path.exists(dest_path):
-                                dest_path = f"{base}_restored_{counter}{ext}"
-                                counter += 1
-                        
-                        shutil.move(op['dest'], dest_path)
-                        restored_count += 1
-                    else:
-                        error_files.append(op['name'])
-                except Exception as e:
-                    error_files.append(f"{op['name']} ({str(e)})")
-                
-                progress = int((idx + 1) / total * 100)
-                self.progress.emit(progress, f"جاري الإرجاع... ({idx + 1}/{total})")
+            def on_restored(_idx, _result):
+                done[0] += 1
+                progress = int(done[0] / total * 100)
+                self.progress.emit(progress, f"جاري الإرجاع... ({done[0]}/{total})")
             
-            # حذف المجلدات الفارغة
-            try:
-                dest_folder = self.batch['dest_folder']
-                if os.path.exists(dest_folder):
-                    for item in os.listdir(dest_folder):
-                        item_path = os.path.join(dest_folder, item)
-                        if os.path.isdir(item_path) and not os.listdir(item_path):
-                            os.rmdir(item_path)
-                    if not os.listdir(dest_folder):
-                        os.rmdir(dest_folder)
-            except:
-                pass
+            tune_key = f"move@{path_device_name(self.batch['source_folder'])}"
+            with AsyncIOEngine(self.io_concurrency, tuner=self.tuner, tune_key=tune_key,
+                               throttle=self.throttle) as engine:
+                results = engine.map(
+                    self.restore_one, operations, lambda: self.is_running, on_restored,
+                    bytes_of=lambda op: op['size'],
+                    cost_of=lambda op: op['size'] if crosses_device(op['dest'], op['source']) else 0
+                )
+            if self.throttle:
+                for line in self.throttle.take_report():
+                    self.log.emit(line, "INFO")
+            
+            if not self.is_running:
+                return
+            
+            restored_records = []
+            for op, result in zip(operations, results):
+                if isinstance(result, FileNotFoundError):
+                    error_files.append(op['name'])
+                elif isinstance(result, Exception):
+                    error_files.append(f"{op['name']} ({str(result)})")
+                else:
+                    restored_count += 1
+                    try:
+                        restored_records.append(make_file_record(
+                            result, os.path.basename(result), os.stat(result), op.get('root', "")
+                        ))
+                    except OSError:
+                        pass
+            
+            # حذف المجلدات الفارغة (في كل جذر شارك في العملية)
+            for dest_folder in self.batch.get('dest_folders') or [self.batch['dest_folder']]:
+                try:
+                    if os.path.exists(dest_folder):
+                        for item in os.listdir(dest_folder):
+                            item_path = os.path.join(dest_folder, item)
+                            if os.path.isdir(item_path) and not os.listdir(item_path):
+                                os.rmdir(item_path)
+                        if not os.listdir(dest_folder):
+                            os.rmdir(dest_folder)
+                except:
+                    pass
             
             result = {
                 'restored_count': restored_count,
+                'restored_records': restored_records,
                 'error_files': error_files,
                 'operation_id': self.batch['operation_id']
             }
             
-            self.finished_restore.emit(result)
+            self.finished_restore.emit(result)
+            
+        except Exception as e:
+            self.error.emit(str(e))
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# خيط المراقبة
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class FileWatchThread(QThread):
+    """
+    خيط يراقب الجذور ويرسل التغييرات دفعات بعد هدوء الأحداث:
+    {'records': سجلات الملفات الجديدة/المعدلة، 'removed': مسارات محذوفة،
+     'removed_dirs': مجلدات محذوفة، 'overflow': فُقدت أحداث ويلزم بحث جديد}
+    """
+    changes = pyqtSignal(dict)
+    log = pyqtSignal(str, str)
+    
+    def __init__(self, roots: List[str], filters: ScanFilters):
+        super().__init__()
+        self.roots = normalize_roots(roots)
+        self.filters = filters
+        self.is_running = True
+    
+    def stop(self):
+        self.is_running = False
+    
+    def record_for(self, path: str, root: str, seen_inodes: dict) -> Optional[dict]:
+        """
+        سجل ملف بعد تغيّره كما يبنيه الماسح، أو None إن لم يعد موجوداً أو رفضته المرشحات
+        أو كان رابطاً صلباً لملف آخر في نفس الدفعة
+        """
+        name = os.path.basename(path)
+        if not self.filters.accepts_name(name):
+            return None
+        try:
+            stat = os.stat(path, follow_symlinks=False)
+        except OSError:
+            return None
+        return admit_file(path, name, stat, root, self.filters, seen_inodes)
+    
+    def run(self):
+        try:
+            watcher = InotifyWatcher(self.filters)
+        except OSError as e:
+            self.log.emit(f"تعذر تشغيل المراقبة: {e}", "ERROR")
+            return
+        
+        try:
+            for root in self.roots:
+                watcher.add_tree(root, 0, root)
+            self.log.emit(f"مراقبة {len(watcher.watches)} مجلد", "INFO")
+            if watcher.failed:
+                self.log.emit(
+                    f"تعذرت مراقبة {watcher.failed} مجلد (راجع fs.inotify.max_user_watches)", "WARNING"
+                )
+            
+            changed = {}   # المسار -> الجذر
+            removed = set()
+            removed_dirs = set()
+            overflow = False
+            first_event = last_event = None
             
-        except Exception as e:
-            self.error.emit(str(e))
+            while self.is_running:
+                for mask, path, depth, root in watcher.read_events(0.2):
+                    now = time.monotonic()
+                    first_event = first_event or now
+                    last_event = now
+                    if not path:
+                        overflow = True
+                    elif mask & IN_ISDIR:
+                        if mask & (IN_DELETE | IN_MOVED_FROM):
+                            watcher.remove_tree(path)
+                            removed_dirs.add(path)
+                        elif mask & (IN_CREATE | IN_MOVED_TO):
+                            if self.filters.accepts_dir(os.path.basename(path), depth + 1):
+                                removed_dirs.discard(path)
+                                for file_path in watcher.add_tree(path, depth + 1, root):
+                                    changed[file_path] = root
+                                    removed.discard(file_path)
+                    elif mask & (IN_DELETE | IN_MOVED_FROM):
+                        changed.pop(path, None)
+                        removed.add(path)
+                    elif mask & (IN_CREATE | IN_CLOSE_WRITE | IN_MOVED_TO):
+                        changed[path] = root
+                        removed.discard(path)
+                
+                if first_event is None:
+                    continue
+                now = time.monotonic()
+                if now - last_event < WATCH_DEBOUNCE and now - first_event < WATCH_MAX_DELAY:
+                    continue
+                
+                records = []
+                seen_inodes = {}
+                for path, root in changed.items():
+                    record = self.record_for(path, root, seen_inodes)
+                    if record is not None:
+                        records.append(record)
+                    elif not any(path in r.get('links', ()) for r in seen_inodes.values()):
+                        removed.add(path)
+                self.changes.emit({
+                    'records': records,
+                    'removed': sorted(removed),
+                    'removed_dirs': sorted(removed_dirs),
+                    'overflow': overflow
+                })
+                changed, removed, removed_dirs = {}, set(), set()
+                overflow = False
+                first_event = last_event = None
+        finally:
+            watcher.close()
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -483,8 +4883,8 @@ class HistoryDialog(QDialog):
             batch = items[0].data(Qt.UserRole)
             
             details = f"""📅 التاريخ: {batch['timestamp']}
-📁 المجلد المصدر: {batch['source_folder']}
-📂 مجلد الوجهة: {batch['dest_folder']}
+📁 المجلد المصدر: {' ; '.join(batch.get('source_folders') or [batch['source_folder']])}
+📂 مجلد الوجهة: {' ; '.join(batch.get('dest_folders') or [batch['dest_folder']])}
 📊 عدد الملفات: {batch['total_files']}
 💾 الحجم الكلي: {self.format_size(batch['total_size'])}
 🔑 معرف العملية: {batch['operation_id']}
@@ -522,11 +4922,25 @@ class FileSizeDuplicateFinder(QMainWindow):
         # المتغيرات
         self.similar_groups = []
         self.file_paths = {}
+        self.result_totals = [0, 0, 0]
+        self.search_roots = []
+        self.size_index = None  # فهرس أحجام آخر فحص لإعادة التجميع دون فحص
+        self.index_scope = None  # (الجذور، المرشحات) التي بُني منها الفهرس
+        self.snapshot_dirty = False  # تغيّر الفهرس بعد آخر لقطة محفوظة
+        self.catalog_groups = []  # مجموعات مع أقراص أخرى - تُلحق عند إعادة التجميع
         self.search_thread = None
+        self.estimate_thread = None
+        self.chunk_thread = None
+        self.read_thread = None
+        self.chunk_reports = {}  # رقم الملف -> أسطر تقرير البايتات المشتركة
+        self.chunk_pending = set()  # أرقام الملفات قيد التحليل
         self.move_thread = None
         self.restore_thread = None
+        self.watch_thread = None
         self.history = []
         self.settings = QSettings("FileSizeDuplicateFinder", "Settings")
+        # حدود المعدل مشتركة بين كل العمليات وتتغير من الواجهة أثناء التشغيل
+        self.io_throttle = IOThrottle()
         
         # تحميل السجل
         self.load_history()
@@ -536,6 +4950,10 @@ class FileSizeDuplicateFinder(QMainWindow):
         
         # تحميل الإعدادات
         self.load_settings()
+        
+        # عرض نتائج آخر فحص دون إعادته
+        if os.path.exists(LAST_SNAPSHOT_FILE):
+            self.load_snapshot(LAST_SNAPSHOT_FILE)
     
     def init_ui(self):
         """تهيئة واجهة المستخدم"""
@@ -738,9 +5156,13 @@ class FileSizeDuplicateFinder(QMainWindow):
         self.folder_input.setReadOnly(True)
         browse_btn = QPushButton("استعراض 📂")
         browse_btn.clicked.connect(self.browse_folder)
+        add_root_btn = QPushButton("➕ إضافة مجلد")
+        add_root_btn.setToolTip("إضافة مجلد آخر (أو نقطة تركيب أخرى) للبحث فيها معاً")
+        add_root_btn.clicked.connect(self.add_root_folder)
         folder_layout.addWidget(folder_label)
         folder_layout.addWidget(self.folder_input, 1)
         folder_layout.addWidget(browse_btn)
+        folder_layout.addWidget(add_root_btn)
         settings_layout.addLayout(folder_layout)
         
         # صف الإعدادات
@@ -754,15 +5176,208 @@ class FileSizeDuplicateFinder(QMainWindow):
         options_layout.addWidget(threshold_label)
         options_layout.addWidget(self.threshold_spin)
         
+        # إعادة التجميع من فهرس الأحجام بعد توقف المستخدم عن التعديل
+        self.regroup_timer = QTimer(self)
+        self.regroup_timer.setSingleShot(True)
+        self.regroup_timer.setInterval(150)
+        self.regroup_timer.timeout.connect(self.regroup_results)
+        self.threshold_spin.valueChanged.connect(self.regroup_timer.start)
+        
         options_layout.addSpacing(30)
         
         self.same_ext_check = QCheckBox("🏷️ نفس الامتداد فقط")
         self.same_ext_check.setToolTip("البحث فقط في الملفات التي لها نفس الامتداد")
+        self.same_ext_check.toggled.connect(self.regroup_timer.start)
         options_layout.addWidget(self.same_ext_check)
         
+        self.same_type_check = QCheckBox("🧬 نفس النوع الفعلي")
+        self.same_type_check.setToolTip(
+            "تقسيم المجموعات حسب نوع المحتوى المكشوف من أول بايتات الملف (لا من الامتداد)،\n"
+            "فتُكشف الملفات المعاد تسميتها. الترويسة تُقرأ مرة للمرشحين فقط وتغذي التحقق أيضاً"
+        )
+        self.same_type_check.toggled.connect(self.regroup_timer.start)
+        options_layout.addWidget(self.same_type_check)
+        
+        self.similarity_check = QCheckBox("🧩 تشابه تقريبي")
+        self.similarity_check.setToolTip(
+            "تقسيم كل مجموعة إلى عناقيد ملفات متشابهة المحتوى (نسخ معدّلة، سجلات أُضيف إليها)\n"
+            "بتوقيعات MinHash من عينات المحتوى وفهرسة LSH، مع نسبة تشابه مقدّرة لكل عنقود"
+        )
+        self.similarity_check.toggled.connect(self.regroup_timer.start)
+        self.similarity_spin = QSpinBox()
+        self.similarity_spin.setRange(10, 100)
+        self.similarity_spin.setSuffix(" %")
+        self.similarity_spin.setValue(DEFAULT_SIMILARITY)
+        self.similarity_spin.setToolTip("أدنى تشابه مقدّر لضم ملفين في عنقود واحد")
+        self.similarity_spin.valueChanged.connect(self.regroup_timer.start)
+        options_layout.addWidget(self.similarity_check)
+        options_layout.addWidget(self.similarity_spin)
+        
+        self.verify_check = QCheckBox("🔐 التحقق من تطابق المحتوى")
+        self.verify_check.setToolTip("الإبقاء فقط على الملفات متطابقة المحتوى داخل كل مجموعة")
+        options_layout.addWidget(self.verify_check)
+        
+        self.watch_check = QCheckBox("👁️ مراقبة المجلدات")
+        if INOTIFY_AVAILABLE:
+            self.watch_check.setToolTip(
+                "تحديث المجموعات تلقائياً عند إضافة ملفات أو حذفها أو تعديلها بعد انتهاء البحث"
+            )
+        else:
+            self.watch_check.setEnabled(False)
+            self.watch_check.setToolTip("المراقبة متاحة على لينكس فقط (inotify)")
+        self.watch_check.toggled.connect(self.toggle_watch)
+        options_layout.addWidget(self.watch_check)
+        
+        self.catalog_check = QCheckBox("📚 فهرس الأقراص")
+        self.catalog_check.setToolTip(
+            "حفظ محتوى كل قرص مفحوص في فهرس دائم، وإظهار الملفات التي لها نسخ على أقراص\n"
+            "أخرى (ولو غير متصلة) كمجموعات إضافية. مع التحقق من المحتوى تُطابق البصمات المحفوظة"
+        )
+        options_layout.addWidget(self.catalog_check)
+        
+        self.archives_check = QCheckBox("📦 داخل الأرشيفات")
+        self.archives_check.setToolTip(
+            "إضافة الملفات داخل أرشيفات zip وtar إلى التجميع دون استخراجها، وإظهار الأرشيفات\n"
+            "التي تتكرر محتوياتها. أعضاء الأرشيفات تظهر في النتائج لكنها لا تُنقل"
+        )
+        options_layout.addWidget(self.archives_check)
+        
+        options_layout.addSpacing(30)
+        
+        concurrency_label = QLabel("⚡ العمليات المتزامنة:")
+        self.io_concurrency_spin = QSpinBox()
+        self.io_concurrency_spin.setRange(1, 256)
+        self.io_concurrency_spin.setValue(DEFAULT_IO_CONCURRENCY)
+        self.io_concurrency_spin.setToolTip(
+            "عدد عمليات القراءة/النقل المتزامنة - قيم أعلى تفيد مع أقراص الشبكة (NFS/SMB)"
+        )
+        options_layout.addWidget(concurrency_label)
+        options_layout.addWidget(self.io_concurrency_spin)
+        
+        self.auto_tune_check = QCheckBox("🎚️ ضبط تلقائي")
+        self.auto_tune_check.setToolTip(
+            "تعديل عدد العمليات المتزامنة أثناء التشغيل حسب الإنتاجية المقاسة لكل مرحلة وجهاز،\n"
+            "وتذكّر القيم المختارة لكل مجلد"
+        )
+        options_layout.addWidget(self.auto_tune_check)
+        
+        sort_memory_label = QLabel("🧮 ذاكرة الفرز:")
+        self.sort_memory_spin = QSpinBox()
+        self.sort_memory_spin.setRange(0, 65536)
+        self.sort_memory_spin.setSingleStep(64)
+        self.sort_memory_spin.setSuffix(" MB")
+        self.sort_memory_spin.setSpecialValueText("بلا حد")
+        self.sort_memory_spin.setToolTip(
+            "حد الذاكرة لفرز السجلات - عند تحديده تُحفظ السجلات على القرص وتُفرز على دفعات\n"
+            "(مناسب للأرشيفات الضخمة بملايين الملفات)"
+        )
+        options_layout.addWidget(sort_memory_label)
+        options_layout.addWidget(self.sort_memory_spin)
+        
         options_layout.addStretch()
         settings_layout.addLayout(options_layout)
         
+        # صف حدود المعدل - تُطبق فوراً على العمليات الجارية
+        throttle_layout = QHBoxLayout()
+        self.limit_bytes_spin = QDoubleSpinBox()
+        self.limit_bytes_spin.setRange(0, 100000)
+        self.limit_bytes_spin.setDecimals(1)
+        self.limit_bytes_spin.setSuffix(" MB/ث")
+        self.limit_bytes_spin.setSpecialValueText("بلا حد")
+        self.limit_bytes_spin.setToolTip(
+            "أقصى بايتات تُقرأ أو تُنسخ في الثانية لكل العمليات معاً (التجزئة، النقل بين الأقراص، الإرجاع)"
+        )
+        self.limit_ops_spin = QSpinBox()
+        self.limit_ops_spin.setRange(0, 100000)
+        self.limit_ops_spin.setSuffix(" عملية/ث")
+        self.limit_ops_spin.setSpecialValueText("بلا حد")
+        self.limit_ops_spin.setToolTip("أقصى عدد عمليات ملفات في الثانية لكل الخيوط معاً")
+        self.max_load_spin = QDoubleSpinBox()
+        self.max_load_spin.setRange(0, 1024)
+        self.max_load_spin.setDecimals(1)
+        self.max_load_spin.setSpecialValueText("معطل")
+        self.max_load_spin.setToolTip(
+            "إيقاف العمليات مؤقتاً ما دام متوسط حمل النظام (دقيقة واحدة) أعلى من هذه القيمة"
+        )
+        if not hasattr(os, 'getloadavg'):
+            self.max_load_spin.setEnabled(False)
+        self.low_priority_check = QCheckBox("🐢 أولوية منخفضة")
+        self.low_priority_check.setToolTip(
+            "تشغيل خيوط العمل بأولوية معالج وقرص منخفضة (nice/ionice) - تُطبق على الخيوط\n"
+            "الجديدة، ولا تُرفع أولوية خيط بعد خفضها"
+        )
+        for spin in (self.limit_bytes_spin, self.limit_ops_spin, self.max_load_spin):
+            spin.valueChanged.connect(self.update_throttle)
+        self.low_priority_check.toggled.connect(self.update_throttle)
+        throttle_layout.addWidget(QLabel("🚦 حدود المعدل:"))
+        throttle_layout.addWidget(self.limit_bytes_spin)
+        throttle_layout.addWidget(self.limit_ops_spin)
+        throttle_layout.addSpacing(20)
+        throttle_layout.addWidget(QLabel("⏸️ إيقاف عند حمل أعلى من:"))
+        throttle_layout.addWidget(self.max_load_spin)
+        throttle_layout.addSpacing(20)
+        throttle_layout.addWidget(self.low_priority_check)
+        throttle_layout.addStretch()
+        settings_layout.addLayout(throttle_layout)
+
+        # صفوف المرشحات
+        patterns_layout = QHBoxLayout()
+        self.include_input = QLineEdit()
+        self.include_input.setPlaceholderText("تضمين فقط: *.mp4; *.mkv")
+        self.include_input.setToolTip("أنماط أسماء الملفات المطلوبة، مفصولة بفاصلة منقوطة")
+        self.exclude_input = QLineEdit()
+        self.exclude_input.setPlaceholderText("استبعاد: *.tmp; ~*")
+        self.exclude_input.setToolTip("أنماط أسماء الملفات المستبعدة، مفصولة بفاصلة منقوطة")
+        self.exclude_dirs_input = QLineEdit()
+        self.exclude_dirs_input.setPlaceholderText("مجلدات مستبعدة: .git; node_modules")
+        self.exclude_dirs_input.setToolTip("أسماء (أو أنماط) المجلدات التي لا يتم الدخول إليها")
+        patterns_layout.addWidget(QLabel("🔎 المرشحات:"))
+        patterns_layout.addWidget(self.include_input, 1)
+        patterns_layout.addWidget(self.exclude_input, 1)
+        patterns_layout.addWidget(self.exclude_dirs_input, 1)
+        settings_layout.addLayout(patterns_layout)
+
+        limits_layout = QHBoxLayout()
+        self.min_size_spin = QDoubleSpinBox()
+        self.min_size_spin.setRange(0, 10 ** 7)
+        self.min_size_spin.setSuffix(" MB")
+        self.min_size_spin.setToolTip("تجاهل الملفات الأصغر من هذا الحجم")
+        self.max_size_spin = QDoubleSpinBox()
+        self.max_size_spin.setRange(0, 10 ** 7)
+        self.max_size_spin.setSuffix(" MB")
+        self.max_size_spin.setSpecialValueText("بلا حد")
+        self.max_size_spin.setToolTip("تجاهل الملفات الأكبر من هذا الحجم (0 = بلا حد)")
+        self.depth_spin = QSpinBox()
+        self.depth_spin.setRange(-1, 999)
+        self.depth_spin.setSpecialValueText("بلا حد")
+        self.depth_spin.setToolTip("0 = المجلد المحدد فقط، -1 = جميع المجلدات الفرعية")
+        self.skip_hidden_check = QCheckBox("🙈 تجاهل المخفية")
+        self.skip_hidden_check.setToolTip("تجاهل الملفات والمجلدات المخفية")
+        limits_layout.addWidget(QLabel("أصغر حجم:"))
+        limits_layout.addWidget(self.min_size_spin)
+        limits_layout.addWidget(QLabel("أكبر حجم:"))
+        limits_layout.addWidget(self.max_size_spin)
+        limits_layout.addWidget(QLabel("عمق المجلدات:"))
+        limits_layout.addWidget(self.depth_spin)
+        limits_layout.addSpacing(20)
+        limits_layout.addWidget(self.skip_hidden_check)
+        limits_layout.addSpacing(20)
+        
+        self.reference_paths = []
+        self.reference_mode_combo = QComboBox()
+        self.reference_mode_combo.addItems(["بدون", "تعليم المطابق", "استبعاد المطابق"])
+        self.reference_mode_combo.setToolTip(
+            "مطابقة الملفات مع مجموعة ملفات معروفة (لقطة فحص، تقرير CSV، أو قائمة بصمات/أحجام)\n"
+            "بالحجم أولاً ثم البصمة للمرشحين فقط"
+        )
+        self.reference_btn = QPushButton("📋 الملفات المعروفة...")
+        self.reference_btn.clicked.connect(self.choose_reference_files)
+        limits_layout.addWidget(QLabel("⭐ المعروفة:"))
+        limits_layout.addWidget(self.reference_mode_combo)
+        limits_layout.addWidget(self.reference_btn)
+        limits_layout.addStretch()
+        settings_layout.addLayout(limits_layout)
+
         layout.addWidget(settings_group)
         
         # أزرار التحكم
@@ -808,10 +5423,41 @@ class FileSizeDuplicateFinder(QMainWindow):
             QPushButton:hover { background-color: #d68910; }
         """)
         
+        self.estimate_btn = QPushButton("⚡ تقدير سريع")
+        self.estimate_btn.setToolTip(
+            "تقدير عدد المجموعات والتوفير المحتمل من عينة عشوائية خلال ثوانٍ، قبل فحص كامل"
+        )
+        self.estimate_btn.clicked.connect(self.start_quick_estimate)
+        self.estimate_btn.setMinimumHeight(45)
+        self.estimate_btn.setStyleSheet("""
+            QPushButton { background-color: #8e44ad; }
+            QPushButton:hover { background-color: #7d3c98; }
+            QPushButton:disabled { background-color: #bdc3c7; }
+        """)
+        
         control_layout.addWidget(self.search_btn)
+        control_layout.addWidget(self.estimate_btn)
         control_layout.addWidget(self.stop_btn)
         control_layout.addWidget(self.move_btn)
         control_layout.addStretch()
+        
+        merge_btn = QPushButton("📥 دمج أجزاء فحص")
+        merge_btn.setToolTip("تجميع نتائج فحوصات أُجريت على أجهزة أو مجلدات أخرى")
+        merge_btn.clicked.connect(self.merge_shards)
+        merge_btn.setStyleSheet("""
+            QPushButton { background-color: #16a085; }
+            QPushButton:hover { background-color: #117a65; }
+        """)
+        control_layout.addWidget(merge_btn)
+        
+        open_snapshot_btn = QPushButton("📂 فتح لقطة")
+        open_snapshot_btn.setToolTip("عرض نتائج فحص محفوظة كلقطة (من هذا الجهاز أو جهاز آخر)")
+        open_snapshot_btn.clicked.connect(self.open_snapshot)
+        open_snapshot_btn.setStyleSheet("""
+            QPushButton { background-color: #16a085; }
+            QPushButton:hover { background-color: #117a65; }
+        """)
+        control_layout.addWidget(open_snapshot_btn)
         control_layout.addWidget(self.restore_btn)
         
         layout.addLayout(control_layout)
@@ -879,8 +5525,32 @@ class FileSizeDuplicateFinder(QMainWindow):
         export_btn.clicked.connect(self.export_report)
         export_btn.setStyleSheet("background-color: #1abc9c;")
         
+        self.keep_policy_combo = QComboBox()
+        for policy, label in KEEP_POLICIES.items():
+            self.keep_policy_combo.addItem(label, policy)
+        self.keep_policy_combo.setToolTip("الملف الذي يُبقى في كل مجموعة - تُحدد بقية ملفاتها للعزل")
+        self.keep_priority_input = QLineEdit()
+        self.keep_priority_input.setPlaceholderText("أولوية: /data/originals; */backup/*")
+        self.keep_priority_input.setToolTip(
+            "مجلدات أو أنماط مسارات مفصولة بفاصلة منقوطة - يُبقى ملف أول مدخل يطابقه\n"
+            "(مع قاعدة أولوية المسارات)"
+        )
+        self.keep_priority_input.setEnabled(False)
+        self.keep_policy_combo.currentIndexChanged.connect(
+            lambda _: self.keep_priority_input.setEnabled(self.keep_policy_combo.currentData() == 'priority')
+        )
+        keep_btn = QPushButton("🎯 تحديد الباقي")
+        keep_btn.setToolTip("تحديد كل ملفات المجموعات عدا الملف الذي تبقيه القاعدة، دفعة واحدة")
+        keep_btn.clicked.connect(self.select_by_keep_policy)
+        keep_btn.setStyleSheet("background-color: #8e44ad;")
+        
         select_layout.addWidget(select_all_btn)
         select_layout.addWidget(deselect_all_btn)
+        select_layout.addSpacing(20)
+        select_layout.addWidget(QLabel("الإبقاء على:"))
+        select_layout.addWidget(self.keep_policy_combo)
+        select_layout.addWidget(self.keep_priority_input, 1)
+        select_layout.addWidget(keep_btn)
         select_layout.addStretch()
         select_layout.addWidget(export_btn)
         
@@ -971,47 +5641,309 @@ class FileSizeDuplicateFinder(QMainWindow):
             QFileDialog.ShowDirsOnly | QFileDialog.DontResolveSymlinks
         )
         if folder:
-            self.folder_input.setText(folder)
+            self.set_search_roots([folder])
             self.settings.setValue("last_folder", folder)
             self.log_message(f"تم اختيار المجلد: {folder}")
     
+    def add_root_folder(self):
+        """إضافة مجلد بحث إضافي"""
+        last_folder = self.settings.value("last_folder", "")
+        folder = QFileDialog.getExistingDirectory(
+            self, "إضافة مجلد", last_folder,
+            QFileDialog.ShowDirsOnly | QFileDialog.DontResolveSymlinks
+        )
+        if folder and folder not in self.search_roots:
+            self.set_search_roots(self.search_roots + [folder])
+            self.log_message(f"تمت إضافة المجلد: {folder}")
+    
+    def set_search_roots(self, roots: List[str]):
+        """تحديث قائمة مجلدات البحث"""
+        self.search_roots = [r for r in roots if r]
+        self.folder_input.setText(" ; ".join(self.search_roots))
+        self.folder_input.setToolTip("\n".join(self.search_roots))
+    
     def start_search(self):
         """بدء البحث"""
-        folder = self.folder_input.text()
-        if not folder or not os.path.isdir(folder):
+        roots = self.search_roots
+        if not roots or not all(os.path.isdir(folder) for folder in roots):
+            QMessageBox.warning(self, "تنبيه", "الرجاء اختيار مجلد صالح")
+            return
+        
+        resume = False
+        checkpoint = ScanCheckpoint(roots, self.current_filters())
+        if checkpoint.exists():
+            info = checkpoint.info()
+            reply = QMessageBox.question(
+                self, "استئناف الفحص",
+                f"يوجد فحص غير مكتمل لهذه المجلدات بتاريخ {info['timestamp']}\n"
+                f"({info['records']} ملف تم فحصه)\n\n"
+                f"هل تريد استئنافه بدلاً من البدء من جديد؟",
+                QMessageBox.Yes | QMessageBox.No
+            )
+            resume = reply == QMessageBox.Yes
+        
+        self.log_message("بدء البحث عن الملفات المتقاربة...")
+        self.launch_search_thread(roots, resume=resume)
+    
+    def start_quick_estimate(self):
+        """تقدير سريع بالعينات للمجلدات المحددة"""
+        roots = self.search_roots
+        if not roots or not all(os.path.isdir(folder) for folder in roots):
             QMessageBox.warning(self, "تنبيه", "الرجاء اختيار مجلد صالح")
             return
         
+        self.log_message("بدء التقدير السريع بالعينات...")
+        self.search_btn.setEnabled(False)
+        self.estimate_btn.setEnabled(False)
+        self.stop_btn.setEnabled(True)
+        self.progress_bar.setValue(0)
+        
+        self.estimate_thread = QuickEstimateThread(
+            roots,
+            self.threshold_spin.value(),
+            self.same_ext_check.isChecked(),
+            self.current_filters(),
+            throttle=self.io_throttle
+        )
+        self.estimate_thread.progress.connect(self.on_search_progress)
+        self.estimate_thread.finished_estimate.connect(self.on_estimate_finished)
+        self.estimate_thread.error.connect(self.on_search_error)
+        self.estimate_thread.start()
+    
+    def on_estimate_finished(self, result: dict):
+        """عرض التقدير وفترات الثقة في شريط الإحصائيات"""
+        self.search_btn.setEnabled(True)
+        self.estimate_btn.setEnabled(True)
+        self.stop_btn.setEnabled(False)
+        self.progress_bar.setValue(100)
+        
+        if 'files' not in result:
+            self.stats_label.setText("⚡ التقدير السريع: العينة غير كافية")
+            self.log_message("لم تكتمل عينة كافية للتقدير", "WARNING")
+            return
+        
+        stats_text = (
+            f"⚡ تقدير سريع: ~{result['files']:,.0f} ملف | "
+            f"~{result['groups']:,.0f} مجموعة ({result['groups_low']:,.0f} - {result['groups_high']:,.0f}) | "
+            f"💰 التوفير المحتمل: ~{self.format_size(result['savings'])} "
+            f"({self.format_size(result['savings_low'])} - {self.format_size(result['savings_high'])})"
+        )
+        self.stats_label.setText(stats_text)
+        self.log_message(
+            f"التقدير السريع: {result['walks']} مسار عشوائي، {result['dirs_listed']} مجلد، "
+            f"{result['files_sampled']} ملف في {result['seconds']:.1f} ث (فترات ثقة 95%)",
+            "SUCCESS"
+        )
+    
+    def merge_shards(self):
+        """تجميع نتائج أجزاء فحص من أجهزة أخرى دون إعادة الفحص"""
+        paths, _ = QFileDialog.getOpenFileNames(
+            self, "اختر أجزاء الفحص", self.settings.value("last_folder", ""),
+            f"Scan Shards (*{SHARD_EXTENSION});;All Files (*)"
+        )
+        if not paths:
+            return
+        
+        self.log_message(f"بدء دمج {len(paths)} جزء فحص...")
+        self.launch_search_thread(self.search_roots, shard_paths=paths)
+    
+    def choose_reference_files(self):
+        paths, _ = QFileDialog.getOpenFileNames(
+            self, "اختر ملفات مرجعية", self.settings.value("last_folder", ""),
+            f"Reference Sets (*{SNAPSHOT_EXTENSION} *.csv *.txt *.md5 *.sha1 *.sha256);;All Files (*)"
+        )
+        if paths:
+            self.set_reference_paths(paths)
+            if self.reference_mode_combo.currentIndex() == 0:
+                self.reference_mode_combo.setCurrentIndex(1)
+    
+    def set_reference_paths(self, paths: List[str]):
+        self.reference_paths = [p for p in paths if p]
+        names = [os.path.basename(p) for p in self.reference_paths]
+        self.reference_btn.setText(f"📋 {len(names)} ملف مرجعي" if names else "📋 الملفات المعروفة...")
+        self.reference_btn.setToolTip("\n".join(self.reference_paths))
+    
+    def open_snapshot(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self, "اختر لقطة فحص", self.settings.value("last_folder", ""),
+            f"Scan Snapshot (*{SNAPSHOT_EXTENSION});;All Files (*)"
+        )
+        if path:
+            self.load_snapshot(path)
+    
+    def load_snapshot(self, path: str):
+        """
+        عرض نتائج لقطة فحص: يُبنى فهرس الأحجام فوقها مباشرة وتُعاد المجموعات بإعدادات
+        الفحص المحفوظة معها (ومع التحقق من المحتوى تُقسم حسب البصمات المحفوظة)
+        """
+        if self.search_thread and self.search_thread.isRunning():
+            return
+        start = time.perf_counter()
+        try:
+            snapshot = ScanSnapshot(path)
+        except (OSError, ValueError) as e:
+            self.log_message(f"تعذر تحميل اللقطة {path}: {e}", "ERROR")
+            return
+        meta = snapshot.meta
+        
+        # إعدادات الفحص الأصلية دون تشغيل إعادة التجميع التلقائية
+        for widget, value in ((self.threshold_spin, meta['threshold_mb']),
+                              (self.same_ext_check, meta['same_ext']),
+                              (self.same_type_check, meta.get('same_type', False)),
+                              (self.verify_check, meta['verified'])):
+            widget.blockSignals(True)
+            if isinstance(value, bool):
+                widget.setChecked(value)
+            else:
+                widget.setValue(value)
+            widget.blockSignals(False)
+        self.stop_watch()
+        self.stop_candidate_read()
+        self.set_search_roots(meta['roots'])
+        self.reset_records()
+        
+        self.size_index = snapshot.size_index()
+        self.index_scope = (meta['roots'], ScanFilters(**meta['filters']) if meta['filters'] else ScanFilters())
+        self.snapshot_dirty = False
+        self.catalog_groups = []
+        groups = snapshot.groups(
+            meta['threshold_mb'] * 1024 * 1024, meta['same_ext'], verified=meta['verified'],
+            same_type=meta.get('same_type', False)
+        )
+        self.file_paths = {}
+        self.similar_groups = groups
+        self.display_results(groups)
+        self.move_btn.setEnabled(len(groups) > 0)
+        elapsed = (time.perf_counter() - start) * 1000
+        self.log_message(
+            f"تحميل لقطة فحص {meta['timestamp'][:16].replace('T', ' ')} ({meta['host']}): "
+            f"{len(snapshot)} ملف، {len(groups)} مجموعة ({elapsed:.0f} ms)", "SUCCESS"
+        )
+        if self.watch_check.isChecked():
+            self.start_watch()
+    
+    def save_snapshot(self, path: str):
+        """كتابة الفهرس الحالي (بعد أي نقل أو استرجاع أو تغييرات مراقبة) كلقطة"""
+        meta = snapshot_meta(
+            self.search_roots, self.current_filters(), self.threshold_spin.value(),
+            self.same_ext_check.isChecked(), self.verify_check.isChecked(),
+            self.same_type_check.isChecked()
+        )
+        write_snapshot(path, list(self.size_index.records), meta)
+    
+    def launch_search_thread(self, roots: List[str], shard_paths: Optional[List[str]] = None,
+                             resume: bool = False):
+        """تهيئة الواجهة وتشغيل خيط البحث"""
         self.results_tree.clear()
         self.similar_groups = []
         self.file_paths = {}
+        self.size_index = None
+        self.index_scope = None
+        self.snapshot_dirty = False
+        self.catalog_groups = []
+        self.stop_watch()
+        self.stop_candidate_read()
+        self.reset_records()
         self.progress_bar.setValue(0)
         
         self.search_btn.setEnabled(False)
         self.stop_btn.setEnabled(True)
         self.move_btn.setEnabled(False)
         
-        self.log_message("بدء البحث عن الملفات المتقاربة...")
-        
         self.search_thread = FileSearchThread(
-            folder,
+            roots,
             self.threshold_spin.value(),
-            self.same_ext_check.isChecked()
+            self.same_ext_check.isChecked(),
+            self.current_filters(),
+            verify_content=self.verify_check.isChecked(),
+            shard_paths=shard_paths,
+            io_concurrency=self.io_concurrency_spin.value(),
+            resume=resume,
+            sort_memory_mb=self.sort_memory_spin.value(),
+            tuner=self.make_tuner(roots[0] if roots else ""),
+            use_catalog=self.catalog_check.isChecked(),
+            reference_paths=self.reference_paths if self.reference_mode_combo.currentIndex() else None,
+            reference_exclude=self.reference_mode_combo.currentIndex() == 2,
+            scan_archives=self.archives_check.isChecked(),
+            same_type_only=self.same_type_check.isChecked(),
+            similarity=self.similarity_spin.value() if self.similarity_check.isChecked() else 0,
+            throttle=self.io_throttle
         )
         self.search_thread.progress.connect(self.on_search_progress)
         self.search_thread.finished_search.connect(self.on_search_finished)
+        self.search_thread.verified_groups.connect(self.on_groups_verified)
+        self.search_thread.indexed.connect(self.on_search_indexed)
         self.search_thread.error.connect(self.on_search_error)
+        self.search_thread.log.connect(self.log_message)
         self.search_thread.start()
     
+    def tuning_group(self, root: str) -> str:
+        root_id = hashlib.sha1(os.path.realpath(root).encode('utf-8')).hexdigest()[:12]
+        return f"tuning/{root_id}"
+    
+    def update_throttle(self, *_):
+        """تطبيق حدود المعدل من الواجهة على العمليات الجارية والقادمة"""
+        self.io_throttle.set_limits(
+            self.limit_bytes_spin.value() * 1024 * 1024,
+            self.limit_ops_spin.value(),
+            self.max_load_spin.value()
+        )
+        self.io_throttle.low_priority = self.low_priority_check.isChecked()
+    
+    def make_tuner(self, root: str) -> Optional[ConcurrencyTuner]:
+        """متحكم توازي يبدأ من القيم المحفوظة لهذا الجذر، أو None إن كان الضبط التلقائي معطلاً"""
+        if not self.auto_tune_check.isChecked() or not root:
+            return None
+        self.settings.beginGroup(self.tuning_group(root))
+        initial = {key: self.settings.value(key, type=int) for key in self.settings.childKeys()}
+        self.settings.endGroup()
+        if initial:
+            self.log_message("قيم التوازي المحفوظة: " + "، ".join(
+                f"{key}={value}" for key, value in sorted(initial.items())
+            ))
+        return ConcurrencyTuner(initial)
+    
+    def save_tuning(self, root: str, tuner: Optional[ConcurrencyTuner]):
+        """حفظ قيم التوازي التي وصل إليها الضبط لهذا الجذر"""
+        if not tuner or not root:
+            return
+        self.settings.beginGroup(self.tuning_group(root))
+        for key, value in tuner.values.items():
+            self.settings.setValue(key, value)
+        self.settings.endGroup()
+    
+    def current_filters(self) -> ScanFilters:
+        """بناء مرشحات الفحص من الواجهة"""
+        return ScanFilters(
+            include_patterns=parse_patterns(self.include_input.text()),
+            exclude_patterns=parse_patterns(self.exclude_input.text()),
+            min_size=int(self.min_size_spin.value() * 1024 * 1024),
+            max_size=int(self.max_size_spin.value() * 1024 * 1024),
+            skip_hidden=self.skip_hidden_check.isChecked(),
+            exclude_dirs=parse_patterns(self.exclude_dirs_input.text()),
+            max_depth=self.depth_spin.value()
+        )
+    
     def stop_search(self):
         """إيقاف البحث"""
         if self.search_thread and self.search_thread.isRunning():
             self.search_thread.stop()
             self.search_thread.wait()
             self.log_message("تم إيقاف البحث", "WARNING")
+            if self.similar_groups:
+                self.log_message(
+                    f"تبقى {len(self.similar_groups)} مجموعة تم التحقق منها قبل الإيقاف", "INFO"
+                )
+        if self.estimate_thread and self.estimate_thread.isRunning():
+            # التقدير يتوقف عند المسار العشوائي التالي ويعرض ما جمعه من العينة
+            self.estimate_thread.stop()
+            self.estimate_thread.wait()
+            self.log_message("تم إيقاف التقدير السريع", "WARNING")
         
         self.search_btn.setEnabled(True)
+        self.estimate_btn.setEnabled(True)
         self.stop_btn.setEnabled(False)
+        self.move_btn.setEnabled(len(self.similar_groups) > 0)
     
     def on_search_progress(self, value: int, message: str):
         """تحديث التقدم"""
@@ -1021,8 +5953,14 @@ class FileSizeDuplicateFinder(QMainWindow):
     
     def on_search_finished(self, groups: list):
         """انتهاء البحث"""
-        self.similar_groups = groups
-        self.display_results(groups)
+        if self.search_thread and self.search_thread.roots:
+            self.save_tuning(self.search_thread.roots[0], self.search_thread.tuner)
+        if self.search_thread:
+            self.catalog_groups = self.search_thread.catalog_groups
+        # مع التحقق من المحتوى تكون المجموعات قد عُرضت تباعاً؛ لا داعي لإعادة بناء الشجرة
+        if groups != self.similar_groups:
+            self.similar_groups = groups
+            self.display_results(groups)
         
         self.search_btn.setEnabled(True)
         self.stop_btn.setEnabled(False)
@@ -1033,72 +5971,360 @@ class FileSizeDuplicateFinder(QMainWindow):
         
         self.log_message(f"اكتمل البحث - تم العثور على {len(groups)} مجموعة", "SUCCESS")
     
+    def on_search_indexed(self, index):
+        """حفظ فهرس الأحجام (None في وضع الفرز الخارجي)"""
+        self.size_index = index
+        self.index_scope = (self.search_thread.roots, self.search_thread.filters)
+        if self.watch_check.isChecked():
+            self.start_watch()
+    
+    def toggle_watch(self, checked: bool):
+        if checked:
+            self.start_watch()
+        else:
+            self.stop_watch()
+    
+    def start_watch(self):
+        """بدء مراقبة جذور آخر بحث (تحتاج فهرس الأحجام لتحديث المجموعات)"""
+        self.stop_watch()
+        if self.size_index is None:
+            if self.similar_groups:
+                self.log_message("المراقبة تحتاج فهرس الأحجام - عطّل حد ذاكرة الفرز وأعد البحث", "WARNING")
+            return
+        roots, filters = self.index_scope
+        self.watch_thread = FileWatchThread(roots, filters)
+        self.watch_thread.changes.connect(self.on_watch_changes)
+        self.watch_thread.log.connect(self.log_message)
+        self.watch_thread.start()
+    
+    def stop_watch(self):
+        if self.watch_thread and self.watch_thread.isRunning():
+            self.watch_thread.stop()
+            self.watch_thread.wait()
+        self.watch_thread = None
+    
+    def on_watch_changes(self, batch: dict):
+        """تطبيق دفعة تغييرات من المراقبة على فهرس الأحجام والمجموعات المعروضة"""
+        if self.size_index is None or (self.search_thread and self.search_thread.isRunning()):
+            return
+        if batch['overflow']:
+            self.log_message("فُقدت بعض أحداث المراقبة - يُنصح بإعادة البحث", "WARNING")
+        
+        records = batch['records']
+        # المجلد المحذوف تُحذف كل سجلاته
+        deleted = set(batch['removed'])
+        prefixes = tuple(d.rstrip(os.sep) + os.sep for d in batch['removed_dirs'])
+        if prefixes:
+            deleted.update(
+                path for path in map(record_path, self.size_index.records) if path.startswith(prefixes)
+            )
+        # الرابط الصلب المحذوف يُزال من روابط سجله، وإن حُذف مسار السجل نفسه يحل محله رابط باقٍ
+        for existing in self.size_index.records:
+            links = existing.get('links')
+            if not links or not (deleted.intersection(links) or record_path(existing) in deleted):
+                continue
+            links = [p for p in links if p not in deleted]
+            if record_path(existing) in deleted and links:
+                path, name = links[0], os.path.basename(links[0])
+                replacement = dict(existing, id=next(_file_ids), dir=DIRECTORIES.intern(os.path.dirname(path)),
+                                   name=name, ext=os.path.splitext(name)[1].lower(), links=links[1:])
+                existing, links = replacement, links[1:]
+                records.append(replacement)
+            if links:
+                existing['links'] = links
+            else:
+                existing.pop('links')
+        
+        # الملف المعدل يُستبدل سجله (مع روابطه الصلبة)
+        removed = deleted | {record_path(r) for r in records}
+        for record in records:
+            removed.update(record.get('links', ()))
+        
+        # رابط صلب جديد أو معدل لملف مفهرس: سجل واحد يحمل كل المسارات الباقية كما في الفحص
+        by_inode = {tuple(r['inode']): r for r in records if 'inode' in r}
+        if by_inode:
+            sizes = {r['size'] for r in by_inode.values()}
+            for existing in self.size_index.records:
+                if existing['size'] not in sizes or not is_local_record(existing):
+                    continue
+                if 'inode' in existing:
+                    key = tuple(existing['inode'])
+                else:
+                    # فُحص حين كان له رابط واحد فلم يُحفظ رقمه
+                    try:
+                        stat = os.stat(record_path(existing), follow_symlinks=False)
+                    except OSError:
+                        continue
+                    key = (stat.st_dev, stat.st_ino)
+                record = by_inode.get(key)
+                if record is None or record is existing:
+                    continue
+                paths = [record_path(existing)] + existing.get('links', [])
+                links = record.setdefault('links', [])
+                links.extend(
+                    p for p in paths
+                    if p != record_path(record) and p not in links and p not in deleted
+                    and not (prefixes and p.startswith(prefixes))
+                )
+                removed.update(paths)
+        
+        self.size_index.remove(removed)
+        self.size_index.add(records)
+        self.snapshot_dirty = True
+        self.log_message(f"تغييرات في المجلدات: {len(records)} ملف جديد/معدل، "
+                         f"{len(deleted)} محذوف")
+        # المحذوف يختفي من النتائج فوراً، حتى لو انتظرت إعادة التجميع قراءة الملفات الجديدة؛
+        # مع التحقق من المحتوى تحتاج الملفات الجديدة بصمات فتنتظر البحث التالي
+        self.remove_from_results(removed)
+        self.move_btn.setEnabled(len(self.similar_groups) > 0)
+        if not self.verify_check.isChecked():
+            self.regroup_results()
+    
+    def regroup_results(self, read_missing: bool = True):
+        """
+        إعادة التجميع بحد التقارب/خيار الامتداد الحاليين من فهرس آخر فحص. المرشحون الذين
+        لم تُقرأ ترويساتهم أو توقيعاتهم بعد تُقرأ في الخلفية ثم يُعاد التجميع
+        (read_missing=False بعدها، فيُجمّع ما تعذرت قراءته بامتداده ودون توقيع)
+        """
+        if self.size_index is None or (self.search_thread and self.search_thread.isRunning()):
+            return
+        # قراءة لتجميع سابق - الإعدادات أو الفهرس تغيرت منذ بدئها
+        self.stop_candidate_read()
+        if self.verify_check.isChecked():
+            # المجموعات الجديدة تحتاج بصمات لم تُحسب بعد
+            self.log_message("التحقق من المحتوى مفعّل - اضغط بحث لتطبيق الإعداد الجديد", "WARNING")
+            return
+        
+        start = time.perf_counter()
+        groups = self.size_index.groups(
+            self.threshold_spin.value() * 1024 * 1024, self.same_ext_check.isChecked()
+        )
+        if self.same_type_check.isChecked():
+            if read_missing and any('type' not in f and is_local_record(f) for group in groups for f in group):
+                self.read_candidates(groups)
+                return
+            groups = [g for group in groups for g in split_group_by_type(group)]
+        if self.similarity_check.isChecked():
+            if read_missing and any('sketch' not in f and is_local_record(f) for group in groups for f in group):
+                self.read_candidates(groups)
+                return
+            threshold = self.similarity_spin.value() / 100
+            groups = [c for group in groups for c in cluster_similar(group, threshold)]
+        if self.catalog_groups:
+            # مجموعات الأقراص الأخرى لا تتبع حد التقارب؛ تبقى ما بقي ملفها المحلي في الفهرس
+            indexed = {f['id'] for f in self.size_index.records}
+            self.catalog_groups = [
+                g for g in self.catalog_groups if any(f['id'] in indexed for f in g)
+            ]
+            groups = groups + self.catalog_groups
+        elapsed = (time.perf_counter() - start) * 1000
+        
+        self.file_paths = {}
+        self.similar_groups = groups
+        self.display_results(groups)
+        self.move_btn.setEnabled(len(groups) > 0)
+        self.log_message(
+            f"إعادة التجميع بحد {self.threshold_spin.value()} MB: "
+            f"{len(groups)} مجموعة من {len(self.size_index)} ملف ({elapsed:.1f} ms)"
+        )
+    
+    def read_candidates(self, groups: List[List[dict]]):
+        """قراءة ما ينقص المرشحين الجدد في الخلفية ثم إعادة التجميع (on_candidates_read)"""
+        self.status_bar.showMessage("جاري قراءة الملفات الجديدة قبل إعادة التجميع...")
+        self.read_thread = CandidateReadThread(
+            groups, self.same_type_check.isChecked(), self.similarity_check.isChecked(),
+            self.io_concurrency_spin.value(), self.io_throttle
+        )
+        self.read_thread.finished_read.connect(self.on_candidates_read)
+        self.read_thread.error.connect(self.on_candidates_error)
+        self.read_thread.log.connect(self.log_message)
+        self.read_thread.start()
+    
+    def stop_candidate_read(self):
+        if self.read_thread:
+            self.retire_thread(self.read_thread)
+            self.read_thread = None
+    
+    def on_candidates_read(self):
+        if self.sender() is not self.read_thread:
+            return
+        self.read_thread = None
+        self.regroup_results(read_missing=False)
+    
+    def on_candidates_error(self, error: str):
+        if self.sender() is not self.read_thread:
+            return
+        self.read_thread = None
+        # لا تبقى نتائج قديمة معروضة: بحث جديد يقرأ كل ما يلزم
+        self.log_message(f"تعذرت قراءة الملفات الجديدة ({error}) - إعادة البحث", "WARNING")
+        if self.search_roots:
+            self.start_search()
+    
+    def reset_records(self):
+        """
+        تفريغ جداول السجلات المشتركة قبل فحص أو لقطة جديدة. إن بقي خيط يعمل على سجلات
+        سابقة (نقل، استرجاع، أو خيط متقاعد لم ينتهِ) تُؤجل حتى الفحص التالي.
+        """
+        threads = [self.search_thread, self.chunk_thread, self.read_thread, self.move_thread,
+                   self.restore_thread, self.watch_thread, *self.findChildren(QThread)]
+        if any(thread is not None and thread.isRunning() for thread in threads):
+            return
+        self.chunk_reports = {}
+        self.chunk_pending = set()
+        reset_record_tables()
+    
+    def retire_thread(self, thread: QThread):
+        """
+        إيقاف خيط لم تعد نتيجته مطلوبة دون انتظاره في خيط الواجهة: تُفصل إشاراته ويبقى
+        تابعاً للنافذة حتى ينتهي ثم يُحذف
+        """
+        thread.stop()
+        thread.disconnect()
+        thread.setParent(self)
+        thread.finished.connect(thread.deleteLater)
+    
     def on_search_error(self, error: str):
         """خطأ في البحث"""
         QMessageBox.critical(self, "خطأ", f"حدث خطأ أثناء البحث:\n{error}")
         self.log_message(f"خطأ: {error}", "ERROR")
         
         self.search_btn.setEnabled(True)
+        self.estimate_btn.setEnabled(True)
         self.stop_btn.setEnabled(False)
     
     def display_results(self, groups: list):
         """عرض النتائج"""
         self.results_tree.clear()
-        
-        total_files = 0
-        total_size = 0
-        potential_savings = 0
+        self.result_totals = [0, 0, 0]  # الملفات، الحجم الكلي، التوفير المحتمل
+        self.chunk_reports = {}  # التقارير تخص تركيب المجموعات السابقة
         
         for group_idx, group_files in enumerate(groups):
-            color = GROUP_COLORS[group_idx % len(GROUP_COLORS)]
-            
-            # إنشاء عنصر المجموعة
-            group_item = QTreeWidgetItem(self.results_tree)
-            group_item.setText(0, "☐")
-            group_item.setText(1, f"المجموعة {group_idx + 1}")
-            group_size = sum(f['size'] for f in group_files)
-            group_item.setText(3, f"{len(group_files)} ملفات - {self.format_size(group_size)}")
-            
-            for col in range(5):
-                group_item.setBackground(col, QColor(color))
-            
-            group_item.setExpanded(True)
-            group_item.setData(0, Qt.UserRole, {'type': 'group', 'index': group_idx})
-            
-            # حساب التوفير المحتمل (جميع الملفات عدا الأكبر)
-            sorted_files = sorted(group_files, key=lambda x: x['size'], reverse=True)
-            potential_savings += sum(f['size'] for f in sorted_files[1:])
-            
-            for file_info in group_files:
-                file_item = QTreeWidgetItem(group_item)
-                file_item.setText(0, "☐")
-                file_item.setText(2, file_info['name'])
-                file_item.setText(3, self.format_size(file_info['size']))
-                file_item.setText(4, file_info['ext'] or "بدون")
-                
-                file_id = f"file_{group_idx}_{file_info['name']}"
-                self.file_paths[file_id] = file_info
-                file_item.setData(0, Qt.UserRole, {'type': 'file', 'id': file_id, 'info': file_info})
-                
-                total_files += 1
-                total_size += file_info['size']
+            self.add_group_item(group_idx, group_files)
+        
+        self.update_stats_label()
+    
+    def add_group_item(self, group_idx: int, group_files: list):
+        """إضافة مجموعة إلى شجرة النتائج والإحصائيات"""
+        color = GROUP_COLORS[group_idx % len(GROUP_COLORS)]
+        
+        # إنشاء عنصر المجموعة
+        group_item = QTreeWidgetItem(self.results_tree)
+        group_item.setText(0, "☐")
+        group_item.setText(1, self.group_title(group_idx, group_files))
+        self.update_group_header(group_item, group_files)
+        
+        for col in range(5):
+            group_item.setBackground(col, QColor(color))
+        
+        group_item.setExpanded(True)
+        group_item.setData(0, Qt.UserRole, {'type': 'group', 'index': group_idx})
         
-        # تحديث الإحصائيات
+        self.add_group_totals(group_files, 1)
+        
+        for file_info in group_files:
+            file_item = QTreeWidgetItem(group_item)
+            file_item.setText(0, "☐")
+            file_item.setText(2, f"⭐ {file_info['name']}" if file_info.get('known') else file_info['name'])
+            file_item.setText(3, self.format_size(file_info['size']))
+            file_item.setText(4, file_info['ext'] or "بدون")
+            
+            # بيانات العنصر تُنسخ عند قراءتها - يُخزن رقم الملف ويُستعاد سجله من file_paths
+            self.file_paths[file_info['id']] = file_info
+            file_item.setData(0, Qt.UserRole, {'type': 'file', 'id': file_info['id']})
+    
+    def on_groups_verified(self, groups: list):
+        """عرض المجموعات المتحقق منها فور وصولها (الأكبر توفيراً أولاً)"""
+        for group_files in groups:
+            self.add_group_item(len(self.similar_groups), group_files)
+            self.similar_groups.append(group_files)
+        self.update_stats_label()
+    
+    @staticmethod
+    def group_title(group_idx: int, group_files: list) -> str:
+        """
+        عنوان المجموعة مع أسماء الأقراص الأخرى التي عليها نسخ من فهرس الأقراص،
+        أو الأرشيفات التي تحوي أعضاءً منها والتشابه المقدّر إن حُسبت توقيعات ملفاتها
+        """
+        volumes = sorted({f['volume'] for f in group_files if 'volume' in f})
+        if volumes:
+            return f"المجموعة {group_idx + 1} - 💾 {'، '.join(volumes)}"
+        archives = sorted({os.path.basename(f['archive']) for f in group_files if 'archive' in f})
+        title = f"المجموعة {group_idx + 1}"
+        if archives:
+            title += f" - 📦 {'، '.join(archives)}"
+        similarity = group_similarity(group_files)
+        if similarity is not None:
+            title += f" - 🧩 تشابه ≈{similarity:.0%}"
+        if is_unverified_group(group_files):
+            title += " - ⚠ لم يُتحقق من المحتوى"
+        return title
+    
+    def update_group_header(self, group_item: QTreeWidgetItem, group_files: list):
+        group_size = sum(f['size'] for f in group_files)
+        group_item.setText(3, f"{len(group_files)} ملفات - {self.format_size(group_size)}")
+    
+    def add_group_totals(self, group_files: list, sign: int):
+        """إضافة (sign=1) أو طرح (sign=-1) مساهمة مجموعة في الإحصائيات"""
+        self.result_totals[0] += sign * len(group_files)
+        self.result_totals[1] += sign * sum(f['size'] for f in group_files)
+        self.result_totals[2] += sign * group_savings(group_files)
+    
+    def update_stats_label(self):
+        """تحديث الإحصائيات"""
+        total_files, total_size, potential_savings = self.result_totals
         stats_text = (
-            f"📊 الإحصائيات: {len(groups)} مجموعة | "
+            f"📊 الإحصائيات: {len(self.similar_groups)} مجموعة | "
             f"{total_files} ملف | "
             f"الحجم الكلي: {self.format_size(total_size)} | "
             f"💰 التوفير المحتمل: {self.format_size(potential_savings)}"
         )
         self.stats_label.setText(stats_text)
     
+    def remove_from_results(self, paths) -> int:
+        """
+        حذف ملفات (نُقلت مثلاً) من النتائج المعروضة في مكانها دون إعادة بناء الشجرة:
+        المجموعات التي يبقى فيها أقل من ملفين تُزال، والإحصائيات تُحدّث بفرق كل مجموعة.
+        """
+        paths = set(paths)
+        removed_groups = 0
+        root = self.results_tree.invisibleRootItem()
+        for group_idx in range(root.childCount() - 1, -1, -1):
+            group_files = self.similar_groups[group_idx]
+            remaining = [f for f in group_files if not record_in(f, paths)]
+            if len(remaining) == len(group_files):
+                continue
+            
+            self.add_group_totals(group_files, -1)
+            group_item = root.child(group_idx)
+            if len(remaining) < 2:
+                for j in range(group_item.childCount()):
+                    self.file_paths.pop(group_item.child(j).data(0, Qt.UserRole)['id'], None)
+                root.removeChild(group_item)
+                del self.similar_groups[group_idx]
+                removed_groups += 1
+                continue
+            
+            for j in range(group_item.childCount() - 1, -1, -1):
+                data = group_item.child(j).data(0, Qt.UserRole)
+                file_info = self.file_paths[data['id']]
+                if record_in(file_info, paths):
+                    self.file_paths.pop(data['id'], None)
+                    group_item.removeChild(group_item.child(j))
+            self.similar_groups[group_idx] = remaining
+            self.update_group_header(group_item, remaining)
+            self.add_group_totals(remaining, 1)
+        
+        # إعادة ترقيم المجموعات المتبقية
+        if removed_groups:
+            for group_idx in range(root.childCount()):
+                root.child(group_idx).setText(1, self.group_title(group_idx, self.similar_groups[group_idx]))
+        self.chunk_reports = {}
+        self.update_stats_label()
+        return removed_groups
+    
     def format_size(self, size: int) -> str:
         """تنسيق الحجم"""
-        for unit in ['B', 'KB', 'MB', 'GB']:
-            if size < 1024:
-                return f"{size:.2f} {unit}"
-            size /= 1024
-        return f"{size:.2f} TB"
+        return format_size(size)
     
     def on_item_clicked(self, item: QTreeWidgetItem, column: int):
         """معالجة النقر"""
@@ -1124,20 +6350,69 @@ class FileSizeDuplicateFinder(QMainWindow):
         # عرض المعاينة
         data = item.data(0, Qt.UserRole)
         if data and data.get('type') == 'file':
-            info = data['info']
-            preview = f"""📄 اسم الملف: {info['name']}
+            group_item = item.parent()
+            group_files = self.similar_groups[self.results_tree.indexOfTopLevelItem(group_item)]
+            if sum(f['size'] for f in group_files) <= CHUNK_AUTO_LIMIT:
+                self.analyze_chunks(group_files)
+            self.show_preview(self.file_paths[data['id']])
+    
+    def show_preview(self, info: dict):
+        """تفاصيل الملف في لوحة المعاينة مع تقرير البايتات المشتركة إن وُجد"""
+        preview = f"""📄 اسم الملف: {info['name']}
 📏 الحجم: {self.format_size(info['size'])}
 🏷️ الامتداد: {info['ext'] or 'بدون'}
 📅 تاريخ الإنشاء: {info['created']}
 📝 آخر تعديل: {info['modified']}
-📁 المسار: {info['path']}"""
-            self.preview_text.setText(preview)
+📁 المسار: {display_path(info)}"""
+        if 'type' in info:
+            preview += f"\n🧬 النوع الفعلي: {info['type'] or 'غير معروف'}"
+        if info.get('known'):
+            preview += f"\n⭐ ملف معروف في: {info['known']}"
+        if 'archive' in info:
+            preview += f"\n📦 داخل الأرشيف: {info['archive']} (لا يُنقل)"
+            if info.get('crc') is not None:
+                preview += f"\n🔢 CRC32: {info['crc']:08x}"
+        if info.get('links'):
+            preview += f"\n🔗 روابط صلبة لنفس الملف ({len(info['links'])}): " + " ; ".join(info['links'])
+        if info['id'] in self.chunk_reports:
+            preview += "\n" + "\n".join(self.chunk_reports[info['id']])
+        elif info['id'] in self.chunk_pending:
+            preview += "\n⏳ جاري تحليل القطع المشتركة مع بقية المجموعة..."
+        self.preview_text.setText(preview)
+    
+    def analyze_chunks(self, group_files: list):
+        """تحليل القطع المشتركة لملفات مجموعة في الخلفية (ما لم يكن محللاً أو قيد التحليل)"""
+        files = [f for f in group_files if is_local_record(f)]
+        ids = {f['id'] for f in files}
+        if len(files) < 2 or ids <= set(self.chunk_reports) or ids == self.chunk_pending:
+            return
+        if self.chunk_thread and self.chunk_thread.isRunning():
+            # مجموعة أخرى اختيرت - التحليل السابق لم يعد معروضاً؛ يتوقف عند قراءته التالية
+            self.retire_thread(self.chunk_thread)
+        self.chunk_pending = ids
+        self.chunk_thread = ChunkAnalysisThread(files, self.io_concurrency_spin.value(), self.io_throttle)
+        self.chunk_thread.finished_analysis.connect(self.on_chunks_analyzed)
+        self.chunk_thread.error.connect(lambda error: self.log_message(f"تعذر تحليل القطع: {error}", "ERROR"))
+        self.chunk_thread.log.connect(self.log_message)
+        self.chunk_thread.start()
+    
+    def on_chunks_analyzed(self, reports: dict):
+        if self.sender() is not self.chunk_thread:
+            return  # تحليل أُلغي لمجموعة أخرى واكتمل قبل إيقافه
+        self.chunk_reports.update(reports)
+        self.chunk_pending = set()
+        item = self.results_tree.currentItem()
+        data = item.data(0, Qt.UserRole) if item else None
+        if data and data.get('type') == 'file' and data['id'] in reports:
+            self.show_preview(self.file_paths[data['id']])
     
     def open_file_location(self, item: QTreeWidgetItem, column: int):
         """فتح موقع الملف"""
         data = item.data(0, Qt.UserRole)
         if data and data.get('type') == 'file':
-            folder = os.path.dirname(data['info']['path'])
+            info = self.file_paths[data['id']]
+            # عضو الأرشيف يُفتح مجلد أرشيفه
+            folder = os.path.dirname(info.get('archive') or record_path(info))
             QDesktopServices.openUrl(QUrl.fromLocalFile(folder))
             self.log_message(f"فتح المجلد: {folder}")
     
@@ -1157,6 +6432,12 @@ class FileSizeDuplicateFinder(QMainWindow):
         open_action.triggered.connect(lambda: self.open_file_location(item, 0))
         menu.addAction(open_action)
         
+        chunks_action = QAction("🧱 تحليل القطع المشتركة", self)
+        chunks_action.triggered.connect(lambda: self.analyze_chunks(
+            self.similar_groups[self.results_tree.indexOfTopLevelItem(item.parent())]
+        ))
+        menu.addAction(chunks_action)
+        
         select_action = QAction("☑ تحديد", self)
         select_action.triggered.connect(lambda: item.setText(0, "☑"))
         menu.addAction(select_action)
@@ -1181,6 +6462,35 @@ class FileSizeDuplicateFinder(QMainWindow):
             for j in range(group.childCount()):
                 group.child(j).setText(0, "☐")
     
+    def select_by_keep_policy(self):
+        """تطبيق قاعدة الإبقاء على كل المجموعات وتحديث حالة التحديد في الشجرة مرة واحدة"""
+        if not self.similar_groups:
+            return
+        policy = self.keep_policy_combo.currentData()
+        start = time.perf_counter()
+        selected = select_by_policy(
+            self.similar_groups, policy, parse_patterns(self.keep_priority_input.text(), separators=";")
+        )
+        
+        root = self.results_tree.invisibleRootItem()
+        self.results_tree.setUpdatesEnabled(False)
+        total = 0
+        for group_idx, group_selected in enumerate(selected):
+            group_item = root.child(group_idx)
+            ids = {f['id'] for f in group_selected}
+            total += len(ids)
+            for j in range(group_item.childCount()):
+                file_item = group_item.child(j)
+                file_item.setText(0, "☑" if file_item.data(0, Qt.UserRole)['id'] in ids else "☐")
+            # المجموعة لا تُعلَّم كاملة لأن ملفاً منها يبقى
+            group_item.setText(0, "☐")
+        self.results_tree.setUpdatesEnabled(True)
+        elapsed = (time.perf_counter() - start) * 1000
+        self.log_message(
+            f"قاعدة الإبقاء ({KEEP_POLICIES[policy]}): تحديد {total} ملف في "
+            f"{sum(1 for g in selected if g)} مجموعة ({elapsed:.0f} ms)"
+        )
+    
     def get_selected_files(self) -> List[List[Dict]]:
         """الحصول على الملفات المحددة"""
         selected_groups = []
@@ -1194,8 +6504,8 @@ class FileSizeDuplicateFinder(QMainWindow):
                 file_item = group.child(j)
                 if file_item.text(0) == "☑":
                     data = file_item.data(0, Qt.UserRole)
-                    if data and data.get('info'):
-                        group_files.append(data['info'])
+                    if data and data.get('id') in self.file_paths:
+                        group_files.append(self.file_paths[data['id']])
             
             if group_files:
                 selected_groups.append(group_files)
@@ -1231,22 +6541,29 @@ class FileSizeDuplicateFinder(QMainWindow):
         
         self.move_thread = FileMoveThread(
             selected,
-            self.folder_input.text(),
-            operation_id
+            self.search_roots[0],
+            operation_id,
+            self.io_concurrency_spin.value(),
+            tuner=self.make_tuner(self.search_roots[0]),
+            throttle=self.io_throttle
         )
         self.move_thread.progress.connect(self.on_search_progress)
+        self.move_thread.log.connect(self.log_message)
         self.move_thread.finished_move.connect(self.on_move_finished)
         self.move_thread.error.connect(self.on_move_error)
         self.move_thread.start()
     
     def on_move_finished(self, result: dict):
         """انتهاء النقل"""
+        self.save_tuning(self.move_thread.base_folder, self.move_thread.tuner)
         # حفظ في السجل
         batch = {
             'operation_id': result['operation_id'],
             'timestamp': result['timestamp'],
             'source_folder': result['source_folder'],
             'dest_folder': result['dest_folder'],
+            'source_folders': result['source_folders'],
+            'dest_folders': result['dest_folders'],
             'total_files': result['moved_count'],
             'total_size': result['total_size'],
             'operations': result['operations'],
@@ -1256,7 +6573,9 @@ class FileSizeDuplicateFinder(QMainWindow):
         self.save_history()
         
         # رسالة النتيجة
-        message = f"تم نقل {result['moved_count']} ملف بنجاح إلى:\n{result['dest_folder']}"
+        message = f"تم نقل {result['moved_count']} ملف بنجاح إلى:\n" + "\n".join(
+            result['dest_folders'] or [result['dest_folder']]
+        )
         if result['error_files']:
             message += f"\n\nتعذر نقل {len(result['error_files'])} ملف"
         
@@ -1265,11 +6584,17 @@ class FileSizeDuplicateFinder(QMainWindow):
         self.play_notification()
         self.log_message(f"اكتمل النقل - {result['moved_count']} ملف", "SUCCESS")
         
-        self.move_btn.setEnabled(True)
         self.search_btn.setEnabled(True)
         
-        # إعادة البحث
-        self.start_search()
+        # تحديث النتائج في مكانها بدلاً من إعادة الفحص
+        moved_paths = [op['source'] for op in result['operations']]
+        if self.size_index is not None:
+            self.size_index.remove(moved_paths)
+            self.snapshot_dirty = True
+        dissolved = self.remove_from_results(moved_paths)
+        self.move_btn.setEnabled(len(self.similar_groups) > 0)
+        if dissolved:
+            self.log_message(f"أُزيلت {dissolved} مجموعة لم يبق فيها إلا ملف واحد")
     
     def on_move_error(self, error: str):
         """خطأ في النقل"""
@@ -1293,14 +6618,20 @@ class FileSizeDuplicateFinder(QMainWindow):
         """إرجاع الملفات"""
         self.log_message(f"بدء إرجاع الملفات - {batch['total_files']} ملف...")
         
-        self.restore_thread = FileRestoreThread(batch)
+        self.restore_thread = FileRestoreThread(
+            batch, self.io_concurrency_spin.value(),
+            tuner=self.make_tuner(batch['source_folder']),
+            throttle=self.io_throttle
+        )
         self.restore_thread.progress.connect(self.on_search_progress)
+        self.restore_thread.log.connect(self.log_message)
         self.restore_thread.finished_restore.connect(self.on_restore_finished)
         self.restore_thread.error.connect(self.on_restore_error)
         self.restore_thread.start()
     
     def on_restore_finished(self, result: dict):
         """انتهاء الإرجاع"""
+        self.save_tuning(self.restore_thread.batch['source_folder'], self.restore_thread.tuner)
         # تحديث السجل
         for batch in self.history:
             if batch['operation_id'] == result['operation_id']:
@@ -1317,8 +6648,22 @@ class FileSizeDuplicateFinder(QMainWindow):
         self.play_notification()
         self.log_message(f"اكتمل الإرجاع - {result['restored_count']} ملف", "SUCCESS")
         
-        # إعادة البحث إذا كان هناك مجلد محدد
-        if self.folder_input.text():
+        # إعادة الملفات المسترجعة إلى مجموعاتها من فهرس الأحجام دون فحص - ما كان منها ضمن
+        # جذور الفحص المعروض ومرشحاته فقط (الدفعة قد تكون من فحص آخر)؛ مع التحقق من المحتوى
+        # تحتاج الملفات المسترجعة بصمات فيُعاد البحث
+        roots, filters = self.index_scope or (self.search_roots, self.current_filters())
+        restored = [
+            record for record in (admit_path(record_path(r), roots, filters)
+                                  for r in result.get('restored_records', []))
+            if record is not None
+        ]
+        if not restored:
+            return
+        if self.size_index is not None and not self.verify_check.isChecked():
+            self.size_index.add(restored)
+            self.snapshot_dirty = True
+            self.regroup_results()
+        elif self.search_roots:
             self.start_search()
     
     def on_restore_error(self, error: str):
@@ -1335,14 +6680,22 @@ class FileSizeDuplicateFinder(QMainWindow):
         file_path, file_filter = QFileDialog.getSaveFileName(
             self, "حفظ التقرير",
             f"duplicate_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
-            "Text Files (*.txt);;CSV Files (*.csv)"
+            "Text Files (*.txt);;CSV Files (*.csv);;"
+            f"Scan Snapshot (*{SNAPSHOT_EXTENSION})"
         )
         
         if not file_path:
             return
         
         try:
-            if file_path.endswith('.csv'):
+            if file_filter.startswith("Scan Snapshot") or file_path.endswith(SNAPSHOT_EXTENSION):
+                if self.size_index is None:
+                    QMessageBox.warning(self, "تنبيه", "اللقطة تحتاج فهرس الأحجام - عطّل حد ذاكرة الفرز وأعد البحث")
+                    return
+                if not file_path.endswith(SNAPSHOT_EXTENSION):
+                    file_path += SNAPSHOT_EXTENSION
+                self.save_snapshot(file_path)
+            elif file_path.endswith('.csv'):
                 self.export_csv(file_path)
             else:
                 self.export_txt(file_path)
@@ -1354,39 +6707,11 @@ class FileSizeDuplicateFinder(QMainWindow):
     
     def export_txt(self, file_path: str):
         """تصدير كـ TXT"""
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write("=" * 80 + "\n")
-            f.write(f"تقرير الملفات المتقاربة بالحجم\n")
-            f.write(f"تاريخ التقرير: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"تطوير: {DEVELOPER} | {EMAIL}\n")
-            f.write("=" * 80 + "\n\n")
-            
-            for idx, group in enumerate(self.similar_groups, 1):
-                f.write(f"\n{'─' * 60}\n")
-                f.write(f"المجموعة {idx} ({len(group)} ملفات)\n")
-                f.write(f"{'─' * 60}\n")
-                
-                for file_info in group:
-                    f.write(f"  • {file_info['name']}\n")
-                    f.write(f"    الحجم: {self.format_size(file_info['size'])}\n")
-                    f.write(f"    المسار: {file_info['path']}\n\n")
+        write_txt_report(file_path, self.similar_groups)
     
     def export_csv(self, file_path: str):
         """تصدير كـ CSV"""
-        with open(file_path, 'w', encoding='utf-8-sig', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(['المجموعة', 'اسم الملف', 'الحجم (بايت)', 'الحجم', 'الامتداد', 'المسار'])
-            
-            for idx, group in enumerate(self.similar_groups, 1):
-                for file_info in group:
-                    writer.writerow([
-                        idx,
-                        file_info['name'],
-                        file_info['size'],
-                        self.format_size(file_info['size']),
-                        file_info['ext'],
-                        file_info['path']
-                    ])
+        write_csv_report(file_path, self.similar_groups)
     
     def play_notification(self):
         """تشغيل صوت الإشعار"""
@@ -1441,36 +6766,358 @@ class FileSizeDuplicateFinder(QMainWindow):
         self.same_ext_check.setChecked(
             self.settings.value("same_ext", False, type=bool)
         )
+        self.same_type_check.setChecked(
+            self.settings.value("same_type", False, type=bool)
+        )
+        self.keep_policy_combo.setCurrentIndex(
+            max(0, self.keep_policy_combo.findData(self.settings.value("keep/policy", "newest")))
+        )
+        self.keep_priority_input.setText(self.settings.value("keep/priority", ""))
+        self.similarity_check.setChecked(self.settings.value("similarity/enabled", False, type=bool))
+        self.similarity_spin.setValue(self.settings.value("similarity/percent", DEFAULT_SIMILARITY, type=int))
+        self.verify_check.setChecked(
+            self.settings.value("verify_content", False, type=bool)
+        )
+        self.io_concurrency_spin.setValue(
+            self.settings.value("io/concurrency", DEFAULT_IO_CONCURRENCY, type=int)
+        )
+        self.sort_memory_spin.setValue(self.settings.value("sort/memory_mb", 0, type=int))
+        self.auto_tune_check.setChecked(self.settings.value("io/auto_tune", False, type=bool))
+        self.limit_bytes_spin.setValue(self.settings.value("throttle/bytes_mb", 0.0, type=float))
+        self.limit_ops_spin.setValue(self.settings.value("throttle/ops", 0, type=int))
+        self.max_load_spin.setValue(self.settings.value("throttle/max_load", 0.0, type=float))
+        self.low_priority_check.setChecked(self.settings.value("throttle/low_priority", False, type=bool))
+        self.watch_check.setChecked(
+            INOTIFY_AVAILABLE and self.settings.value("watch/enabled", False, type=bool)
+        )
+        self.catalog_check.setChecked(self.settings.value("catalog/enabled", False, type=bool))
+        self.archives_check.setChecked(self.settings.value("archives/enabled", False, type=bool))
+        self.set_reference_paths([
+            p for p in self.settings.value("reference/paths", "").split("\n") if os.path.isfile(p)
+        ])
+        self.reference_mode_combo.setCurrentIndex(
+            self.settings.value("reference/mode", 0, type=int) if self.reference_paths else 0
+        )
         last_folder = self.settings.value("last_folder", "")
-        if last_folder and os.path.isdir(last_folder):
-            self.folder_input.setText(last_folder)
+        roots = [r for r in self.settings.value("roots", "").split("\n") if r]
+        if not roots and last_folder:
+            roots = [last_folder]
+        self.set_search_roots([r for r in roots if os.path.isdir(r)])
+        
+        # المرشحات
+        self.include_input.setText(self.settings.value("filters/include", ""))
+        self.exclude_input.setText(self.settings.value("filters/exclude", ""))
+        self.exclude_dirs_input.setText(self.settings.value("filters/exclude_dirs", ""))
+        self.min_size_spin.setValue(self.settings.value("filters/min_size_mb", 0.0, type=float))
+        self.max_size_spin.setValue(self.settings.value("filters/max_size_mb", 0.0, type=float))
+        self.skip_hidden_check.setChecked(
+            self.settings.value("filters/skip_hidden", False, type=bool)
+        )
+        self.depth_spin.setValue(self.settings.value("filters/max_depth", 0, type=int))
     
     def save_settings(self):
         """حفظ الإعدادات"""
         self.settings.setValue("threshold", self.threshold_spin.value())
         self.settings.setValue("same_ext", self.same_ext_check.isChecked())
-        self.settings.setValue("last_folder", self.folder_input.text())
+        self.settings.setValue("same_type", self.same_type_check.isChecked())
+        self.settings.setValue("keep/policy", self.keep_policy_combo.currentData())
+        self.settings.setValue("keep/priority", self.keep_priority_input.text())
+        self.settings.setValue("similarity/enabled", self.similarity_check.isChecked())
+        self.settings.setValue("similarity/percent", self.similarity_spin.value())
+        self.settings.setValue("verify_content", self.verify_check.isChecked())
+        self.settings.setValue("io/concurrency", self.io_concurrency_spin.value())
+        self.settings.setValue("io/auto_tune", self.auto_tune_check.isChecked())
+        self.settings.setValue("throttle/bytes_mb", self.limit_bytes_spin.value())
+        self.settings.setValue("throttle/ops", self.limit_ops_spin.value())
+        self.settings.setValue("throttle/max_load", self.max_load_spin.value())
+        self.settings.setValue("throttle/low_priority", self.low_priority_check.isChecked())
+        self.settings.setValue("sort/memory_mb", self.sort_memory_spin.value())
+        self.settings.setValue("watch/enabled", self.watch_check.isChecked())
+        self.settings.setValue("catalog/enabled", self.catalog_check.isChecked())
+        self.settings.setValue("archives/enabled", self.archives_check.isChecked())
+        self.settings.setValue("reference/mode", self.reference_mode_combo.currentIndex())
+        self.settings.setValue("reference/paths", "\n".join(self.reference_paths))
+        if self.search_roots:
+            self.settings.setValue("last_folder", self.search_roots[0])
+        self.settings.setValue("roots", "\n".join(self.search_roots))
+        self.settings.setValue("filters/include", self.include_input.text())
+        self.settings.setValue("filters/exclude", self.exclude_input.text())
+        self.settings.setValue("filters/exclude_dirs", self.exclude_dirs_input.text())
+        self.settings.setValue("filters/min_size_mb", self.min_size_spin.value())
+        self.settings.setValue("filters/max_size_mb", self.max_size_spin.value())
+        self.settings.setValue("filters/skip_hidden", self.skip_hidden_check.isChecked())
+        self.settings.setValue("filters/max_depth", self.depth_spin.value())
     
     def closeEvent(self, event):
         """معالجة الإغلاق"""
         # إيقاف الخيوط
-        for thread in [self.search_thread, self.move_thread, self.restore_thread]:
+        # (الخيوط الموقوفة التي لم تنته بعد تابعة للنافذة - انظر retire_thread)
+        for thread in [self.search_thread, self.estimate_thread, self.chunk_thread, self.read_thread,
+                       self.move_thread, self.restore_thread, self.watch_thread,
+                       *self.findChildren(QThread)]:
             if thread and thread.isRunning():
                 thread.stop()
                 thread.wait()
         
+        # حفظ آخر نتائج إن تغيرت منذ الفحص أو التحميل
+        if self.snapshot_dirty and self.size_index is not None:
+            try:
+                self.save_snapshot(LAST_SNAPSHOT_FILE)
+            except OSError:
+                pass
+        
         # حفظ الإعدادات
         self.save_settings()
         
         event.accept()
 
 
+# ═══════════════════════════════════════════════════════════════════════════════
+# التشغيل بدون واجهة
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    """خيارات سطر الأوامر للتشغيل بدون واجهة"""
+    parser = argparse.ArgumentParser(
+        description="File Size Duplicate Finder - التشغيل بدون واجهة"
+    )
+    parser.add_argument('roots', nargs='*', help="المجلدات المراد فحصها")
+    parser.add_argument('--scan-shard', metavar='OUT',
+                        help=f"فحص المجلدات وكتابة جزء فحص مستقل إلى OUT (أو لقطة إن انتهى بـ {SNAPSHOT_EXTENSION})")
+    parser.add_argument('--merge-shards', nargs='+', metavar='SHARD',
+                        help="دمج أجزاء فحص وتجميعها دون إعادة الفحص")
+    parser.add_argument('--diff', nargs=2, metavar=('OLD', 'NEW'),
+                        help="مقارنة لقطتي فحص: المجموعات الجديدة والتي نمت والتي حُلّت "
+                             "(بإعدادات تجميع اللقطة الأحدث)")
+    parser.add_argument('--json', metavar='FILE', help="كتابة نتائج المقارنة بصيغة JSON")
+    parser.add_argument('--host', help="اسم الجهاز المسجل في جزء الفحص")
+    parser.add_argument('--hash', action='store_true',
+                        help="تضمين بصمات المحتوى في جزء الفحص")
+    parser.add_argument('--threshold', type=float, default=3.0, help="حد التقارب بالميجابايت")
+    parser.add_argument('--same-ext', action='store_true', help="نفس الامتداد فقط")
+    parser.add_argument('--verify', action='store_true', help="التحقق من تطابق المحتوى")
+    parser.add_argument('--report', metavar='FILE', help="كتابة تقرير TXT أو CSV")
+    parser.add_argument('--keep', choices=list(KEEP_POLICIES),
+                        help="قاعدة إبقاء ملف واحد في كل مجموعة وتحديد البقية (مع --merge-shards)")
+    parser.add_argument('--priority', default="",
+                        help="مجلدات أو أنماط مسارات مفصولة بـ ; لقاعدة --keep priority")
+    parser.add_argument('--selection', metavar='FILE',
+                        help="كتابة مسارات الملفات المحددة بقاعدة --keep (سطر لكل ملف)")
+    parser.add_argument('--snapshot', metavar='FILE',
+                        help=f"حفظ السجلات المدمجة كلقطة فحص ({SNAPSHOT_EXTENSION}) تُفتح في الواجهة")
+    parser.add_argument('--include', default="", help="أنماط التضمين مفصولة بـ ;")
+    parser.add_argument('--exclude', default="", help="أنماط الاستبعاد مفصولة بـ ;")
+    parser.add_argument('--exclude-dirs', default="", help="المجلدات المستبعدة مفصولة بـ ;")
+    parser.add_argument('--min-size', type=float, default=0, help="أصغر حجم بالميجابايت")
+    parser.add_argument('--max-size', type=float, default=0, help="أكبر حجم بالميجابايت")
+    parser.add_argument('--skip-hidden', action='store_true', help="تجاهل الملفات المخفية")
+    parser.add_argument('--depth', type=int, default=-1, help="عمق المجلدات (-1 = بلا حد)")
+    parser.add_argument('--sort-memory', type=int, default=0, metavar='MB',
+                        help="حد ذاكرة الفرز الخارجي بالميجابايت (0 = الفرز في الذاكرة)")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_IO_CONCURRENCY,
+                        help="عدد عمليات الإدخال/الإخراج المتزامنة")
+    parser.add_argument('--limit-bytes', type=float, default=0, metavar='MB',
+                        help="أقصى ميغابايت/ث للقراءة (0 = بلا حد)")
+    parser.add_argument('--limit-ops', type=float, default=0,
+                        help="أقصى عمليات ملفات في الثانية (0 = بلا حد)")
+    parser.add_argument('--max-load', type=float, default=0,
+                        help="إيقاف مؤقت ما دام متوسط حمل النظام أعلى من هذه القيمة")
+    parser.add_argument('--low-priority', action='store_true',
+                        help="تشغيل خيوط العمل بأولوية nice/ionice منخفضة")
+    parser.add_argument('--benchmark-io', action='store_true',
+                        help="قياس أداء محرك الإدخال/الإخراج مع تأخير مصطنع")
+    parser.add_argument('--latency', type=float, default=5.0,
+                        help="التأخير المصطنع لكل عملية بالمللي ثانية (مع --benchmark-io)")
+    parser.add_argument('--files', type=int, default=400,
+                        help="عدد الملفات المؤقتة (مع --benchmark-io)")
+    return parser
+
+
+def filters_from_args(args) -> ScanFilters:
+    return ScanFilters(
+        include_patterns=parse_patterns(args.include),
+        exclude_patterns=parse_patterns(args.exclude),
+        min_size=int(args.min_size * 1024 * 1024),
+        max_size=int(args.max_size * 1024 * 1024),
+        skip_hidden=args.skip_hidden,
+        exclude_dirs=parse_patterns(args.exclude_dirs),
+        max_depth=args.depth
+    )
+
+
+def throttle_from_args(args) -> Optional[IOThrottle]:
+    if not (args.limit_bytes or args.limit_ops or args.max_load or args.low_priority):
+        return None
+    return IOThrottle(args.limit_bytes * 1024 * 1024, args.limit_ops, args.max_load,
+                      args.low_priority, on_notice=print)
+
+
+def run_headless(args) -> int:
+    """تنفيذ أوامر سطر الأوامر وإرجاع رمز الخروج"""
+    throttle = throttle_from_args(args)
+    if args.scan_shard:
+        if not args.roots:
+            print("لم يتم تحديد مجلدات للفحص", file=sys.stderr)
+            return 2
+        filters = filters_from_args(args)
+        with AsyncIOEngine(args.concurrency, throttle=throttle) as engine:
+            records = list(scan_roots(args.roots, filters, engine=engine))
+            if args.hash:
+                # الجهاز البعيد لا يعرف مرشحي الأجهزة الأخرى، لذا تُحسب البصمة الكاملة للجميع
+                scheduler = DiskScheduler(args.concurrency, throttle=throttle)
+                digests = scheduler.map(
+                    lambda record: file_digest(record_path(record)), records,
+                    bytes_of=lambda record: record['size']
+                )
+                for line in scheduler.throughput_report():
+                    print(line)
+                for record, digest in zip(records, digests):
+                    if isinstance(digest, str):
+                        record['hash'] = digest
+        if args.scan_shard.endswith(SNAPSHOT_EXTENSION):
+            meta = snapshot_meta(normalize_roots(args.roots), filters, args.threshold,
+                                 args.same_ext, args.hash)
+            meta['host'] = args.host or LOCAL_HOST
+            write_snapshot(args.scan_shard, records, meta)
+        else:
+            write_scan_shard(args.scan_shard, normalize_roots(args.roots), filters, records, args.host)
+        print(f"{len(records)} ملف -> {args.scan_shard}")
+        for line in throttle.take_report() if throttle else []:
+            print(line)
+        return 0
+
+    if args.diff:
+        with ScanSnapshot(args.diff[0]) as old, ScanSnapshot(args.diff[1]) as new:
+            old_meta, meta = old.meta, new.meta
+            changes = list(diff_snapshots(
+                old.iter_records(), new.iter_records(),
+                meta['threshold_mb'] * 1024 * 1024, meta['same_ext'],
+                old_verified=old_meta['verified'], new_verified=meta['verified']
+            ))
+        counts = {status: sum(1 for c in changes if c['status'] == status) for status in DIFF_LABELS}
+        print("، ".join(f"{DIFF_LABELS[status]}: {count}" for status, count in counts.items()))
+        if args.report:
+            groups, labels, marked = diff_report_groups(changes)
+            if args.report.endswith('.csv'):
+                write_csv_report(args.report, groups, labels, marked)
+            else:
+                write_txt_report(args.report, groups, labels, marked)
+        if args.json:
+            write_json_diff(args.json, changes, old_meta, meta)
+        return 0
+    
+    if args.merge_shards:
+        if args.sort_memory:
+            records = None
+            with ExternalSizeSorter(args.sort_memory) as sorter:
+                for record in iter_scan_shards(args.merge_shards):
+                    sorter.add(record)
+                groups = sorter.group(args.threshold * 1024 * 1024, args.same_ext)
+            records_count = sorter.count - sorter.merged
+        else:
+            records = merge_scan_shards(args.merge_shards)
+            groups = group_by_size(records, args.threshold * 1024 * 1024, args.same_ext)
+            records_count = len(records)
+        if args.verify:
+            with AsyncIOEngine(args.concurrency, throttle=throttle) as engine:
+                ensure_digests([f for group in groups for f in group], engine=engine)
+            verified = []
+            for group in groups:
+                verified.extend(split_group_by_content(group))
+            groups = verified
+            unverified = sum(1 for group in groups for f in group if f.get('unverified'))
+            if unverified:
+                print(f"{unverified} ملف من أجهزة أخرى بلا بصمة - لم يُتحقق من محتواه "
+                      f"(أعد فحص أجزائها مع --hash)", file=sys.stderr)
+        print(f"{records_count} ملف من {len(args.merge_shards)} جزء - {len(groups)} مجموعة")
+        if args.keep:
+            priorities = parse_patterns(args.priority, separators=";")
+            selected = [f for group in select_by_policy(groups, args.keep, priorities) for f in group]
+            print(f"قاعدة الإبقاء ({KEEP_POLICIES[args.keep]}): {len(selected)} ملف محدد، "
+                  f"{format_size(sum(f['size'] for f in selected))}")
+            if args.selection:
+                with open(args.selection, 'w', encoding='utf-8', errors='surrogateescape') as f:
+                    for file_info in selected:
+                        f.write(record_path(file_info) + "\n")
+        if args.snapshot:
+            if args.sort_memory:
+                print("اللقطة غير متاحة مع --sort-memory", file=sys.stderr)
+            else:
+                roots = sorted({record['root'] for record in records if record.get('root')})
+                write_snapshot(args.snapshot, records,
+                               snapshot_meta(roots, None, args.threshold, args.same_ext, args.verify))
+        if args.report:
+            if args.report.endswith('.csv'):
+                write_csv_report(args.report, groups)
+            else:
+                write_txt_report(args.report, groups)
+        return 0
+
+    if args.benchmark_io:
+        levels = sorted({1, 4, 16, max(1, args.concurrency)})
+        rows = benchmark_io_engine(args.latency / 1000, args.files, levels)
+        baseline = {}
+        for stage, _, seconds, _ in rows:
+            baseline.setdefault(stage, seconds)
+        print(f"{'المرحلة':<10}{'التوازي':>8}{'الزمن (ث)':>12}{'عملية/ث':>12}{'التسريع':>10}")
+        for stage, concurrency, seconds, ops in rows:
+            print(f"{stage:<10}{concurrency:>8}{seconds:>12.3f}{ops / seconds:>12.1f}"
+                  f"{baseline[stage] / seconds:>9.1f}x")
+        return 0
+
+    return 2
+
+
+def benchmark_io_engine(latency: float, file_count: int, levels: List[int]) -> List[tuple]:
+    """
+    قياس تأثير التوازي في مراحل الفحص والبصمات والنقل على شجرة مؤقتة،
+    مع حقن تأخير ثابت قبل كل عملية لمحاكاة رحلة الذهاب والإياب على NFS/SMB.
+    يُرجع صفوف (المرحلة، التوازي، الزمن بالثواني، عدد العمليات).
+    """
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "src")
+        for idx in range(file_count):
+            sub = os.path.join(source, f"d{idx % 16}")
+            os.makedirs(sub, exist_ok=True)
+            with open(os.path.join(sub, f"f{idx}.bin"), 'wb') as f:
+                f.write(os.urandom(4096 + idx))
+        
+        for concurrency in levels:
+            with AsyncIOEngine(concurrency, injected_latency=latency) as engine:
+                start = time.perf_counter()
+                records = list(scan_roots([source], ScanFilters(max_depth=-1), engine=engine))
+                rows.append(("scan", concurrency, time.perf_counter() - start, len(records)))
+                
+                start = time.perf_counter()
+                ensure_digests(records, engine=engine)
+                rows.append(("hash", concurrency, time.perf_counter() - start, len(records)))
+                
+                target = os.path.join(tmp, f"moved_{concurrency}")
+                plans = [
+                    {'info': r, 'group': 1, 'output_folder': target,
+                     'dest': os.path.join(target, r['name'])}
+                    for r in records
+                ]
+                start = time.perf_counter()
+                engine.map(FileMoveThread.move_one, plans)
+                rows.append(("move", concurrency, time.perf_counter() - start, len(plans)))
+                # إعادة الملفات لمكانها للجولة التالية
+                engine.map(lambda p: shutil.move(p['dest'], record_path(p['info'])), plans)
+    return rows
+
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # نقطة الدخول
 # ═══════════════════════════════════════════════════════════════════════════════
 
 def main():
     """نقطة الدخول الرئيسية"""
+    # أوامر سطر الأوامر (بدون واجهة)
+    args, _ = build_arg_parser().parse_known_args()
+    if args.scan_shard or args.merge_shards or args.diff or args.benchmark_io:
+        sys.exit(run_headless(args))
+    
     # دعم الشاشات عالية الدقة
     if hasattr(Qt, 'AA_EnableHighDpiScaling'):
         QApplication.setAttribute(Qt.AA_EnableHighDpiScaling, True)
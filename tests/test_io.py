@@ -0,0 +1,115 @@
+"""اختبارات محرك الإدخال والإخراج وحدود المعدل"""
+import os
+import sys
+import time
+
+import pytest
+
+pytest.importorskip("PyQt5")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import file_size_duplicate_finder as fsdf  # noqa: E402
+
+
+class RecordingThrottle(fsdf.IOThrottle):
+    """يسجل كل طلب (بايتات، عمليات) بدلاً من الانتظار"""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def before(self, nbytes, should_continue=None, ops=1):
+        self.calls.append((nbytes, ops))
+
+
+@pytest.fixture
+def big_file(tmp_path):
+    path = tmp_path / "big.bin"
+    path.write_bytes(os.urandom(1024) * (3 * fsdf.THROTTLE_STEP // 1024 + 7))
+    return str(path)
+
+
+def test_large_read_is_charged_in_steps(big_file):
+    size = os.path.getsize(big_file)
+    throttle = RecordingThrottle()
+    with fsdf.AsyncIOEngine(1, throttle=throttle) as engine:
+        [digest] = engine.map(fsdf.file_digest, [big_file], bytes_of=lambda _: size)
+    assert digest == fsdf.file_digest(big_file)
+    # عملية واحدة قبل البدء ثم البايتات على دفعات أثناء القراءة
+    assert throttle.calls[0] == (0, 1)
+    steps = throttle.calls[1:]
+    assert all(ops == 0 and nbytes <= fsdf.HASH_CHUNK_SIZE for nbytes, ops in steps)
+    assert sum(nbytes for nbytes, _ in steps) == size
+
+
+def test_large_copy_is_charged_in_steps(big_file, tmp_path):
+    size = os.path.getsize(big_file)
+    throttle = RecordingThrottle()
+    dest = str(tmp_path / "copy.bin")
+    with fsdf.AsyncIOEngine(1, throttle=throttle) as engine:
+        [result] = engine.map(lambda path: fsdf.copy_verified(path, dest), [big_file],
+                              bytes_of=lambda _: size)
+    assert result == fsdf.file_digest(big_file)
+    assert throttle.calls[0] == (0, 1)
+    steps = throttle.calls[1:]
+    assert len(steps) > 1 and all(nbytes <= fsdf.COPY_CHUNK_SIZE for nbytes, _ in steps)
+    assert sum(nbytes for nbytes, _ in steps) == size
+
+
+def test_small_read_is_charged_up_front(tmp_path):
+    path = tmp_path / "small.bin"
+    path.write_bytes(b"x" * 5000)
+    throttle = RecordingThrottle()
+    with fsdf.AsyncIOEngine(1, throttle=throttle) as engine:
+        engine.map(fsdf.file_digest, [str(path)], bytes_of=lambda _: 5000)
+    assert throttle.calls == [(5000, 1)]
+
+
+def test_chunking_stops_between_reads(big_file):
+    reads = []
+
+    def should_continue():
+        reads.append(None)
+        return len(reads) <= 2
+
+    assert fsdf.file_chunks(big_file, should_continue) is None
+    # توقف بعد كتلتين بدل قراءة الملف كله
+    assert len(reads) <= 4
+    digests, lengths = fsdf.file_chunks(big_file, lambda: True)
+    assert sum(lengths) == os.path.getsize(big_file)
+
+
+def test_injected_latency_overlaps_with_concurrency(tmp_path):
+    paths = []
+    for i in range(16):
+        path = tmp_path / f"f{i}.bin"
+        path.write_bytes(bytes([i]) * (1000 + i))
+        paths.append(str(path))
+    latency = 0.05
+
+    timings, outputs, scanned = {}, {}, {}
+    for concurrency in (1, 8):
+        with fsdf.AsyncIOEngine(concurrency, injected_latency=latency) as engine:
+            start = time.perf_counter()
+            outputs[concurrency] = engine.map(fsdf.file_digest, paths)
+            timings[concurrency] = time.perf_counter() - start
+            scanned[concurrency] = sorted(
+                (fsdf.record_path(r), r['size']) for r in fsdf.scan_roots([str(tmp_path)], fsdf.ScanFilters(),
+                                                                          engine=engine)
+            )
+
+    # نفس النتائج بنفس الترتيب، والتأخير المحقون يتداخل بقدر التوازي
+    assert outputs[8] == outputs[1] == [fsdf.file_digest(p) for p in paths]
+    assert scanned[8] == scanned[1] and len(scanned[1]) == len(paths)
+    assert timings[1] >= len(paths) * latency
+    assert timings[8] < timings[1] / 4
+
+
+@pytest.mark.parametrize("name, label", [
+    ("My\\x20Disk", "My Disk"),
+    ("\\xd9\\x82\\xd8\\xb1\\xd8\\xb5", "قرص"),
+    ("قرص\\x20النسخ", "قرص النسخ"),
+    ("1234-ABCD", "1234-ABCD"),
+])
+def test_disk_label_unescape(name, label):
+    assert fsdf._unescape_label(name) == label
@@ -0,0 +1,50 @@
+"""اختبارات سلامة نقل الملفات عند الإيقاف"""
+import errno
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("PyQt5")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import file_size_duplicate_finder as fsdf  # noqa: E402
+
+
+def make_group(root, count=6):
+    root.mkdir()
+    for i in range(count):
+        (root / f"f{i}.bin").write_bytes(bytes([i]) * 5000)
+    return list(fsdf.scan_roots([str(root)], fsdf.ScanFilters()))
+
+
+def test_stop_during_commit_keeps_every_file(tmp_path, monkeypatch):
+    root = tmp_path / "src"
+    files = make_group(root)
+    real_rename, real_sync = os.rename, fsdf.sync_directory
+
+    def cross_device_rename(source, dest):
+        # محاكاة وجهة على جهاز آخر: كل نقل يصبح نسخاً متحققاً ثم حذفاً للمصدر
+        if str(source).startswith(str(root)) and fsdf.OUTPUT_FOLDER_NAME in str(dest):
+            raise OSError(errno.EXDEV, "cross-device link")
+        return real_rename(source, dest)
+
+    thread = fsdf.FileMoveThread([files], str(root), "op-1", io_concurrency=3)
+
+    def stop_then_sync(batch):
+        thread.stop()
+        return real_sync(batch)
+
+    monkeypatch.setattr(fsdf.os, "rename", cross_device_rename)
+    monkeypatch.setattr(fsdf, "sync_directory", stop_then_sync)
+    finished = []
+    thread.finished_move.connect(finished.append)
+    thread.run()
+
+    for info in files:
+        source = fsdf.record_path(info)
+        dest = os.path.join(str(root), fsdf.OUTPUT_FOLDER_NAME, "folder_1", info['name'])
+        assert os.path.isfile(source) or os.path.isfile(dest), info['name']
+    # ما اكتمل نقله يُسجل ليمكن إرجاعه
+    assert finished and finished[0]['moved_count'] == len(files)
+    assert sorted(os.listdir(root)) == [fsdf.OUTPUT_FOLDER_NAME]
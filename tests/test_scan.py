@@ -0,0 +1,272 @@
+"""اختبارات تكافؤ مسارات الفحص والتجميع على شجرة ملفات مؤقتة"""
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("PyQt5")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import file_size_duplicate_finder as fsdf  # noqa: E402
+
+
+def make_tree(root):
+    """شجرة بعدة مستويات: أحجام مكررة ومتقاربة، امتدادات مختلفة، رابط صلب ورابط رمزي"""
+    sizes = [100, 100, 150, 4096, 4096, 4200, 9000, 70000, 70500, 70500]
+    exts = [".bin", ".txt", ".bin"]
+    for d in range(4):
+        for sub in range(3):
+            folder = root / f"d{d}" / f"s{sub}"
+            folder.mkdir(parents=True)
+            for i, size in enumerate(sizes):
+                (folder / f"f{i}{exts[(i + d) % 3]}").write_bytes(bytes([d, sub, i]) * (size // 3))
+    os.link(root / "d0" / "s0" / "f3.bin", root / "d1" / "hard.bin")
+    os.symlink("f0.bin", root / "d0" / "s0" / "link.bin")
+
+
+def group_paths(groups):
+    return [[fsdf.record_path(f) for f in group] for group in groups]
+
+
+@pytest.fixture
+def tree(tmp_path, monkeypatch):
+    # نقاط الاستئناف تُحفظ في مجلد المستخدم
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    root = tmp_path / "tree"
+    make_tree(root)
+    return str(root)
+
+
+def checkpointed_scan(roots, filters, stop_after=None, resume=False):
+    """فحص عبر FileSearchThread.collect_files؛ stop_after: إيقاف الخيط بعد عدد من السجلات"""
+    thread = fsdf.FileSearchThread(roots, 0, False, filters, resume=resume)
+    records = []
+
+    def add_record(record):
+        records.append(record)
+        if stop_after is not None and len(records) >= stop_after:
+            thread.stop()
+
+    with fsdf.AsyncIOEngine(2) as thread.engine:
+        thread.collect_files(add_record)
+    return records
+
+
+@pytest.mark.parametrize("stop_after", [1, 3, 8, 20])
+def test_resumed_scan_matches_full_scan(tree, stop_after, monkeypatch):
+    # نقطة استئناف بعد كل دفعة مجلدات
+    monkeypatch.setattr(fsdf, "CHECKPOINT_INTERVAL", 0)
+    roots = [os.path.join(tree, "d0"), os.path.join(tree, "d1"), os.path.join(tree, "d2"),
+             os.path.join(tree, "d3")]
+    filters = fsdf.ScanFilters(max_depth=-1)
+    full = checkpointed_scan(roots, filters)
+
+    partial = checkpointed_scan(roots, filters, stop_after=stop_after)
+    assert len(partial) < len(full)
+    assert fsdf.ScanCheckpoint(roots, filters).exists()
+    resumed = checkpointed_scan(roots, filters, resume=True)
+
+    assert (sorted((fsdf.record_path(r), r.get('links')) for r in resumed)
+            == sorted((fsdf.record_path(r), r.get('links')) for r in full))
+    for threshold, same_ext in ((0, False), (200, False), (1024, True)):
+        assert (group_paths(fsdf.group_by_size(resumed, threshold, same_ext))
+                == group_paths(fsdf.group_by_size(full, threshold, same_ext)))
+
+
+def scan_tree(tree, merge_links=True):
+    with fsdf.AsyncIOEngine(2) as engine:
+        return list(fsdf.scan_roots([tree], fsdf.ScanFilters(max_depth=-1), engine=engine,
+                                    merge_links=merge_links))
+
+
+@pytest.mark.parametrize("same_ext", [False, True])
+@pytest.mark.parametrize("threshold", [0, 100, 5000])
+def test_external_sort_matches_in_memory_grouping(tree, same_ext, threshold):
+    records = scan_tree(tree)
+    expected = [[(fsdf.record_path(f), f.get('links')) for f in group]
+                for group in fsdf.group_by_size(list(records), threshold, same_ext)]
+
+    with fsdf.ExternalSizeSorter(1) as sorter:
+        # حد الذاكرة الأدنى يتسع لآلاف المفاتيح - يُصغّر حتى تُكتب عدة تسلسلات مرتبة
+        sorter.run_length = 16
+        # الروابط الصلبة سجلات مستقلة، وجزء متداخل يكرر بعض المسارات
+        unmerged = scan_tree(tree, merge_links=False)
+        for record in unmerged + [dict(r) for r in unmerged[::3]]:
+            sorter.add(record)
+        groups = sorter.group(threshold, same_ext)
+        assert len(sorter.runs) > 1
+        assert sorter.count - sorter.merged == len(records)
+
+    assert any(links for group in expected for _, links in group)
+    assert [[(fsdf.record_path(f), f.get('links')) for f in group] for group in groups] == expected
+
+
+def test_streamed_shards_match_merged_shards(tree, tmp_path):
+    # جزآن متداخلان: الشجرة كاملة ومجلد يضم أحد طرفي الرابط الصلب باسمه الآخر
+    filters = fsdf.ScanFilters(max_depth=-1)
+    shards = []
+    for idx, root in enumerate((tree, os.path.join(tree, "d0"))):
+        shards.append(str(tmp_path / f"part{idx}{fsdf.SHARD_EXTENSION}"))
+        fsdf.write_scan_shard(shards[-1], [root], filters, list(fsdf.scan_roots([root], filters)), host="box")
+    merged = fsdf.merge_scan_shards(shards)
+    expected = [[(fsdf.record_path(f), sorted(f.get('links', []))) for f in group]
+                for group in fsdf.group_by_size(merged, 0, False)]
+
+    with fsdf.ExternalSizeSorter(1) as sorter:
+        sorter.run_length = 16
+        for record in fsdf.iter_scan_shards(shards):
+            sorter.add(record)
+        groups = sorter.group(0, False)
+        assert sorter.count - sorter.merged == len(merged)
+
+    assert [[(fsdf.record_path(f), sorted(f.get('links', []))) for f in group] for group in groups] == expected
+
+
+def test_size_index_regroup_matches_group_by_size(tree):
+    records = scan_tree(tree)
+    index = fsdf.SizeIndex(list(records))
+    for threshold in (0, 60, 200, 5000, 100000):
+        for same_ext in (False, True):
+            assert (group_paths(index.groups(threshold, same_ext))
+                    == group_paths(fsdf.group_by_size(list(records), threshold, same_ext)))
+
+    # بعد حذف وإضافة سجلات (نقل أو مراقبة) يبقى التجميع مطابقاً لإعادة التجميع الكاملة
+    removed = {fsdf.record_path(r) for r in records[::5]}
+    added = [dict(r, id=next(fsdf._file_ids), name="copy-" + r['name']) for r in records[1::7]]
+    index.remove(removed)
+    index.add(added)
+    remaining = [r for r in records if fsdf.record_path(r) not in removed] + added
+    for same_ext in (False, True):
+        assert (group_paths(index.groups(150, same_ext))
+                == group_paths(fsdf.group_by_size(list(remaining), 150, same_ext)))
+
+
+def diff_summary(changes):
+    return [(c['status'], [fsdf.record_path(f) for f in c['files']], sorted(c['changed']))
+            for c in changes]
+
+
+def test_snapshot_diff_round_trip(tree, tmp_path):
+    root = os.path.join(tree, "d3")
+    (tmp_path / "tree" / "d3" / "pair-a.dat").write_bytes(b"p" * 55555)
+    (tmp_path / "tree" / "d3" / "pair-b.dat").write_bytes(b"q" * 55555)
+    old_records = scan_tree(root)
+    old_path = str(tmp_path / "old.fsdsnap")
+    meta = fsdf.snapshot_meta([root], fsdf.ScanFilters(max_depth=-1), 0, False, False)
+    fsdf.write_snapshot(old_path, old_records, meta)
+
+    # مجموعة جديدة، ومجموعة نمت، ومجموعة حُلّت بحذف أحد ملفيها
+    (tmp_path / "tree" / "d3" / "new-a.dat").write_bytes(b"n" * 123456)
+    (tmp_path / "tree" / "d3" / "new-b.dat").write_bytes(b"m" * 123456)
+    (tmp_path / "tree" / "d3" / "grown.dat").write_bytes(b"g" * 9000)
+    os.remove(tmp_path / "tree" / "d3" / "pair-b.dat")
+    new_records = scan_tree(root)
+    new_path = str(tmp_path / "new.fsdsnap")
+    fsdf.write_snapshot(new_path, new_records, dict(meta, timestamp="later"))
+
+    in_memory = diff_summary(fsdf.diff_snapshots(
+        sorted(old_records, key=lambda r: r['size']), sorted(new_records, key=lambda r: r['size']), 0, False
+    ))
+    with fsdf.ScanSnapshot(old_path) as old, fsdf.ScanSnapshot(new_path) as new:
+        assert old.meta['roots'] == [root]
+        from_snapshots = diff_summary(fsdf.diff_snapshots(old.iter_records(), new.iter_records(), 0, False))
+
+    assert from_snapshots == in_memory
+    assert {status for status, _, _ in from_snapshots} == {'new', 'grown', 'resolved'}
+    new_files = {os.path.basename(p) for status, files, _ in from_snapshots if status == 'new' for p in files}
+    assert new_files == {"new-a.dat", "new-b.dat"}
+
+
+def test_admit_path_matches_scan_scope(tree, tmp_path):
+    roots = [os.path.join(tree, "d0"), os.path.join(tree, "d1")]
+    filters = fsdf.ScanFilters(max_depth=1, exclude_dirs=["s2"], include_patterns=["*.bin"])
+    # admit_path يحكم على مسار واحد؛ الفحص يطوي الروابط الصلبة في links
+    records = list(fsdf.scan_roots(roots, filters))
+    scanned = {p for r in records for p in [fsdf.record_path(r)] + r.get('links', [])}
+    candidates = [os.path.join(dirpath, name) for dirpath, _, names in os.walk(tree) for name in names]
+    (tmp_path / "outside.bin").write_bytes(b"x" * 100)
+    candidates.append(str(tmp_path / "outside.bin"))
+
+    admitted = {fsdf.record_path(r) for r in (fsdf.admit_path(p, roots, filters) for p in candidates) if r}
+    assert scanned and admitted == scanned
+
+
+def test_snapshot_keeps_detected_types(tree, tmp_path):
+    records = scan_tree(tree)
+    for idx, record in enumerate(records):
+        if idx % 3 == 1:
+            record['type'] = "png" if idx % 2 else None
+    path = str(tmp_path / "types.fsdsnap")
+    fsdf.write_snapshot(path, records, fsdf.snapshot_meta([tree], None, 0, False, False, same_type=True))
+
+    expected = {fsdf.record_path(r): r.get('type', "-") for r in records}
+    with fsdf.ScanSnapshot(path) as snapshot:
+        # النوع عمود أرقام لا حقل في الجدول الجانبي، و"لم يُكشف" يختلف عن None
+        assert not any('type' in extra for extra in snapshot._extras.values())
+        loaded = {fsdf.record_path(r): r.get('type', "-") for r in snapshot.iter_records()}
+    assert loaded == expected
+
+
+def test_sample_listing_skips_symlinks(tree):
+    # التقدير السريع يطابق الفحص الكامل: الرابط الرمزي link.bin ليس ملفاً مستقلاً
+    folder = os.path.join(tree, "d0", "s0")
+    files, _ = fsdf._sample_listing(folder, 0, fsdf.ScanFilters(), {})
+    scanned = {r['name'] for r in fsdf.scan_roots([folder], fsdf.ScanFilters())}
+    assert "link.bin" not in {entry.name for entry in files}
+    assert {entry.name for entry in files} == scanned
+
+
+def test_reset_record_tables_between_scans(tree):
+    scan_tree(tree)
+    fsdf.reset_record_tables()
+    records = scan_tree(os.path.join(tree, "d2"))
+    # الجدول يضم مجلدات الفحص الأخير وآباءها فقط، والمسارات تُبنى منه صحيحة
+    assert len(fsdf.DIRECTORIES) == len(os.path.join(tree, "d2").split(os.sep)) + 3
+    assert {r['id'] for r in records} == set(range(1, len(records) + 1))
+    assert all(os.path.isfile(fsdf.record_path(r)) for r in records)
+
+
+def test_verify_keeps_unhashed_remote_records(tree):
+    records = scan_tree(tree)
+    group = max(fsdf.group_by_size(records, 0, False), key=len)
+    fsdf.ensure_digests(group)
+    remote = [dict(r, id=next(fsdf._file_ids), host="other-box") for r in group[:2]]
+    for r in remote:
+        r.pop('hash', None)
+        r.pop('partial_hash', None)
+
+    groups = fsdf.split_group_by_content(group + remote)
+    verified = fsdf.split_group_by_content(group)
+    # مجموعات المحتوى المحلية كما هي، والسجلات البعيدة في مجموعة أخيرة معلّمة
+    assert groups[:-1] == verified
+    assert all(r in groups[-1] for r in remote) and fsdf.is_unverified_group(groups[-1])
+    assert not any(fsdf.is_unverified_group(g) for g in verified)
+    assert fsdf.select_by_policy(groups, 'newest')[-1] == []
+
+
+def test_reference_load_closes_snapshot_on_error(tree, tmp_path, monkeypatch):
+    path = str(tmp_path / "ref.fsdsnap")
+    fsdf.write_snapshot(path, scan_tree(tree), fsdf.snapshot_meta([tree], None, 0, False, False))
+    opened = []
+
+    def broken_records(snapshot):
+        opened.append(snapshot)
+        raise ValueError("لقطة تالفة")
+
+    monkeypatch.setattr(fsdf.ScanSnapshot, "iter_records", broken_records)
+    with pytest.raises(ValueError):
+        fsdf.ReferenceSet().load(path)
+    assert opened and opened[0]._map.closed
+
+
+def test_priority_entries_keep_commas(tree):
+    # الفاصلة جزء من اسم المجلد في الأولوية، وتبقى فاصلاً في أنماط المرشحات
+    assert fsdf.parse_patterns("*.mp4, *.mkv") == ["*.mp4", "*.mkv"]
+    assert fsdf.parse_patterns("/data/a, b; */backup/*", separators=";") == ["/data/a, b", "*/backup/*"]
+
+    folder = os.path.join(tree, "d1", "s1, old")
+    os.rename(os.path.join(tree, "d1", "s1"), folder)
+    group = max(fsdf.group_by_size(scan_tree(tree), 0, False), key=len)
+    selected = fsdf.select_by_policy([group], 'priority', fsdf.parse_patterns(folder, separators=";"))[0]
+    kept = [r for r in group if r not in selected]
+    assert len(kept) == 1 and fsdf.record_path(kept[0]).startswith(folder + os.sep)